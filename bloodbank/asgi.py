@@ -5,6 +5,10 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.0/howto/deployment/asgi/
+
+Serve with an ASGI server (e.g. ``uvicorn bloodbank.asgi:application``) so the
+live emergency statistics stream (/emergency/stats/stream/) keeps its idle
+connections on the event loop instead of one worker thread each.
 """
 
 import os
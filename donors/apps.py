@@ -7,4 +7,18 @@ class DonorsConfig(AppConfig):
 
 
     def ready(self):
-        pass
+        # Signal receivers that keep the live emergency statistics fresh
+        from .utils import live_stats  # noqa: F401
+        # ...and that drop the cached nearest-facility index
+        from .utils import facility_index  # noqa: F401
+        # SQL functions for distance queries on SQLite
+        from .utils import geo  # noqa: F401
+        # Cached donor list counts
+        from .utils import search  # noqa: F401
+        # ...and the version in the cache key of PDF reports
+        from .utils import report_version  # noqa: F401
+        # Rolled-up days dropped when their units or requests change
+        from .utils import rollups  # noqa: F401
+        # Bundled PDF report fonts, registered once per process
+        from .utils.pdf_generator import register_report_fonts
+        register_report_fonts()
@@ -0,0 +1,18 @@
+# donors/management/commands/allocate_requests.py
+from django.core.management.base import BaseCommand
+from donors.utils.allocation import allocate_pending_requests
+
+class Command(BaseCommand):
+    help = 'Allocates available blood units to all open blood requests (critical > urgent > normal, oldest first)'
+
+    def handle(self, *args, **options):
+        summary = allocate_pending_requests()
+        
+        self.stdout.write(
+            f"Open requests: {summary['requests']} | "
+            f"Units allocated: {summary['units_allocated']} | "
+            f"Units still missing: {summary['units_missing']}"
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {summary['fulfilled']} requests fulfilled"
+        ))
@@ -0,0 +1,52 @@
+# donors/management/commands/backfill_donor_eligibility.py
+from django.core.management.base import BaseCommand
+from django.db.models import Max
+from donors.models import Donor, Donation
+
+class Command(BaseCommand):
+    help = 'Backfills Donor.last_donation_date / next_eligible_date from the donations table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of donors written per bulk update'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        
+        # One grouped query for every donor's last donation
+        last_dates = dict(
+            Donation.objects.order_by()
+            .values('donor_id')
+            .annotate(last=Max('donation_date'))
+            .values_list('donor_id', 'last')
+        )
+        
+        changed = []
+        updated_count = 0
+        donors = Donor.objects.only('id', 'last_donation_date', 'next_eligible_date').order_by('id')
+        
+        for donor in donors.iterator(chunk_size=batch_size):
+            last, next_eligible = Donor.eligibility_from(last_dates.get(donor.id))
+            if (donor.last_donation_date, donor.next_eligible_date) == (last, next_eligible):
+                continue
+            
+            donor.last_donation_date = last
+            donor.next_eligible_date = next_eligible
+            changed.append(donor)
+            
+            if len(changed) >= batch_size:
+                Donor.objects.bulk_update(changed, ['last_donation_date', 'next_eligible_date'])
+                updated_count += len(changed)
+                changed = []
+        
+        if changed:
+            Donor.objects.bulk_update(changed, ['last_donation_date', 'next_eligible_date'])
+            updated_count += len(changed)
+        
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Donor eligibility backfilled: {updated_count} donors updated'
+        ))
@@ -0,0 +1,73 @@
+# donors/management/commands/backfill_donor_locations.py
+from django.core.management.base import BaseCommand
+from donors.models import Donor, Location, UserLocation
+from donors.utils.towns import match_town, town_index
+
+class Command(BaseCommand):
+    help = 'Backfills Donor.location from the linked user location, or from the town named in the address'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of donors written per bulk update'
+        )
+        parser.add_argument(
+            '--skip-address',
+            action='store_true',
+            help='Do not guess the town from the address of donors without a user location'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        # One query for every user's chosen location
+        user_locations = dict(UserLocation.objects.values_list('user_id', 'location_id'))
+
+        # Town names matched as whole words of the address (see utils/towns.py)
+        towns = {}
+        if not options['skip_address']:
+            towns = town_index(Location.objects.values_list('id', 'name_he', 'name_en'))
+
+        changed = []
+        unmatched = []
+        from_user, from_address = 0, 0
+        donors = Donor.objects.only('id', 'user_id', 'address', 'location_id').order_by('id')
+
+        for donor in donors.iterator(chunk_size=batch_size):
+            location_id = user_locations.get(donor.user_id)
+
+            if location_id is None and donor.location_id is None and donor.address:
+                location_id = match_town(donor.address, towns)
+                if location_id is not None:
+                    from_address += 1
+                else:
+                    unmatched.append(donor)
+            elif location_id is not None and location_id != donor.location_id:
+                from_user += 1
+
+            if location_id is None or location_id == donor.location_id:
+                continue
+
+            donor.location_id = location_id
+            changed.append(donor)
+
+            if len(changed) >= batch_size:
+                Donor.objects.bulk_update(changed, ['location'])
+                changed = []
+
+        if changed:
+            Donor.objects.bulk_update(changed, ['location'])
+
+        # No town, or no single town, in the address: left without a location
+        if towns and options['verbosity'] >= 2:
+            for donor in unmatched:
+                self.stdout.write(f'   ⚠️ donor {donor.id}: no town matched in "{donor.address}"')
+
+        missing = Donor.objects.filter(location__isnull=True).count()
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Donor locations backfilled: {from_user} from user locations, '
+            f'{from_address} from addresses, {len(unmatched)} addresses unmatched, '
+            f'{missing} donors still without a location (-v 2 lists the unmatched addresses)'
+        ))
@@ -0,0 +1,97 @@
+# donors/management/commands/benchmark_report_text.py
+import random
+from time import perf_counter
+from django.core.management.base import BaseCommand
+from django.template.loader import get_template
+from django.utils import timezone
+from donors.models import Donor
+from donors.utils import text_shaping
+from donors.utils.text_shaping import clear_shaping_cache, shape_values, shaping_cache_info
+
+FIRST_NAMES = [
+    'נועה', 'תמר', 'מיכל', 'שירה', 'יעל', 'מאיה', 'רחל', 'אסתר', 'חנה', 'שרה',
+    'דוד', 'משה', 'יוסף', 'אברהם', 'יצחק', 'אלי', 'איתי', 'עומר', 'נדב', 'אורי',
+    'محمد', 'أحمد', 'فاطمة', 'مريم', 'Daniel', 'Anna',
+]
+LAST_NAMES = [
+    'כהן', 'לוי', 'מזרחי', 'פרץ', 'ביטון', 'דהן', 'אברהם', 'פרידמן', 'גולדברג', 'שלום',
+    'אזולאי', 'בן-דוד', 'וייס', 'קעדאן', 'עבאס', 'خطيب', 'حسن', 'Smith',
+]
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks right-to-left text shaping of a large PDF report, with and without the shaping cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000, help='Donor rows in the report table')
+        parser.add_argument('--repeat', type=int, default=3, help='Timed runs of each variant')
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        repeat = options['repeat']
+        rng = random.Random(0)
+        blood_types = [code for code, _label in Donor.BLOOD_TYPES]
+        health_statuses = [code for code, _label in Donor.HEALTH_STATUS_CHOICES]
+
+        # Synthetic donors (unsaved): names and statuses repeat as in a real donor table
+        donors = [
+            Donor(
+                first_name=rng.choice(FIRST_NAMES),
+                last_name=rng.choice(LAST_NAMES),
+                national_id=f'{rng.randrange(10 ** 9):09d}',
+                blood_type=rng.choice(blood_types),
+                phone_number=f'05{rng.randrange(10 ** 8):08d}',
+                email=f'donor{i}@example.com',
+                health_status=rng.choice(health_statuses),
+            )
+            for i in range(rows)
+        ]
+        cells = [
+            (f'{d.first_name} {d.last_name}', d.national_id, d.blood_type, d.phone_number, d.email, d.get_health_status_display())
+            for d in donors
+        ]
+
+        # Shaping alone: every printed cell of the table
+        def shape_all(cache):
+            for row in cells:
+                shape_values(row, cache)
+
+        self.report('shaping, no cache', lambda: shape_all(False), repeat)
+        self.report('shaping, cold cache', lambda: (clear_shaping_cache(), shape_all(True)), repeat)
+        self.report('shaping, warm cache', lambda: shape_all(True), repeat)
+        info = shaping_cache_info()
+        self.stdout.write(f'   {info.currsize} distinct strings cached, {info.hits} hits / {info.misses} misses')
+
+        # The report template's donor table, as one slice of generate_pdf_chunked renders it
+        template = get_template('donors/reports/doctor_report.html')
+        context = {
+            'doctor_name': 'Benchmark',
+            'report_date': timezone.now(),
+            'donors': donors,
+            'chunked': True,
+            'section': 'donors',
+            'first_chunk': True,
+            'last_chunk': True,
+        }
+        render = lambda: template.render(context)
+
+        # |bidi calls shape_text(), which looks the cached function up at call time
+        cached = text_shaping._shape_cached
+        text_shaping._shape_cached = text_shaping._shape
+        try:
+            self.report('report HTML, no cache', render, repeat)
+        finally:
+            text_shaping._shape_cached = cached
+        self.report('report HTML, cold cache', lambda: (clear_shaping_cache(), render()), repeat)
+        self.report('report HTML, warm cache', render, repeat)
+
+        self.stdout.write(f'📊 {rows} rows x {len(cells[0])} columns, {repeat} runs each (best shown)')
+        self.stdout.write(self.style.SUCCESS('✅ Benchmark finished'))
+
+    def report(self, label, run, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = perf_counter()
+            run()
+            timings.append((perf_counter() - started) * 1000)
+        self.stdout.write(f'   {label:<26} {min(timings):9.1f} ms')
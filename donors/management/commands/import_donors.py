@@ -0,0 +1,247 @@
+# donors/management/commands/import_donors.py
+import csv
+import json
+import os
+import time
+from datetime import datetime
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from donors.models import Donor, Location
+from donors.utils.live_stats import bump_stats_version
+from donors.utils.search import bump_counts_version, phone_variants
+
+REQUIRED_COLUMNS = ['national_id', 'first_name', 'last_name', 'date_of_birth', 'blood_type', 'phone_number']
+OPTIONAL_COLUMNS = [
+    'email', 'address', 'health_status', 'smoking_status', 'alcohol_use',
+    'has_chronic_illness', 'chronic_illness_details', 'last_medical_exam', 'location',
+]
+DATE_COLUMNS = ['date_of_birth', 'last_medical_exam']
+DATE_FORMATS = ['%Y-%m-%d', '%d/%m/%Y', '%d.%m.%Y']
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 'כן'}
+FALSE_VALUES = {'0', 'false', 'no', 'n', 'לא'}
+
+# Rows per uniqueness lookup, keeps the IN lists under SQLite's variable limit
+LOOKUP_CHUNK = 1000
+
+
+def parse_date(value):
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    raise ValidationError(f'תאריך לא תקין: {value}')
+
+
+def phone_key(value):
+    """One spelling per phone number, so 050-1234567 and +972501234567 are the same donor"""
+    variants = phone_variants(value)
+    return variants[0] if variants else value
+
+
+class Command(BaseCommand):
+    help = 'Imports donors from a CSV file in validated batches, with an error report and a resumable checkpoint'
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_file', help='UTF-8 CSV with a header row')
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Rows validated and inserted per transaction'
+        )
+        parser.add_argument(
+            '--errors',
+            help='Error report CSV (default: <csv_file>.errors.csv)'
+        )
+        parser.add_argument(
+            '--checkpoint',
+            help='Checkpoint file (default: <csv_file>.checkpoint)'
+        )
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='Skip the rows already committed according to the checkpoint'
+        )
+
+    def handle(self, *args, **options):
+        path = options['csv_file']
+        batch_size = options['batch_size']
+        errors_path = options['errors'] or f'{path}.errors.csv'
+        checkpoint_path = options['checkpoint'] or f'{path}.checkpoint'
+        if batch_size < 1:
+            raise CommandError('--batch-size must be positive')
+        if not os.path.exists(path):
+            raise CommandError(f'File not found: {path}')
+
+        done = 0
+        if options['resume'] and os.path.exists(checkpoint_path):
+            with open(checkpoint_path, encoding='utf-8') as f:
+                checkpoint = json.load(f)
+            if checkpoint['file'] != os.path.abspath(path):
+                raise CommandError(f'Checkpoint {checkpoint_path} belongs to {checkpoint["file"]}')
+            done = checkpoint['rows']
+
+        # Town names (Hebrew or English) -> location id, for the optional location column
+        self.towns = {}
+        for location_id, name_he, name_en in Location.objects.values_list('id', 'name_he', 'name_en'):
+            self.towns[name_he] = location_id
+            self.towns[name_en.lower()] = location_id
+
+        started = time.perf_counter()
+        created, failed = 0, 0
+        append = done > 0 and os.path.exists(errors_path)
+
+        with open(path, newline='', encoding='utf-8-sig') as source, \
+                open(errors_path, 'a' if append else 'w', newline='', encoding='utf-8-sig') as report:
+            reader = csv.DictReader(source)
+            missing = [column for column in REQUIRED_COLUMNS if column not in (reader.fieldnames or [])]
+            if missing:
+                raise CommandError(f'Missing columns: {", ".join(missing)}')
+
+            errors = csv.writer(report)
+            if not append:
+                errors.writerow(['line', 'national_id', 'errors'])
+
+            rows_seen = 0
+            batch = []
+            for row in reader:
+                rows_seen += 1
+                if rows_seen <= done:
+                    continue
+                batch.append((reader.line_num, row))
+                if len(batch) >= batch_size:
+                    batch_created, batch_failed = self.import_batch(batch, errors)
+                    created += batch_created
+                    failed += batch_failed
+                    self.save_checkpoint(checkpoint_path, path, rows_seen)
+                    report.flush()
+                    batch = []
+
+            if batch:
+                batch_created, batch_failed = self.import_batch(batch, errors)
+                created += batch_created
+                failed += batch_failed
+                self.save_checkpoint(checkpoint_path, path, rows_seen)
+
+        # bulk_create sends no post_save signals. The versions live in the shared cache
+        # (settings.CACHES), so the web workers drop their donor counts and live stats too
+        if created:
+            bump_counts_version()
+            bump_stats_version()
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Imported {created} donors in {elapsed:.1f}s, {failed} rows rejected '
+            f'(see {errors_path}), {done} rows skipped from the checkpoint'
+        ))
+
+    def build_donor(self, row):
+        """Unsaved Donor for a CSV row; raises ValidationError with every problem found"""
+        values = {}
+        for column in REQUIRED_COLUMNS + OPTIONAL_COLUMNS:
+            value = (row.get(column) or '').strip()
+            if value:
+                values[column] = value
+
+        problems = []
+        for column in DATE_COLUMNS:
+            if column in values:
+                try:
+                    values[column] = parse_date(values[column])
+                except ValidationError as e:
+                    problems.extend(e.messages)
+                    del values[column]
+
+        if 'has_chronic_illness' in values:
+            flag = values['has_chronic_illness'].lower()
+            if flag not in TRUE_VALUES | FALSE_VALUES:
+                problems.append(f'has_chronic_illness: ערך לא תקין {flag}')
+            values['has_chronic_illness'] = flag in TRUE_VALUES
+
+        town = values.pop('location', None)
+        if town:
+            values['location_id'] = self.towns.get(town) or self.towns.get(town.lower())
+            if values['location_id'] is None:
+                problems.append(f'location: יישוב לא מוכר {town}')
+
+        donor = Donor(**values)
+        # Field validators (validate_israeli_id, validate_israeli_phone, choices, lengths) of
+        # the columns given, and the model's own rules, without the uniqueness queries of full_clean()
+        checked = set(REQUIRED_COLUMNS) | (values.keys() - {'location_id'})
+        try:
+            donor.clean_fields(exclude=[field.name for field in Donor._meta.fields if field.name not in checked])
+        except ValidationError as e:
+            problems.extend(
+                f'{field}: {message}' for field, messages in e.message_dict.items() for message in messages
+            )
+        try:
+            donor.clean()
+        except ValidationError as e:
+            problems.extend(e.messages)
+
+        if problems:
+            raise ValidationError(problems)
+        return donor
+
+    def import_batch(self, batch, errors):
+        """Validate and insert one batch; returns (created, rejected)"""
+        valid, rejected = [], []
+        seen_ids, seen_phones = set(), set()
+        for line, row in batch:
+            try:
+                donor = self.build_donor(row)
+            except ValidationError as e:
+                rejected.append((line, row.get('national_id', ''), '; '.join(e.messages)))
+                continue
+
+            key = phone_key(donor.phone_number)
+            if donor.national_id in seen_ids or key in seen_phones:
+                rejected.append((line, donor.national_id, 'כפילות בקובץ: תעודת זהות או טלפון'))
+                continue
+            seen_ids.add(donor.national_id)
+            seen_phones.add(key)
+            valid.append((line, donor, key))
+
+        # Uniqueness for the whole batch in one query (every spelling of each phone number)
+        existing_ids, existing_phones = set(), set()
+        for start in range(0, len(valid), LOOKUP_CHUNK):
+            chunk = [donor for _, donor, _ in valid[start:start + LOOKUP_CHUNK]]
+            phones = [
+                variant
+                for donor in chunk
+                for variant in (phone_variants(donor.phone_number) or [donor.phone_number])
+            ]
+            for national_id, phone in Donor.objects.order_by().filter(
+                Q(national_id__in=[donor.national_id for donor in chunk]) | Q(phone_number__in=phones)
+            ).values_list('national_id', 'phone_number'):
+                existing_ids.add(national_id)
+                existing_phones.add(phone_key(phone))
+
+        donors = []
+        for line, donor, key in valid:
+            if donor.national_id in existing_ids:
+                rejected.append((line, donor.national_id, 'תורם עם תעודת זהות זו כבר קיים'))
+            elif key in existing_phones:
+                rejected.append((line, donor.national_id, 'תורם עם מספר טלפון זה כבר קיים'))
+            else:
+                donors.append(donor)
+
+        try:
+            with transaction.atomic():
+                Donor.objects.bulk_create(donors)
+        except IntegrityError as e:
+            # Another writer inserted one of these donors after the lookup
+            raise CommandError(f'Batch ending at line {batch[-1][0]} failed ({e}); rerun with --resume')
+
+        errors.writerows(sorted(rejected))
+        return len(donors), len(rejected)
+
+    def save_checkpoint(self, checkpoint_path, path, rows):
+        """Rows (not lines) of `path` already committed, written atomically"""
+        tmp_path = f'{checkpoint_path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'file': os.path.abspath(path), 'rows': rows}, f)
+        os.replace(tmp_path, checkpoint_path)
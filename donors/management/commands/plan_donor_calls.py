@@ -0,0 +1,39 @@
+# donors/management/commands/plan_donor_calls.py
+import time
+from django.core.management.base import BaseCommand
+from donors.utils.call_plan import build_call_plan
+
+class Command(BaseCommand):
+    help = 'Builds one donor call plan for all open blood requests (min-cost assignment of donors to missing units)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--quiet',
+            action='store_true',
+            help='Print only the summary'
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        plan = build_call_plan()
+        elapsed = time.perf_counter() - started
+        
+        if not options['quiet']:
+            for item in plan['requests']:
+                blood_request = item['request']
+                self.stdout.write(
+                    f"#{blood_request.pk} {blood_request.patient_name} "
+                    f"[{blood_request.blood_type_needed}, {blood_request.priority}] "
+                    f"{len(item['donors'])}/{item['missing']} units"
+                )
+                for donor, distance in item['donors']:
+                    distance_text = f'{distance} km' if distance is not None else 'unknown distance'
+                    self.stdout.write(
+                        f"    {donor.first_name} {donor.last_name} ({donor.blood_type}) "
+                        f"{donor.phone_number} - {distance_text}"
+                    )
+        
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {plan['assigned']}/{plan['units']} missing units assigned "
+            f"from {plan['donors_considered']} eligible donors in {elapsed:.2f}s"
+        ))
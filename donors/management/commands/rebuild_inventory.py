@@ -0,0 +1,27 @@
+# donors/management/commands/rebuild_inventory.py
+from django.core.management.base import BaseCommand
+from donors.models import InventoryLevel
+
+class Command(BaseCommand):
+    help = 'Reconciles the InventoryLevel counters with the available blood units'
+
+    def handle(self, *args, **options):
+        before = {
+            level.blood_type: (level.units, level.volume_ml)
+            for level in InventoryLevel.objects.all()
+        }
+        
+        InventoryLevel.rebuild()
+        
+        drifted = 0
+        for level in InventoryLevel.objects.all():
+            previous = before.get(level.blood_type)
+            if previous != (level.units, level.volume_ml):
+                drifted += 1
+                self.stdout.write(
+                    f'  {level.blood_type}: {previous} -> ({level.units}, {level.volume_ml})'
+                )
+        
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Inventory rebuilt: {drifted} blood types corrected'
+        ))
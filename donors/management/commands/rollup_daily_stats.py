@@ -0,0 +1,35 @@
+# donors/management/commands/rollup_daily_stats.py
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from donors.models import DailyBloodStats
+from donors.utils.rollups import rollup_daily_stats
+
+class Command(BaseCommand):
+    help = 'Rolls up daily supply/demand statistics for the days not yet processed'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--until',
+            help='Last day to roll up (YYYY-MM-DD). Default: yesterday'
+        )
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='Delete all existing rollups and recompute the full history'
+        )
+
+    def handle(self, *args, **options):
+        until = None
+        if options['until']:
+            try:
+                until = date.fromisoformat(options['until'])
+            except ValueError:
+                raise CommandError('--until must be in YYYY-MM-DD format')
+        
+        if options['rebuild']:
+            deleted, _ = DailyBloodStats.objects.all().delete()
+            self.stdout.write(f'🗑️  Deleted {deleted} existing rollup rows')
+        
+        days = rollup_daily_stats(until=until)
+        
+        self.stdout.write(self.style.SUCCESS(f'✅ Rolled up {days} days'))
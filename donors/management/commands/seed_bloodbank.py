@@ -1,7 +1,7 @@
 # donors/management/commands/seed_bloodbank.py
 from django.core.management.base import BaseCommand
 from django.contrib.auth.models import User
-from donors.models import Donor, Donation, BloodRequest, Profile
+from donors.models import BloodUnit, Donor, Donation, BloodRequest, Profile
 from datetime import date, timedelta
 import random
 
@@ -13,6 +13,8 @@ class Command(BaseCommand):
         
         # Reset everything
         self.stdout.write('🗑️  מוחק נתונים קיימים...')
+        # Bags protect their donations; they go first
+        BloodUnit.objects.all().delete()
         Donation.objects.all().delete()
         BloodRequest.objects.all().delete()
         Donor.objects.all().delete()
@@ -0,0 +1,39 @@
+# donors/management/commands/send_outbox.py
+import time
+from django.core.management.base import BaseCommand
+from donors.utils.alert_dispatch import complete_finished_campaigns
+from donors.utils.email_service import OUTBOX_BATCH_SIZE, drain_outbox
+
+class Command(BaseCommand):
+    help = 'Sends queued outbox emails in batches over a single SMTP connection per batch'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=OUTBOX_BATCH_SIZE,
+            help='Emails per SMTP session'
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep running and poll the outbox'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=5,
+            help='Seconds between polls with --loop'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            sent, failed = drain_outbox(batch_size=options['batch_size'])
+            complete_finished_campaigns()
+            
+            if sent or failed or not options['loop']:
+                self.stdout.write(self.style.SUCCESS(f'✅ Outbox: {sent} sent, {failed} failed (will retry or gave up)'))
+            
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,29 @@
+# Generated by Django 5.0.13 on 2026-10-17 04:02
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('donors', '0004_location_userlocation'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='donor',
+            name='last_donation_date',
+            field=models.DateField(blank=True, editable=False, null=True, verbose_name='תאריך תרומה אחרונה'),
+        ),
+        migrations.AddField(
+            model_name='donor',
+            name='next_eligible_date',
+            field=models.DateField(blank=True, editable=False, help_text='ריק = זכאי לתרום מיד', null=True, verbose_name='זכאי לתרום החל מ'),
+        ),
+        migrations.AddIndex(
+            model_name='donor',
+            index=models.Index(fields=['blood_type', 'next_eligible_date'], name='donors_dono_blood_t_54dd1b_idx'),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.0.13 on 2026-10-17 04:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def create_units_for_approved_donations(apps, schema_editor):
+    """Every approved donation still on the books becomes one available bag"""
+    Donation = apps.get_model('donors', 'Donation')
+    BloodUnit = apps.get_model('donors', 'BloodUnit')
+    
+    donations = Donation.objects.filter(is_approved=True).values_list(
+        'id', 'donor__blood_type', 'volume_ml', 'donation_date'
+    )
+    BloodUnit.objects.bulk_create(
+        (
+            BloodUnit(
+                donation_id=donation_id,
+                blood_type=blood_type,
+                volume_ml=volume_ml,
+                collected_at=donation_date,
+            )
+            for donation_id, blood_type, volume_ml, donation_date in donations.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('donors', '0005_donor_last_donation_date_donor_next_eligible_date_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BloodUnit',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('blood_type', models.CharField(choices=[('A+', 'A+'), ('A-', 'A-'), ('B+', 'B+'), ('B-', 'B-'), ('AB+', 'AB+'), ('AB-', 'AB-'), ('O+', 'O+'), ('O-', 'O-')], max_length=3, verbose_name='סוג דם')),
+                ('volume_ml', models.PositiveSmallIntegerField(verbose_name='נפח (מ"ל)')),
+                ('collected_at', models.DateField(verbose_name='תאריך איסוף')),
+                ('status', models.CharField(choices=[('available', 'זמין'), ('reserved', 'שמור לבקשה'), ('issued', 'נופק')], default='available', max_length=10, verbose_name='סטטוס')),
+                ('reserved_at', models.DateTimeField(blank=True, null=True, verbose_name='תאריך שמירה')),
+                ('issued_at', models.DateTimeField(blank=True, null=True, verbose_name='תאריך ניפוק')),
+                ('blood_request', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='blood_units', to='donors.bloodrequest', verbose_name='בקשת דם')),
+                ('donation', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='blood_unit', to='donors.donation', verbose_name='תרומה')),
+            ],
+            options={
+                'verbose_name': 'מנת דם',
+                'verbose_name_plural': 'מנות דם',
+                'ordering': ['collected_at', 'id'],
+                'indexes': [models.Index(fields=['blood_type', 'status', 'collected_at'], name='donors_bloo_blood_t_537dcb_idx')],
+            },
+        ),
+        migrations.RunPython(create_units_for_approved_donations, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.0.13 on 2026-10-17 04:04
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def populate_inventory_levels(apps, schema_editor):
+    """Seed one counter row per blood type from the available units"""
+    BloodUnit = apps.get_model('donors', 'BloodUnit')
+    InventoryLevel = apps.get_model('donors', 'InventoryLevel')
+    
+    totals = {
+        row['blood_type']: row
+        for row in BloodUnit.objects.filter(status='available').order_by()
+        .values('blood_type')
+        .annotate(units=Count('id'), volume_ml=Sum('volume_ml'))
+    }
+    InventoryLevel.objects.bulk_create([
+        InventoryLevel(
+            blood_type=blood_type,
+            units=totals.get(blood_type, {}).get('units', 0),
+            volume_ml=totals.get(blood_type, {}).get('volume_ml') or 0,
+        )
+        for blood_type in ['A+', 'A-', 'B+', 'B-', 'AB+', 'AB-', 'O+', 'O-']
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('donors', '0006_bloodunit'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventoryLevel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('blood_type', models.CharField(choices=[('A+', 'A+'), ('A-', 'A-'), ('B+', 'B+'), ('B-', 'B-'), ('AB+', 'AB+'), ('AB-', 'AB-'), ('O+', 'O+'), ('O-', 'O-')], max_length=3, unique=True, verbose_name='סוג דם')),
+                ('units', models.IntegerField(default=0, verbose_name='מנות זמינות')),
+                ('volume_ml', models.IntegerField(default=0, verbose_name='נפח זמין (מ"ל)')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='עודכן ב')),
+            ],
+            options={
+                'verbose_name': 'רמת מלאי',
+                'verbose_name_plural': 'רמות מלאי',
+                'ordering': ['blood_type'],
+            },
+        ),
+        migrations.RunPython(populate_inventory_levels, migrations.RunPython.noop),
+    ]
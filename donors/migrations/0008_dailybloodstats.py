@@ -0,0 +1,32 @@
+# Generated by Django 5.0.13 on 2026-10-17 04:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('donors', '0007_inventorylevel'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyBloodStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='תאריך')),
+                ('blood_type', models.CharField(choices=[('A+', 'A+'), ('A-', 'A-'), ('B+', 'B+'), ('B-', 'B-'), ('AB+', 'AB+'), ('AB-', 'AB-'), ('O+', 'O+'), ('O-', 'O-')], max_length=3, verbose_name='סוג דם')),
+                ('requests_count', models.PositiveIntegerField(default=0, verbose_name='מספר בקשות')),
+                ('units_requested', models.PositiveIntegerField(default=0, verbose_name='מנות שהתבקשו')),
+                ('units_donated', models.PositiveIntegerField(default=0, verbose_name='מנות שנתרמו')),
+                ('units_issued', models.PositiveIntegerField(default=0, verbose_name='מנות שנופקו')),
+                ('closing_stock', models.IntegerField(default=0, verbose_name='מלאי בסוף היום')),
+            ],
+            options={
+                'verbose_name': 'סטטיסטיקה יומית',
+                'verbose_name_plural': 'סטטיסטיקות יומיות',
+                'ordering': ['date', 'blood_type'],
+                'unique_together': {('date', 'blood_type')},
+            },
+        ),
+    ]
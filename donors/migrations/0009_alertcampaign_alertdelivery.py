@@ -0,0 +1,56 @@
+# Generated by Django 5.0.13 on 2026-10-17 04:12
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('donors', '0008_dailybloodstats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlertCampaign',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('blood_type', models.CharField(choices=[('A+', 'A+'), ('A-', 'A-'), ('B+', 'B+'), ('B-', 'B-'), ('AB+', 'AB+'), ('AB-', 'AB-'), ('O+', 'O+'), ('O-', 'O-')], max_length=3, verbose_name='סוג דם נדרש')),
+                ('emergency_type', models.CharField(max_length=20, verbose_name='סוג חירום')),
+                ('subject', models.CharField(max_length=200, verbose_name='נושא')),
+                ('custom_message', models.TextField(blank=True, verbose_name='הודעה מותאמת')),
+                ('status', models.CharField(choices=[('queued', 'בתור'), ('sending', 'בשליחה'), ('completed', 'הושלם')], default='queued', max_length=10, verbose_name='סטטוס')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='נוצר בתאריך')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='הסתיים בתאריך')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='alert_campaigns', to=settings.AUTH_USER_MODEL, verbose_name='נוצר על ידי')),
+            ],
+            options={
+                'verbose_name': 'קמפיין התראות',
+                'verbose_name_plural': 'קמפייני התראות',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='AlertDelivery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('email', models.EmailField(max_length=254, verbose_name='אימייל')),
+                ('message', models.TextField(verbose_name='תוכן ההודעה')),
+                ('status', models.CharField(choices=[('pending', 'ממתין'), ('sent', 'נשלח בהצלחה'), ('failed', 'נכשל')], default='pending', max_length=10, verbose_name='סטטוס')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='ניסיונות שליחה')),
+                ('last_error', models.TextField(blank=True, verbose_name='שגיאה אחרונה')),
+                ('sent_at', models.DateTimeField(blank=True, null=True, verbose_name='נשלח בתאריך')),
+                ('campaign', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='deliveries', to='donors.alertcampaign', verbose_name='קמפיין')),
+                ('donor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alert_deliveries', to='donors.donor', verbose_name='תורם')),
+            ],
+            options={
+                'verbose_name': 'משלוח התראה',
+                'verbose_name_plural': 'משלוחי התראות',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['campaign', 'status'], name='donors_aler_campaig_c3d870_idx')],
+                'unique_together': {('campaign', 'donor')},
+            },
+        ),
+    ]
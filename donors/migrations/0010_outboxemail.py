@@ -0,0 +1,93 @@
+# Generated by Django 5.0.13 on 2026-10-17 04:14
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def move_deliveries_to_outbox(apps, schema_editor):
+    """Existing alert deliveries keep their message and sending state on an outbox row"""
+    AlertDelivery = apps.get_model('donors', 'AlertDelivery')
+    OutboxEmail = apps.get_model('donors', 'OutboxEmail')
+    
+    for delivery in AlertDelivery.objects.select_related('campaign').iterator():
+        delivery.outbox_email = OutboxEmail.objects.create(
+            subject=delivery.campaign.subject,
+            body=delivery.message,
+            to_email=delivery.email,
+            status=delivery.status,
+            attempts=delivery.attempts,
+            last_error=delivery.last_error,
+            sent_at=delivery.sent_at,
+        )
+        delivery.save(update_fields=['outbox_email'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('donors', '0009_alertcampaign_alertdelivery'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxEmail',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subject', models.CharField(max_length=255, verbose_name='נושא')),
+                ('body', models.TextField(verbose_name='תוכן')),
+                ('to_email', models.EmailField(max_length=254, verbose_name='נמען')),
+                ('attachment_path', models.CharField(blank=True, max_length=500, verbose_name='קובץ מצורף')),
+                ('status', models.CharField(choices=[('pending', 'ממתין'), ('sending', 'בשליחה'), ('sent', 'נשלח בהצלחה'), ('failed', 'נכשל')], default='pending', max_length=10, verbose_name='סטטוס')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='ניסיונות שליחה')),
+                ('last_error', models.TextField(blank=True, verbose_name='שגיאה אחרונה')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='נוצר בתאריך')),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='ניסיון הבא')),
+                ('claimed_at', models.DateTimeField(blank=True, null=True, verbose_name='נלקח לשליחה בתאריך')),
+                ('sent_at', models.DateTimeField(blank=True, null=True, verbose_name='נשלח בתאריך')),
+            ],
+            options={
+                'verbose_name': 'אימייל יוצא',
+                'verbose_name_plural': 'אימיילים יוצאים',
+                'ordering': ['id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='outboxemail',
+            index=models.Index(fields=['status', 'next_attempt_at'], name='donors_outb_status_e20738_idx'),
+        ),
+        migrations.AddField(
+            model_name='alertdelivery',
+            name='outbox_email',
+            field=models.OneToOneField(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='alert_delivery', to='donors.outboxemail', verbose_name='אימייל יוצא'),
+        ),
+        migrations.RunPython(move_deliveries_to_outbox, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='alertdelivery',
+            name='donors_aler_campaig_c3d870_idx',
+        ),
+        migrations.RemoveField(
+            model_name='alertdelivery',
+            name='attempts',
+        ),
+        migrations.RemoveField(
+            model_name='alertdelivery',
+            name='email',
+        ),
+        migrations.RemoveField(
+            model_name='alertdelivery',
+            name='last_error',
+        ),
+        migrations.RemoveField(
+            model_name='alertdelivery',
+            name='message',
+        ),
+        migrations.RemoveField(
+            model_name='alertdelivery',
+            name='sent_at',
+        ),
+        migrations.RemoveField(
+            model_name='alertdelivery',
+            name='status',
+        ),
+    ]
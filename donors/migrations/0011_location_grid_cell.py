@@ -0,0 +1,36 @@
+# Generated by Django 5.0.13 on 2026-10-17 04:16
+
+from math import floor
+
+from django.db import migrations, models
+
+# Frozen copy of GRID_CELL_DEG / GRID_COLS from donors.models
+GRID_CELL_DEG = 0.1
+GRID_COLS = 3600
+
+
+def fill_grid_cells(apps, schema_editor):
+    Location = apps.get_model('donors', 'Location')
+    
+    locations = list(Location.objects.all())
+    for location in locations:
+        row = floor((float(location.latitude) + 90) / GRID_CELL_DEG)
+        col = floor((float(location.longitude) + 180) / GRID_CELL_DEG)
+        location.grid_cell = row * GRID_COLS + col
+    Location.objects.bulk_update(locations, ['grid_cell'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('donors', '0010_outboxemail'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='location',
+            name='grid_cell',
+            field=models.IntegerField(db_index=True, editable=False, help_text='מחושב אוטומטית מהקואורדינטות', null=True, verbose_name='תא רשת'),
+        ),
+        migrations.RunPython(fill_grid_cells, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.0.13 on 2026-10-17 04:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('donors', '0011_location_grid_cell'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='donor',
+            name='location',
+            field=models.ForeignKey(blank=True, help_text='מתעדכן אוטומטית ממיקום המשתמש המקושר', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='donors', to='donors.location', verbose_name='יישוב'),
+        ),
+    ]
@@ -0,0 +1,84 @@
+# Full-text donor search index (SQLite FTS5), kept in sync by triggers
+
+from django.db import migrations
+
+# Phone numbers are indexed as digits in local form (+972-50-1234567 -> 0501234567)
+PHONE_DIGITS = (
+    "CASE WHEN replace(replace({col}, '-', ''), '+', '') LIKE '972%' "
+    "THEN '0' || substr(replace(replace({col}, '-', ''), '+', ''), 4) "
+    "ELSE replace(replace({col}, '-', ''), '+', '') END"
+)
+
+
+def indexed_values(row):
+    return (
+        f"{row}.id, {row}.first_name, {row}.last_name, {row}.national_id, "
+        f"{PHONE_DIGITS.format(col=f'{row}.phone_number')}, {row}.email"
+    )
+
+
+CREATE_SQL = [
+    """
+    CREATE VIRTUAL TABLE donors_donor_fts USING fts5(
+        first_name, last_name, national_id, phone, email,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )
+    """,
+    f"""
+    INSERT INTO donors_donor_fts (rowid, first_name, last_name, national_id, phone, email)
+    SELECT {indexed_values('donors_donor')} FROM donors_donor
+    """,
+    f"""
+    CREATE TRIGGER donors_donor_fts_insert AFTER INSERT ON donors_donor BEGIN
+        INSERT INTO donors_donor_fts (rowid, first_name, last_name, national_id, phone, email)
+        VALUES ({indexed_values('new')});
+    END
+    """,
+    f"""
+    CREATE TRIGGER donors_donor_fts_update
+    AFTER UPDATE OF id, first_name, last_name, national_id, phone_number, email ON donors_donor BEGIN
+        DELETE FROM donors_donor_fts WHERE rowid = old.id;
+        INSERT INTO donors_donor_fts (rowid, first_name, last_name, national_id, phone, email)
+        VALUES ({indexed_values('new')});
+    END
+    """,
+    """
+    CREATE TRIGGER donors_donor_fts_delete AFTER DELETE ON donors_donor BEGIN
+        DELETE FROM donors_donor_fts WHERE rowid = old.id;
+    END
+    """,
+]
+
+DROP_SQL = [
+    "DROP TRIGGER IF EXISTS donors_donor_fts_insert",
+    "DROP TRIGGER IF EXISTS donors_donor_fts_update",
+    "DROP TRIGGER IF EXISTS donors_donor_fts_delete",
+    "DROP TABLE IF EXISTS donors_donor_fts",
+]
+
+
+def create_search_index(apps, schema_editor):
+    # Other databases search with icontains (see utils/search.py)
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in CREATE_SQL:
+        schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in DROP_SQL:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('donors', '0012_donor_location'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
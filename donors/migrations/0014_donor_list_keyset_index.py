@@ -0,0 +1,19 @@
+# Generated by Django 5.0.13 on 2026-10-17 04:27
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('donors', '0013_donor_search_fts'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='donor',
+            index=models.Index(fields=['last_name', 'first_name', 'id'], name='donors_dono_last_na_2f0fdc_idx'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.0.13 on 2026-10-17 04:38
+
+from django.db import migrations, models
+
+
+def mark_existing_reports_completed(apps, schema_editor):
+    # Reports saved before background rendering already have their file
+    UserReport = apps.get_model('donors', 'UserReport')
+    UserReport.objects.exclude(pdf_file='').update(status='completed', progress=100)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('donors', '0014_donor_list_keyset_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userreport',
+            name='cache_key',
+            field=models.CharField(blank=True, db_index=True, max_length=64, verbose_name='Cache Key'),
+        ),
+        migrations.AddField(
+            model_name='userreport',
+            name='error',
+            field=models.TextField(blank=True, verbose_name='Error'),
+        ),
+        migrations.AddField(
+            model_name='userreport',
+            name='finished_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Finished At'),
+        ),
+        migrations.AddField(
+            model_name='userreport',
+            name='progress',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='Progress (%)'),
+        ),
+        migrations.AddField(
+            model_name='userreport',
+            name='status',
+            field=models.CharField(choices=[('queued', 'Queued'), ('rendering', 'Rendering'), ('completed', 'Completed'), ('failed', 'Failed')], default='queued', max_length=10, verbose_name='Status'),
+        ),
+        migrations.AlterField(
+            model_name='userreport',
+            name='pdf_file',
+            field=models.FileField(blank=True, upload_to='user_reports/%Y/%m/%d/', verbose_name='PDF File'),
+        ),
+        migrations.RunPython(mark_existing_reports_completed, migrations.RunPython.noop),
+    ]
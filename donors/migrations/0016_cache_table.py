@@ -0,0 +1,20 @@
+# Generated by Django 5.0.13 on 2026-10-17 05:20
+
+from django.core.management import call_command
+from django.db import migrations
+
+
+def create_cache_table(apps, schema_editor):
+    # Table of the DatabaseCache in settings.CACHES (does nothing for other backends)
+    call_command('createcachetable', database=schema_editor.connection.alias, verbosity=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('donors', '0015_user_report_jobs'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_cache_table, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.0.13 on 2026-10-17 05:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('donors', '0016_cache_table'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='bloodunit',
+            name='donation',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.PROTECT, related_name='blood_unit', to='donors.donation', verbose_name='תרומה'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.0.13 on 2026-10-17 05:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('donors', '0017_blood_unit_protect_donation'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='userreport',
+            name='email_sent',
+        ),
+        migrations.AddField(
+            model_name='userreport',
+            name='email',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='user_reports', to='donors.outboxemail', verbose_name='Email'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.0.13 on 2026-10-17 05:30
+
+from datetime import timedelta
+
+from django.db import migrations
+from django.db.models import Max
+
+# Donor.DONATION_INTERVAL_DAYS when the eligibility columns were added
+DONATION_INTERVAL_DAYS = 56
+BATCH_SIZE = 1000
+
+
+def backfill_eligibility(apps, schema_editor):
+    # Columns added by 0005 start NULL, which eligible() reads as "may donate now";
+    # fill them from the donations table (backfill_donor_eligibility repairs them later)
+    Donor = apps.get_model('donors', 'Donor')
+    Donation = apps.get_model('donors', 'Donation')
+
+    last_dates = (
+        Donation.objects.order_by()
+        .values('donor_id')
+        .annotate(last=Max('donation_date'))
+        .values_list('donor_id', 'last')
+    )
+    changed = []
+    for donor_id, last in last_dates.iterator(chunk_size=BATCH_SIZE):
+        changed.append(Donor(
+            id=donor_id,
+            last_donation_date=last,
+            next_eligible_date=last + timedelta(days=DONATION_INTERVAL_DAYS),
+        ))
+        if len(changed) >= BATCH_SIZE:
+            Donor.objects.bulk_update(changed, ['last_donation_date', 'next_eligible_date'])
+            changed = []
+    if changed:
+        Donor.objects.bulk_update(changed, ['last_donation_date', 'next_eligible_date'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('donors', '0018_user_report_outbox_email'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_eligibility, migrations.RunPython.noop),
+    ]
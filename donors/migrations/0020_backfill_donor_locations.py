@@ -0,0 +1,44 @@
+# Generated by Django 5.0.13 on 2026-10-17 05:40
+
+from django.db import migrations
+
+from donors.utils.towns import match_town, town_index
+
+BATCH_SIZE = 1000
+
+
+def backfill_locations(apps, schema_editor):
+    # Donor.location added by 0012 starts NULL: take the linked user's location, or the
+    # town the address names as whole words; anything else stays NULL
+    # (`backfill_donor_locations -v 2` lists those)
+    Donor = apps.get_model('donors', 'Donor')
+    Location = apps.get_model('donors', 'Location')
+    UserLocation = apps.get_model('donors', 'UserLocation')
+
+    user_locations = dict(UserLocation.objects.values_list('user_id', 'location_id'))
+    towns = town_index(Location.objects.values_list('id', 'name_he', 'name_en'))
+
+    changed = []
+    donors = Donor.objects.filter(location__isnull=True).only('id', 'user_id', 'address').order_by('id')
+    for donor in donors.iterator(chunk_size=BATCH_SIZE):
+        location_id = user_locations.get(donor.user_id) or match_town(donor.address, towns)
+        if location_id is None:
+            continue
+        donor.location_id = location_id
+        changed.append(donor)
+        if len(changed) >= BATCH_SIZE:
+            Donor.objects.bulk_update(changed, ['location'])
+            changed = []
+    if changed:
+        Donor.objects.bulk_update(changed, ['location'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('donors', '0019_backfill_donor_eligibility'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_locations, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.0.13 on 2026-10-17 05:27
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('donors', '0020_backfill_donor_locations'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='location',
+            name='grid_cell',
+        ),
+    ]
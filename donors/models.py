@@ -3,7 +3,7 @@ from django.db import models
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator, EmailValidator, RegexValidator
 from django.core.exceptions import ValidationError
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from datetime import date, timedelta
 from django.utils import timezone
@@ -161,6 +161,110 @@ def save_user_profile(sender, instance, **kwargs):
     instance.profile.save()
 
 
+# =====================
+# BLOOD TYPE COMPATIBILITY
+# =====================
+# Recipient blood type -> donor blood types it can receive
+COMPATIBLE = {
+    'O-': ['O-'],
+    'O+': ['O-', 'O+'],
+    'A-': ['O-', 'A-'],
+    'A+': ['O-', 'O+', 'A-', 'A+'],
+    'B-': ['O-', 'B-'],
+    'B+': ['O-', 'O+', 'B-', 'B+'],
+    'AB-': ['O-', 'A-', 'B-', 'AB-'],
+    'AB+': ['O-', 'O+', 'A-', 'A+', 'B-', 'B+', 'AB-', 'AB+'],
+}
+
+
+# =====================
+# SQL DISTANCE
+# =====================
+EARTH_RADIUS_KM = 6371.0
+
+
+class HaversineKm(models.Func):
+    """
+    Great-circle distance in km between two coordinates, computed by the database.
+    SQLite uses the haversine_km() function registered on each connection
+    (utils/geo.py); other backends get the formula spelled out in SQL.
+    """
+    function = 'haversine_km'
+    arity = 4
+    output_field = models.FloatField()
+
+    def as_sql(self, compiler, connection, **extra_context):
+        (lat1, lat1_params), (lon1, lon1_params), (lat2, lat2_params), (lon2, lon2_params) = [
+            compiler.compile(expression) for expression in self.get_source_expressions()
+        ]
+        sql = (
+            f'(2 * {EARTH_RADIUS_KM} * ASIN(SQRT('
+            f'POWER(SIN((RADIANS({lat2}) - RADIANS({lat1})) / 2), 2) + '
+            f'COS(RADIANS({lat1})) * COS(RADIANS({lat2})) * '
+            f'POWER(SIN((RADIANS({lon2}) - RADIANS({lon1})) / 2), 2))))'
+        )
+        params = (
+            *lat2_params, *lat1_params, *lat1_params, *lat2_params, *lon2_params, *lon1_params
+        )
+        return sql, params
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return super().as_sql(compiler, connection, **extra_context)
+
+
+def within_km_filter(queryset, latitude_field, longitude_field, point, km):
+    """
+    Annotate `distance_km` from `point` (a Location or a (latitude, longitude) pair),
+    keep rows within `km` and order them nearest first. A bounding box on the raw
+    coordinates runs before the distance is computed, so slicing the result gives
+    ORDER BY distance_km LIMIT n in the database.
+    """
+    from .utils.geo import bounding_box
+
+    if hasattr(point, 'latitude'):
+        latitude, longitude = float(point.latitude), float(point.longitude)
+    else:
+        latitude, longitude = map(float, point)
+
+    min_lat, max_lat, min_lon, max_lon = bounding_box(latitude, longitude, km)
+    return queryset.filter(**{
+        f'{latitude_field}__range': (min_lat, max_lat),
+        f'{longitude_field}__range': (min_lon, max_lon),
+    }).annotate(
+        distance_km=HaversineKm(
+            models.Value(latitude), models.Value(longitude),
+            models.F(latitude_field), models.F(longitude_field)
+        )
+    ).filter(distance_km__lte=km).order_by('distance_km')
+
+
+# =====================
+# DONOR QUERYSET
+# =====================
+class DonorQuerySet(models.QuerySet):
+    """
+    Query helpers for donors.
+    Eligibility filters run on the denormalized next_eligible_date column
+    (indexed together with blood_type) instead of per-donor donation lookups.
+    """
+
+    def eligible(self, on=None):
+        """Donors allowed to donate on the given date (default: today)"""
+        on = on or date.today()
+        return self.filter(
+            models.Q(next_eligible_date__isnull=True) | models.Q(next_eligible_date__lte=on)
+        )
+
+    def ineligible(self, on=None):
+        """Donors still inside the waiting period on the given date (default: today)"""
+        on = on or date.today()
+        return self.filter(next_eligible_date__gt=on)
+
+    def within_km(self, point, km):
+        """Donors whose location is within km of point, nearest first (annotates distance_km)"""
+        return within_km_filter(self, 'location__latitude', 'location__longitude', point, km)
+
+
 # =====================
 # DONOR MODEL (Patient + Donor)
 # =====================
@@ -176,6 +280,9 @@ class Donor(models.Model):
     - Automatic eligibility checks
     - Israeli-specific validation
     """
+    # Minimum days between two donations
+    DONATION_INTERVAL_DAYS = 56
+
     # Blood Type Choices
     BLOOD_TYPES = [
         ('A+', _('A+')), ('A-', _('A-')), ('B+', _('B+')), ('B-', _('B-')),
@@ -310,6 +417,33 @@ class Donor(models.Model):
         help_text=_("תאריך הבדיקה הרפואית האחרונה - לא יכול להיות בעתיד")
     )
 
+    # Donation Eligibility (denormalized, maintained by Donation.save/delete)
+    last_donation_date = models.DateField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name=_("תאריך תרומה אחרונה")
+    )
+    
+    next_eligible_date = models.DateField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name=_("זכאי לתרום החל מ"),
+        help_text=_("ריק = זכאי לתרום מיד")
+    )
+
+    # Location (denormalized from the user's UserLocation, or set directly for donors without an account)
+    location = models.ForeignKey(
+        'Location',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='donors',
+        verbose_name=_("יישוב"),
+        help_text=_("מתעדכן אוטומטית ממיקום המשתמש המקושר")
+    )
+
     # System Fields
     created_at = models.DateTimeField(
         auto_now_add=True,
@@ -321,6 +455,8 @@ class Donor(models.Model):
         verbose_name=_("עודכן ב")
     )
     
+    objects = DonorQuerySet.as_manager()
+    
     class Meta:
         verbose_name = _("תורם")
         verbose_name_plural = _("תורמים")
@@ -328,6 +464,9 @@ class Donor(models.Model):
         indexes = [
             models.Index(fields=['blood_type']),
             models.Index(fields=['national_id']),
+            models.Index(fields=['blood_type', 'next_eligible_date']),
+            # Keyset pagination of the donor list
+            models.Index(fields=['last_name', 'first_name', 'id']),
         ]
 
     def __str__(self):
@@ -348,29 +487,21 @@ class Donor(models.Model):
         """Calculate total blood donated in milliliters"""
         return self.donations.aggregate(total=Sum('volume_ml'))['total'] or 0
     
-    @property 
-    def last_donation_date(self):
-        """Get date of last donation"""
-        last = self.donations.order_by('-donation_date').first()
-        return last.donation_date if last else None
-    
     @property
     def can_donate(self):
         """Check if donor can donate based on 56-day rule"""
-        if not self.last_donation_date:
+        if not self.next_eligible_date:
             return True
         
-        days_since_last = (date.today() - self.last_donation_date).days
-        return days_since_last >= 56
+        return self.next_eligible_date <= date.today()
     
     @property
     def days_until_next_donation(self):
         """Calculate days remaining until next allowed donation"""
-        if not self.last_donation_date:
+        if not self.next_eligible_date:
             return 0
             
-        days_passed = (date.today() - self.last_donation_date).days
-        return max(0, 56 - days_passed)
+        return max(0, (self.next_eligible_date - date.today()).days)
     
     @property
     def total_donation_units(self):
@@ -400,8 +531,32 @@ class Donor(models.Model):
     def save(self, *args, **kwargs):
         """Custom save method with additional validation"""
         self.full_clean()
+        if self.location_id is None and self.user_id:
+            # Donor linked to an account: take the location the user chose
+            self.location_id = UserLocation.objects.filter(user_id=self.user_id).values_list(
+                'location_id', flat=True
+            ).first()
         super().save(*args, **kwargs)
 
+    @classmethod
+    def eligibility_from(cls, last_donation_date):
+        """Return (last_donation_date, next_eligible_date) for a last donation date"""
+        if not last_donation_date:
+            return None, None
+        return last_donation_date, last_donation_date + timedelta(days=cls.DONATION_INTERVAL_DAYS)
+
+    def refresh_eligibility(self):
+        """
+        Recompute last_donation_date / next_eligible_date from the donations table.
+        Written with a single UPDATE so it skips full_clean() and updated_at.
+        """
+        last = self.donations.aggregate(last=Max('donation_date'))['last']
+        self.last_donation_date, self.next_eligible_date = self.eligibility_from(last)
+        Donor.objects.filter(pk=self.pk).update(
+            last_donation_date=self.last_donation_date,
+            next_eligible_date=self.next_eligible_date,
+        )
+
 
 # =====================
 # DONATION MODEL
@@ -489,7 +644,7 @@ class Donation(models.Model):
         last_donation = Donation.objects.filter(
             donor=self.donor,
             donation_date__lt=self.donation_date
-        ).order_by('-donation_date').first()
+        ).exclude(pk=self.pk).order_by('-donation_date').first()
         
         if last_donation and (self.donation_date - last_donation.donation_date) < timedelta(days=56):
             self.is_approved = False
@@ -505,6 +660,49 @@ class Donation(models.Model):
                 self.created_by = self.donor.user
         
         super().save(*args, **kwargs)
+        
+        # Keep the donor's eligibility columns in sync
+        self.donor.refresh_eligibility()
+        
+        # Approved donations become a bag in the inventory
+        self.sync_blood_unit()
+
+    def sync_blood_unit(self):
+        """
+        Keep the donation's BloodUnit in line with its approval status.
+        Approved donations get exactly one bag, updated when the donation is edited;
+        un-approving drops a bag that was never used.
+        """
+        if self.is_approved:
+            values = {
+                'blood_type': self.donor.blood_type,
+                'volume_ml': self.volume_ml,
+                'collected_at': self.donation_date,
+            }
+            unit, created = BloodUnit.objects.get_or_create(donation=self, defaults=values)
+            changed = [field for field, value in values.items() if getattr(unit, field) != value]
+            if not created and changed:
+                if unit.status == BloodUnit.STATUS_AVAILABLE:
+                    # Move the bag between the stock counters
+                    InventoryLevel.adjust(unit.blood_type, -1, -unit.volume_ml)
+                    InventoryLevel.adjust(values['blood_type'], 1, values['volume_ml'])
+                for field in changed:
+                    setattr(unit, field, values[field])
+                unit.save(update_fields=changed)
+        else:
+            BloodUnit.objects.filter(donation=self, status=BloodUnit.STATUS_AVAILABLE).delete()
+
+    def delete(self, *args, **kwargs):
+        """
+        Delete the donation and recompute the donor's eligibility columns.
+        A bag that was never used goes with it; a reserved or issued bag keeps the
+        donation (ProtectedError), so the allocation history is never lost.
+        """
+        donor = self.donor
+        BloodUnit.objects.filter(donation=self, status=BloodUnit.STATUS_AVAILABLE).delete()
+        result = super().delete(*args, **kwargs)
+        donor.refresh_eligibility()
+        return result
 
 
 # =====================
@@ -614,6 +812,11 @@ class BloodRequest(models.Model):
             return _("דחוף")
         return _("ממתין")
     
+    @property
+    def is_emergency(self):
+        """Served from O- only: flagged emergencies and every critical request"""
+        return self.emergency or self.priority == 'critical'
+    
     @property
     def is_overdue(self):
         """Check if request is overdue (normal requests > 7 days)"""
@@ -635,6 +838,240 @@ class BloodRequest(models.Model):
         
         super().save(*args, **kwargs)
 
+# =====================
+# BLOOD UNIT MODEL (one row per bag)
+# =====================
+class BloodUnit(models.Model):
+    """
+    A single bag of blood collected from an approved donation.
+    
+    Key Features:
+    - One row per bag, created automatically from approved donations
+    - Status workflow: available -> reserved (held for a request) -> issued
+    - FIFO allocation through donors/utils/allocation.py
+    - Donation rows stay untouched as donation history
+    """
+    STATUS_AVAILABLE = 'available'
+    STATUS_RESERVED = 'reserved'
+    STATUS_ISSUED = 'issued'
+    
+    STATUS_CHOICES = [
+        (STATUS_AVAILABLE, _('זמין')),
+        (STATUS_RESERVED, _('שמור לבקשה')),
+        (STATUS_ISSUED, _('נופק')),
+    ]
+    
+    donation = models.OneToOneField(
+        Donation,
+        on_delete=models.PROTECT,
+        related_name='blood_unit',
+        verbose_name=_("תרומה")
+    )
+    
+    blood_type = models.CharField(
+        max_length=3,
+        choices=Donor.BLOOD_TYPES,
+        verbose_name=_("סוג דם")
+    )
+    
+    volume_ml = models.PositiveSmallIntegerField(
+        verbose_name=_("נפח (מ\"ל)")
+    )
+    
+    collected_at = models.DateField(
+        verbose_name=_("תאריך איסוף")
+    )
+    
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default=STATUS_AVAILABLE,
+        verbose_name=_("סטטוס")
+    )
+    
+    blood_request = models.ForeignKey(
+        BloodRequest,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='blood_units',
+        verbose_name=_("בקשת דם")
+    )
+    
+    reserved_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name=_("תאריך שמירה")
+    )
+    
+    issued_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name=_("תאריך ניפוק")
+    )
+    
+    class Meta:
+        verbose_name = _("מנת דם")
+        verbose_name_plural = _("מנות דם")
+        ordering = ['collected_at', 'id']
+        indexes = [
+            models.Index(fields=['blood_type', 'status', 'collected_at']),
+        ]
+    
+    def __str__(self):
+        return f"#{self.id} {self.blood_type} - {self.collected_at} ({self.get_status_display()})"
+
+
+# =====================
+# INVENTORY LEVEL MODEL (materialized counters)
+# =====================
+class InventoryLevel(models.Model):
+    """
+    Materialized stock counters: one row per blood type.
+    
+    Key Features:
+    - Counts available BloodUnits (bags) and their volume
+    - Kept current by BloodUnit signal handlers and by the allocation service
+    - Reconciled from scratch with `python manage.py rebuild_inventory`
+    """
+    blood_type = models.CharField(
+        max_length=3,
+        choices=Donor.BLOOD_TYPES,
+        unique=True,
+        verbose_name=_("סוג דם")
+    )
+    
+    units = models.IntegerField(
+        default=0,
+        verbose_name=_("מנות זמינות")
+    )
+    
+    volume_ml = models.IntegerField(
+        default=0,
+        verbose_name=_("נפח זמין (מ\"ל)")
+    )
+    
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name=_("עודכן ב")
+    )
+    
+    class Meta:
+        verbose_name = _("רמת מלאי")
+        verbose_name_plural = _("רמות מלאי")
+        ordering = ['blood_type']
+    
+    def __str__(self):
+        return f"{self.blood_type}: {self.units} מנות ({self.volume_ml} מ\"ל)"
+    
+    @classmethod
+    def adjust(cls, blood_type, units, volume_ml):
+        """Atomically add (or subtract) units/volume for one blood type"""
+        updated = cls.objects.filter(blood_type=blood_type).update(
+            units=models.F('units') + units,
+            volume_ml=models.F('volume_ml') + volume_ml,
+            updated_at=timezone.now()
+        )
+        if not updated:
+            # Counter row missing - rebuild it from the units table
+            cls.rebuild(blood_types=[blood_type])
+    
+    @classmethod
+    def rebuild(cls, blood_types=None):
+        """Recompute counters from available BloodUnits (all types by default)"""
+        blood_types = blood_types or [code for code, _name in Donor.BLOOD_TYPES]
+        totals = {
+            row['blood_type']: row
+            for row in BloodUnit.objects
+            .filter(status=BloodUnit.STATUS_AVAILABLE, blood_type__in=blood_types)
+            .order_by()
+            .values('blood_type')
+            .annotate(units=models.Count('id'), volume_ml=Sum('volume_ml'))
+        }
+        for blood_type in blood_types:
+            row = totals.get(blood_type, {})
+            cls.objects.update_or_create(
+                blood_type=blood_type,
+                defaults={
+                    'units': row.get('units', 0),
+                    'volume_ml': row.get('volume_ml') or 0,
+                }
+            )
+    
+    @classmethod
+    def snapshot(cls):
+        """All counters in one read: {blood_type: InventoryLevel}"""
+        return {level.blood_type: level for level in cls.objects.all()}
+
+
+@receiver(post_save, sender=BloodUnit)
+def add_unit_to_inventory(sender, instance, created, **kwargs):
+    """A newly collected bag enters the stock"""
+    if created and instance.status == BloodUnit.STATUS_AVAILABLE:
+        InventoryLevel.adjust(instance.blood_type, 1, instance.volume_ml)
+
+
+@receiver(post_delete, sender=BloodUnit)
+def remove_unit_from_inventory(sender, instance, **kwargs):
+    """An available bag removed with its donation (or un-approved) leaves the stock"""
+    if instance.status == BloodUnit.STATUS_AVAILABLE:
+        InventoryLevel.adjust(instance.blood_type, -1, -instance.volume_ml)
+
+
+# =====================
+# DAILY BLOOD STATS MODEL (analytics rollup)
+# =====================
+class DailyBloodStats(models.Model):
+    """
+    Pre-aggregated supply/demand per day and blood type.
+    Filled incrementally when the forecast is read (or by `python manage.py rollup_daily_stats`);
+    days changed after their rollup are dropped and rolled up again (utils/rollups.py).
+    """
+    date = models.DateField(
+        verbose_name=_("תאריך")
+    )
+    
+    blood_type = models.CharField(
+        max_length=3,
+        choices=Donor.BLOOD_TYPES,
+        verbose_name=_("סוג דם")
+    )
+    
+    requests_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name=_("מספר בקשות")
+    )
+    
+    units_requested = models.PositiveIntegerField(
+        default=0,
+        verbose_name=_("מנות שהתבקשו")
+    )
+    
+    units_donated = models.PositiveIntegerField(
+        default=0,
+        verbose_name=_("מנות שנתרמו")
+    )
+    
+    units_issued = models.PositiveIntegerField(
+        default=0,
+        verbose_name=_("מנות שנופקו")
+    )
+    
+    closing_stock = models.IntegerField(
+        default=0,
+        verbose_name=_("מלאי בסוף היום")
+    )
+    
+    class Meta:
+        verbose_name = _("סטטיסטיקה יומית")
+        verbose_name_plural = _("סטטיסטיקות יומיות")
+        ordering = ['date', 'blood_type']
+        unique_together = [('date', 'blood_type')]
+    
+    def __str__(self):
+        return f"{self.date} {self.blood_type}: +{self.units_donated} / -{self.units_issued} (מלאי {self.closing_stock})"
+
+
 # =====================
 # EMERGENCY REQUEST MODEL
 # =====================
@@ -780,28 +1217,22 @@ class EmergencyRequest(models.Model):
     @property
     def available_donors_count(self):
         """Count available O- donors"""
-        from .models import Donor
-        return Donor.objects.filter(
-            blood_type='O-',
-            is_available=True,
-            last_donation_date__lte=timezone.now() - timedelta(days=90)  # 3 months since last donation
-        ).count()
+        return Donor.objects.eligible().filter(blood_type='O-').count()
     
     def find_matching_donors(self):
         """Automatically find matching O- donors"""
-        from .models import Donor
-        
-        matching_donors = Donor.objects.filter(
-            blood_type='O-',
-            is_available=True,
-            last_donation_date__lte=timezone.now() - timedelta(days=90)
-        )[:self.units_needed]  # Limit to units needed
+        matching_donors = list(
+            Donor.objects.eligible().filter(blood_type='O-')[:self.units_needed]  # Limit to units needed
+        )
         
         self.matched_donors.set(matching_donors)
-        return matching_donors.count()
+        return len(matching_donors)
     
-    def save(self, *args, **kwargs):
-        """Custom save method with emergency logic"""
+    def save(self, *args, match_donors=True, **kwargs):
+        """
+        Custom save method with emergency logic.
+        match_donors=False skips the automatic matching (the caller books donors itself).
+        """
         # Always set blood type to O- for emergency requests
         self.blood_type_needed = 'O-'
         
@@ -809,18 +1240,253 @@ class EmergencyRequest(models.Model):
         if self.fulfilled and not self.fulfilled_date:
             self.fulfilled_date = timezone.now()
         
+        if not match_donors:
+            super().save(*args, **kwargs)
         # Auto-match donors if not already done
-        if not self.pk or (self.automatic_match and not self.matched_donors.exists()):
+        elif not self.pk or (self.automatic_match and not self.matched_donors.exists()):
             super().save(*args, **kwargs)  # Save first to get PK
             if self.automatic_match:
                 self.find_matching_donors()
         else:
             super().save(*args, **kwargs)
 
+
+
+# =====================
+# OUTBOX EMAIL MODEL (transactional outbox)
+# =====================
+class OutboxEmail(models.Model):
+    """
+    Outgoing email queued in the same transaction as the change that triggers it.
+    Sent in batches by `python manage.py send_outbox` (see donors/utils/email_service.py).
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_SENDING = 'sending'
+    STATUS_SENT = 'sent'
+    STATUS_FAILED = 'failed'
+    
+    STATUS_CHOICES = [
+        (STATUS_PENDING, _('ממתין')),
+        (STATUS_SENDING, _('בשליחה')),
+        (STATUS_SENT, _('נשלח בהצלחה')),
+        (STATUS_FAILED, _('נכשל')),
+    ]
+    
+    subject = models.CharField(
+        max_length=255,
+        verbose_name=_("נושא")
+    )
+    
+    body = models.TextField(
+        verbose_name=_("תוכן")
+    )
+    
+    to_email = models.EmailField(
+        verbose_name=_("נמען")
+    )
+    
+    attachment_path = models.CharField(
+        max_length=500,
+        blank=True,
+        verbose_name=_("קובץ מצורף")
+    )
+    
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default=STATUS_PENDING,
+        verbose_name=_("סטטוס")
+    )
+    
+    attempts = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name=_("ניסיונות שליחה")
+    )
+    
+    last_error = models.TextField(
+        blank=True,
+        verbose_name=_("שגיאה אחרונה")
+    )
+    
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name=_("נוצר בתאריך")
+    )
+    
+    next_attempt_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name=_("ניסיון הבא")
+    )
+    
+    claimed_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name=_("נלקח לשליחה בתאריך")
+    )
+    
+    sent_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name=_("נשלח בתאריך")
+    )
+    
+    class Meta:
+        verbose_name = _("אימייל יוצא")
+        verbose_name_plural = _("אימיילים יוצאים")
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.to_email} - {self.subject} ({self.get_status_display()})"
+
+
+# =====================
+# ALERT CAMPAIGN MODELS (mass emergency alerts)
+# =====================
+class AlertCampaign(models.Model):
+    """
+    One mass emergency alert: a batch of emails sent in the background.
+    Each recipient is tracked by an AlertDelivery row.
+    """
+    STATUS_QUEUED = 'queued'
+    STATUS_SENDING = 'sending'
+    STATUS_COMPLETED = 'completed'
+    
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, _('בתור')),
+        (STATUS_SENDING, _('בשליחה')),
+        (STATUS_COMPLETED, _('הושלם')),
+    ]
+    
+    created_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='alert_campaigns',
+        verbose_name=_("נוצר על ידי")
+    )
+    
+    blood_type = models.CharField(
+        max_length=3,
+        choices=Donor.BLOOD_TYPES,
+        verbose_name=_("סוג דם נדרש")
+    )
+    
+    emergency_type = models.CharField(
+        max_length=20,
+        verbose_name=_("סוג חירום")
+    )
+    
+    subject = models.CharField(
+        max_length=200,
+        verbose_name=_("נושא")
+    )
+    
+    custom_message = models.TextField(
+        blank=True,
+        verbose_name=_("הודעה מותאמת")
+    )
+    
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default=STATUS_QUEUED,
+        verbose_name=_("סטטוס")
+    )
+    
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name=_("נוצר בתאריך")
+    )
+    
+    finished_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name=_("הסתיים בתאריך")
+    )
+    
+    class Meta:
+        verbose_name = _("קמפיין התראות")
+        verbose_name_plural = _("קמפייני התראות")
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"התראת חירום {self.blood_type} - {self.created_at.strftime('%d/%m/%Y %H:%M')} ({self.get_status_display()})"
+    
+    def progress(self):
+        """Delivery counts per outbox status in one grouped query"""
+        counts = dict(
+            self.deliveries.order_by()
+            .values('outbox_email__status')
+            .annotate(count=models.Count('id'))
+            .values_list('outbox_email__status', 'count')
+        )
+        total = sum(counts.values())
+        sent = counts.get(OutboxEmail.STATUS_SENT, 0)
+        failed = counts.get(OutboxEmail.STATUS_FAILED, 0)
+        return {
+            'total': total,
+            'pending': total - sent - failed,
+            'sent': sent,
+            'failed': failed,
+            'percent': round((sent + failed) * 100 / total) if total else 100,
+        }
+
+
+class AlertDelivery(models.Model):
+    """A single alert email to one donor; sending state lives on its OutboxEmail"""
+    campaign = models.ForeignKey(
+        AlertCampaign,
+        on_delete=models.CASCADE,
+        related_name='deliveries',
+        verbose_name=_("קמפיין")
+    )
+    
+    donor = models.ForeignKey(
+        Donor,
+        on_delete=models.CASCADE,
+        related_name='alert_deliveries',
+        verbose_name=_("תורם")
+    )
+    
+    outbox_email = models.OneToOneField(
+        OutboxEmail,
+        on_delete=models.CASCADE,
+        null=True,
+        related_name='alert_delivery',
+        verbose_name=_("אימייל יוצא")
+    )
+    
+    class Meta:
+        verbose_name = _("משלוח התראה")
+        verbose_name_plural = _("משלוחי התראות")
+        ordering = ['id']
+        unique_together = [('campaign', 'donor')]
+    
+    def __str__(self):
+        return f"{self.campaign_id} - {self.donor}"
             
 # models.py (add this new model at the end)
 class UserReport(models.Model):
-    """Model to store user PDF reports without modifying Profile"""
+    """
+    Model to store user PDF reports without modifying Profile.
+    Each row is also a background rendering job (see donors/utils/report_jobs.py).
+    """
+    STATUS_QUEUED = 'queued'
+    STATUS_RENDERING = 'rendering'
+    STATUS_COMPLETED = 'completed'
+    STATUS_FAILED = 'failed'
+    
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, _('Queued')),
+        (STATUS_RENDERING, _('Rendering')),
+        (STATUS_COMPLETED, _('Completed')),
+        (STATUS_FAILED, _('Failed')),
+    ]
+    
     user = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -841,12 +1507,49 @@ class UserReport(models.Model):
     
     pdf_file = models.FileField(
         upload_to='user_reports/%Y/%m/%d/',
+        blank=True,
         verbose_name=_("PDF File")
     )
     
-    email_sent = models.BooleanField(
-        default=False,
-        verbose_name=_("Email Sent")
+    # Outbox email carrying the report; its status tells whether it was delivered
+    email = models.ForeignKey(
+        OutboxEmail,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='user_reports',
+        verbose_name=_("Email")
+    )
+    
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default=STATUS_QUEUED,
+        verbose_name=_("Status")
+    )
+    
+    progress = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name=_("Progress (%)")
+    )
+    
+    # Digest of the report type, user and every value the report shows
+    cache_key = models.CharField(
+        max_length=64,
+        blank=True,
+        db_index=True,
+        verbose_name=_("Cache Key")
+    )
+    
+    error = models.TextField(
+        blank=True,
+        verbose_name=_("Error")
+    )
+    
+    finished_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name=_("Finished At")
     )
     
     class Meta:
@@ -857,10 +1560,38 @@ class UserReport(models.Model):
     def __str__(self):
         return f"{self.user.username} - {self.get_report_type_display()} - {self.generated_at}"
     
+    @property
+    def is_finished(self):
+        return self.status in (self.STATUS_COMPLETED, self.STATUS_FAILED)
+    
+    @property
+    def email_status(self):
+        """Outbox status of the report's email (pending, sending, sent, failed), or None"""
+        return self.email.status if self.email_id else None
+    
+    @property
+    def email_sent(self):
+        """True only once the outbox has delivered the email"""
+        return self.email_status == OutboxEmail.STATUS_SENT
+    
     def get_download_url(self):
-        """Get download URL for the PDF"""
-        return self.pdf_file.url if self.pdf_file else None
+        """Get download URL for the PDF (checked against the report's owner)"""
+        if self.status != self.STATUS_COMPLETED or not self.pdf_file:
+            return None
+        from django.urls import reverse
+        return reverse('report_download', args=[self.pk])
     
+# =====================
+# LOCATION QUERYSET
+# =====================
+class LocationQuerySet(models.QuerySet):
+    """Query helpers for locations"""
+
+    def within_km(self, point, km):
+        """Locations within km of point, nearest first (annotates distance_km)"""
+        return within_km_filter(self, 'latitude', 'longitude', point, km)
+
+
 # =====================
 # LOCATION MODEL
 # =====================
@@ -945,6 +1676,8 @@ class Location(models.Model):
         help_text=_("האם יש ביישוב בנק דם")
     )
     
+    objects = LocationQuerySet.as_manager()
+    
     class Meta:
         verbose_name = _("יישוב")
         verbose_name_plural = _("יישובים")
@@ -1021,6 +1754,19 @@ class UserLocation(models.Model):
         return self.location.distance_to(target_location)
 
 
+@receiver(post_save, sender=UserLocation)
+def sync_donor_location(sender, instance, **kwargs):
+    """Keep the linked donor's location in step with the user's chosen location"""
+    Donor.objects.filter(user_id=instance.user_id).exclude(location_id=instance.location_id).update(
+        location_id=instance.location_id
+    )
+
+
+@receiver(post_delete, sender=UserLocation)
+def clear_donor_location(sender, instance, **kwargs):
+    Donor.objects.filter(user_id=instance.user_id, location_id=instance.location_id).update(location=None)
+
+
 # =====================
 # COMPREHENSIVE ISRAELI LOCATIONS DATA
 # =====================
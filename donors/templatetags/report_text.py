@@ -0,0 +1,16 @@
+# donors/templatetags/report_text.py
+from django import template
+
+from ..utils.text_shaping import shape_text
+
+register = template.Library()
+
+
+@register.filter
+def bidi(value):
+    """
+    Hebrew/Arabic text in visual order for PDF reports: {{ donor.last_name|bidi }}.
+    Shape whole phrases (e.g. first and last name together), not word by word,
+    and never a value already shaped by shape_context().
+    """
+    return shape_text(value)
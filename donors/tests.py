@@ -1,3 +1,103 @@
+import asyncio
+from datetime import date
+from unittest import mock
+
 from django.test import TestCase
+from django.urls import reverse
+
+from .models import Donor
+from .utils import live_stats
+from .utils.live_stats import stats_watcher
+from .utils.pagination import keyset_page, keyset_slices
+
+ORDERINGS = {
+    'ascending': ('last_name', 'first_name', 'id'),
+    'descending': ('-last_name', '-first_name', '-id'),
+    'mixed': ('last_name', '-first_name', 'id'),
+    'mixed_dates': ('-blood_type', 'date_of_birth', '-id'),
+}
+
+
+class KeysetPaginationTests(TestCase):
+    """keyset_page and keyset_slices walk every row exactly once, in order_by() order"""
+
+    @classmethod
+    def setUpTestData(cls):
+        last_names = ['כהן', 'לוי', 'Avraham', 'כהן']
+        first_names = ['נועה', 'דוד', 'Noa']
+        blood_types = ['A+', 'O-', 'B+']
+        # Repeated names, blood types and birth dates so every ordering relies on its tie-breakers
+        Donor.objects.bulk_create([
+            Donor(
+                national_id=f'{i:09d}',
+                first_name=first_names[i % len(first_names)],
+                last_name=last_names[i % len(last_names)],
+                date_of_birth=date(1980 + i % 5, 1, 1),
+                blood_type=blood_types[i % len(blood_types)],
+                phone_number=f'050{i:07d}',
+            )
+            for i in range(37)
+        ])
+
+    def expected(self, fields):
+        return list(Donor.objects.order_by(*fields).values_list('id', flat=True))
+
+    def test_slices_follow_every_ordering(self):
+        for name, fields in ORDERINGS.items():
+            for size in (1, 5, 37, 100):
+                with self.subTest(ordering=name, size=size):
+                    slices = list(keyset_slices(Donor.objects.all(), fields, size))
+                    self.assertTrue(all(0 < len(rows) <= size for rows in slices))
+                    self.assertEqual([donor.id for rows in slices for donor in rows], self.expected(fields))
+
+    def test_slices_of_empty_queryset(self):
+        self.assertEqual(list(keyset_slices(Donor.objects.none(), ORDERINGS['mixed'], 10)), [])
+
+    def test_pages_forward_and_back(self):
+        for name, fields in ORDERINGS.items():
+            with self.subTest(ordering=name):
+                pages = [keyset_page(Donor.objects.all(), fields, 6)]
+                while pages[-1].has_next:
+                    pages.append(keyset_page(Donor.objects.all(), fields, 6, after=pages[-1].next_cursor))
+                self.assertEqual([donor.id for page in pages for donor in page], self.expected(fields))
+                self.assertFalse(pages[0].has_previous)
+
+                # Walking back with the previous cursors gives the same pages
+                back = [pages[-1]]
+                while back[-1].has_previous:
+                    back.append(keyset_page(Donor.objects.all(), fields, 6, before=back[-1].previous_cursor))
+                self.assertEqual(
+                    [[donor.id for donor in page] for page in reversed(back)],
+                    [[donor.id for donor in page] for page in pages]
+                )
+
+    def test_invalid_cursor_starts_over(self):
+        fields = ORDERINGS['ascending']
+        page = keyset_page(Donor.objects.all(), fields, 6, after='not-a-cursor')
+        self.assertEqual([donor.id for donor in page], self.expected(fields)[:6])
+
+
+class EmergencyStatsStreamTests(TestCase):
+    """The SSE stream needs ASGI; its clients share one version check per process"""
+
+    def test_wsgi_gets_no_content(self):
+        self.assertEqual(self.client.get(reverse('emergency_stats_stream')).status_code, 204)
+
+    async def test_clients_share_one_version_check(self):
+        async def first_update():
+            updates = stats_watcher.updates()
+            try:
+                return await updates.__anext__()
+            finally:
+                await updates.aclose()
+
+        with mock.patch.object(live_stats, 'STATS_CHECK_SECONDS', 0.05), \
+                mock.patch.object(live_stats, 'stats_version', wraps=live_stats.stats_version) as version:
+            updates = await asyncio.gather(*(first_update() for _ in range(20)))
+            # One check by the poll and one in emergency_stats_payload, for 20 clients
+            self.assertEqual(version.call_count, 2)
+            # The poll stops once the last client is gone
+            await asyncio.sleep(0.1)
 
-# Create your tests here.
+        self.assertEqual(len(set(version for version, _stats in updates)), 1)
+        self.assertIsNone(stats_watcher._task)
@@ -13,6 +13,7 @@ urlpatterns = [
     path('inventory/', views.inventory_report, name='inventory_report'),
     path('emergency/', views.emergency_request, name='emergency_request'),
     path('emergency/stats/', views.get_emergency_stats, name='emergency_stats'),
+    path('emergency/stats/stream/', views.emergency_stats_stream, name='emergency_stats_stream'),
     path('register/doctor/', views.register_doctor, name='register_doctor'),
     path('register/patient/', views.register_patient, name='register_patient'),
     path('login/', views.login_view, name='login'),
@@ -22,15 +23,24 @@ urlpatterns = [
     path('profile/', views.profile_view, name='profile'),
     path('reports/doctor/',views.generate_doctor_report, name='doctor_report'),
     path('reports/patient/', views.generate_patient_report, name='patient_report'),
+    path('reports/<int:report_id>/', views.report_detail, name='report_detail'),
+    path('reports/<int:report_id>/status/', views.report_status, name='report_status'),
+    path('reports/<int:report_id>/download/', views.report_download, name='report_download'),
+    path('export/<str:dataset>/', views.export_data, name='export_data'),
     path('emergency/locator/', views.emergency_donor_locator, name='emergency_locator'),
     path('emergency/mass-alert/', views.mass_emergency_alert, name='mass_emergency_alert'),
     path('emergency/quick/<str:blood_type>/', views.quick_emergency_alert, name='quick_emergency'),
     path('emergency/quick/<str:blood_type>/<str:emergency_type>/', views.quick_emergency_alert, name='quick_emergency_type'),
     path('emergency/check-capacity/', views.check_email_capacity, name='check_email_capacity'),
+    path('emergency/alerts/<int:campaign_id>/', views.alert_campaign_detail, name='alert_campaign_detail'),
+    path('emergency/alerts/<int:campaign_id>/status/', views.alert_campaign_status, name='alert_campaign_status'),
+    path('emergency/alerts/<int:campaign_id>/retry/', views.alert_campaign_retry, name='alert_campaign_retry'),
     path('predictor/shortage/', views.blood_shortage_predictor, name='shortage_predictor'),
+    path('predictor/shortage/data/', views.shortage_forecast_api, name='shortage_forecast_api'),
     path('donors/availability/', views.donor_availability_calendar, name='availability_calendar'),
     path('matching/smart/', views.smart_donor_matching, name='smart_matching'),
     path('matching/smart/<int:request_id>/', views.smart_donor_matching, name='smart_matching_request'),
+    path('matching/plan/', views.donor_call_plan, name='donor_call_plan'),
     path('check-availability/', views.check_donor_availability, name='check_availability'),
     # Location management URLs
     path('location/add/', views.add_user_location, name='add_user_location'),
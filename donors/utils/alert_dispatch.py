@@ -0,0 +1,136 @@
+# utils/alert_dispatch.py
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from ..models import AlertCampaign, AlertDelivery, OutboxEmail
+from .email_service import OUTBOX_CLAIM_TIMEOUT, drain_outbox
+
+logger = logging.getLogger(__name__)
+
+# Bounded pool shared by all campaigns in this process; each worker sends its share
+# of the campaign's outbox rows over one SMTP connection per batch
+ALERT_WORKERS = getattr(settings, 'ALERT_WORKERS', 4)
+
+_executor = ThreadPoolExecutor(max_workers=ALERT_WORKERS, thread_name_prefix='alerts')
+
+UNFINISHED = [OutboxEmail.STATUS_PENDING, OutboxEmail.STATUS_SENDING]
+
+# Floor for re-queueing a share, so clock skew between rows never turns into a busy loop
+MIN_RETRY_DELAY = 1
+
+
+def create_alert_campaign(user, blood_type, emergency_type, subject, recipients, custom_message=''):
+    """
+    Save a campaign with one outbox email and delivery row per (donor, message) and start
+    sending once the rows are committed. Rows left unsent (e.g. the process restarted)
+    are picked up by `python manage.py send_outbox`.
+    """
+    with transaction.atomic():
+        campaign = AlertCampaign.objects.create(
+            created_by=user,
+            blood_type=blood_type,
+            emergency_type=emergency_type or 'critical',
+            subject=subject,
+            custom_message=custom_message,
+        )
+        outbox_emails = OutboxEmail.objects.bulk_create([
+            OutboxEmail(subject=subject, body=message, to_email=donor.email)
+            for donor, message in recipients
+        ])
+        AlertDelivery.objects.bulk_create([
+            AlertDelivery(campaign=campaign, donor=donor, outbox_email=outbox_email)
+            for (donor, _message), outbox_email in zip(recipients, outbox_emails)
+        ])
+        transaction.on_commit(lambda: dispatch_campaign(campaign.pk))
+    return campaign
+
+
+def dispatch_campaign(campaign_id):
+    """Fan the unsent emails of a campaign out over the worker pool and return at once"""
+    outbox_ids = list(
+        OutboxEmail.objects
+        .filter(alert_delivery__campaign_id=campaign_id, status=OutboxEmail.STATUS_PENDING)
+        .values_list('id', flat=True)
+    )
+    AlertCampaign.objects.filter(pk=campaign_id).update(
+        status=AlertCampaign.STATUS_SENDING if outbox_ids else AlertCampaign.STATUS_COMPLETED,
+        finished_at=None if outbox_ids else timezone.now()
+    )
+
+    # Round-robin so every worker gets a similar share
+    for i in range(min(ALERT_WORKERS, len(outbox_ids))):
+        _executor.submit(_send_share, outbox_ids[i::ALERT_WORKERS])
+
+
+def _send_share(outbox_ids):
+    """
+    Worker: one sending pass over a share of a campaign. Emails left for a retry are
+    handed back to the pool when due (a timer, not a sleeping worker), so a failing
+    SMTP relay never holds a worker through the backoff schedule.
+    """
+    try:
+        drain_outbox(ids=outbox_ids)
+        complete_finished_campaigns()
+        wake_at = _next_wake(outbox_ids)
+        if wake_at is not None:
+            delay = max((wake_at - timezone.now()).total_seconds(), MIN_RETRY_DELAY)
+            timer = threading.Timer(delay, _executor.submit, args=(_send_share, outbox_ids))
+            timer.daemon = True
+            timer.start()
+    except Exception:
+        logger.exception('Alert dispatch worker failed')
+    finally:
+        # Worker threads own their database connections
+        connection.close()
+
+
+def _next_wake(outbox_ids):
+    """
+    When the share next has work: the earliest retry of its pending emails, or when a
+    claim by another sender (send_outbox, another process) becomes reclaimable
+    """
+    pending = (
+        OutboxEmail.objects
+        .filter(pk__in=outbox_ids, status=OutboxEmail.STATUS_PENDING)
+        .order_by('next_attempt_at')
+        .values_list('next_attempt_at', flat=True)
+        .first()
+    )
+    claimed = (
+        OutboxEmail.objects
+        .filter(pk__in=outbox_ids, status=OutboxEmail.STATUS_SENDING)
+        .order_by('claimed_at')
+        .values_list('claimed_at', flat=True)
+        .first()
+    )
+    if claimed is not None:
+        claimed += OUTBOX_CLAIM_TIMEOUT
+    times = [t for t in (pending, claimed) if t is not None]
+    return min(times) if times else None
+
+
+def complete_finished_campaigns():
+    """Mark sending campaigns whose emails are all sent or failed as completed"""
+    return AlertCampaign.objects.filter(status=AlertCampaign.STATUS_SENDING).exclude(
+        Exists(AlertDelivery.objects.filter(
+            campaign=OuterRef('pk'),
+            outbox_email__status__in=UNFINISHED
+        ))
+    ).update(status=AlertCampaign.STATUS_COMPLETED, finished_at=timezone.now())
+
+
+def retry_failed(campaign):
+    """Put the campaign's failed emails back in the outbox and dispatch them again"""
+    retried = OutboxEmail.objects.filter(
+        alert_delivery__campaign=campaign,
+        status=OutboxEmail.STATUS_FAILED
+    ).update(status=OutboxEmail.STATUS_PENDING, next_attempt_at=timezone.now())
+    if retried:
+        dispatch_campaign(campaign.pk)
+    return retried
@@ -0,0 +1,327 @@
+# utils/allocation.py
+from collections import defaultdict, deque
+
+from django.db import transaction
+from django.db.models import Case, Count, IntegerField, Value, When
+from django.utils import timezone
+
+from ..models import (
+    BloodRequest, BloodUnit, Donation, Donor, EmergencyRequest, InventoryLevel, COMPATIBLE
+)
+from .live_stats import bump_stats_version
+from .report_version import bump_report_version
+
+# Scheduling order: lower rank is served first
+PRIORITY_RANK = {'critical': 0, 'urgent': 1, 'normal': 2}
+
+# One bag per donor in an emergency
+EMERGENCY_UNIT_ML = 450
+EMERGENCY_BOOKING_ATTEMPTS = 3
+
+
+class DonorBookingConflict(Exception):
+    """A chosen donor was booked by a concurrent emergency request"""
+
+
+def preferred_types(blood_type, emergency=False):
+    """
+    Donor blood types to draw from for a recipient, in order of preference.
+    Exact type first and universal O- last, so scarce O- stock is used only when needed.
+    Emergency requests are served from O- only.
+    """
+    if emergency:
+        return ['O-']
+    return sorted(
+        COMPATIBLE.get(blood_type, []),
+        key=lambda bt: (bt != blood_type, bt == 'O-')
+    )
+
+
+def claim_units(blood_type, count, blood_request):
+    """
+    Reserve up to `count` available units of one blood type for a request, oldest first (FIFO).
+
+    Must run inside transaction.atomic(). The lookup walks the
+    (blood_type, status, collected_at) index and stops after `count` rows, and rows
+    locked by a concurrent allocation are skipped (SELECT ... FOR UPDATE SKIP LOCKED).
+    The status guard on the UPDATE keeps the claim safe on backends without row locks.
+    Returns the list of claimed units.
+    """
+    claimed = []
+
+    while len(claimed) < count:
+        candidate_ids = list(
+            BloodUnit.objects
+            .select_for_update(skip_locked=True)
+            .filter(blood_type=blood_type, status=BloodUnit.STATUS_AVAILABLE)
+            .order_by('collected_at', 'id')
+            .values_list('id', flat=True)[:count - len(claimed)]
+        )
+        if not candidate_ids:
+            break
+
+        updated = BloodUnit.objects.filter(
+            pk__in=candidate_ids,
+            status=BloodUnit.STATUS_AVAILABLE
+        ).update(
+            status=BloodUnit.STATUS_RESERVED,
+            blood_request=blood_request,
+            reserved_at=timezone.now()
+        )
+        if updated:
+            units = list(
+                BloodUnit.objects.filter(
+                    pk__in=candidate_ids,
+                    status=BloodUnit.STATUS_RESERVED,
+                    blood_request=blood_request
+                ).order_by('collected_at', 'id')
+            )
+            InventoryLevel.adjust(blood_type, -len(units), -sum(unit.volume_ml for unit in units))
+            claimed.extend(units)
+        # Rows taken by a concurrent allocation are replaced on the next pass
+
+    return claimed
+
+
+def allocate_request(blood_request, blood_types):
+    """
+    Allocate inventory to a BloodRequest, trying blood types in the given order.
+
+    Units are reserved for the request as they are found. Once the reserved units
+    cover units_needed they are issued and the request is marked fulfilled; a partial
+    allocation stays reserved so a later pass only has to top it up.
+    Returns (claimed_units, missing_units).
+    """
+    with transaction.atomic():
+        # Serialize allocators working on the same request
+        blood_request = BloodRequest.objects.select_for_update().get(pk=blood_request.pk)
+        if blood_request.fulfilled:
+            return [], 0
+
+        held = blood_request.blood_units.filter(status=BloodUnit.STATUS_RESERVED).count()
+        missing = blood_request.units_needed - held
+        claimed = []
+
+        for blood_type in blood_types:
+            if missing <= 0:
+                break
+            units = claim_units(blood_type, missing, blood_request)
+            claimed.extend(units)
+            missing -= len(units)
+
+        if missing <= 0:
+            issue_request_units(blood_request)
+
+        return claimed, max(missing, 0)
+
+
+def issue_request_units(blood_request):
+    """Issue every unit reserved for the request and mark it fulfilled"""
+    now = timezone.now()
+    blood_request.blood_units.filter(status=BloodUnit.STATUS_RESERVED).update(
+        status=BloodUnit.STATUS_ISSUED,
+        issued_at=now
+    )
+    blood_request.fulfilled = True
+    blood_request.fulfilled_date = now
+    blood_request.save()
+
+
+def allocate_pending_requests():
+    """
+    Allocate available inventory to every open BloodRequest in a single pass.
+
+    Requests are served by priority (critical > urgent > normal) and then by
+    date_requested. Stock is read once per blood type (FIFO, capped at the total
+    outstanding demand) and matched in memory with preferred_types(), then written
+    back with one guarded UPDATE per request/blood type.
+    Returns a summary dict.
+    """
+    summary = {'requests': 0, 'fulfilled': 0, 'units_allocated': 0, 'units_missing': 0}
+
+    with transaction.atomic():
+        open_requests = list(
+            BloodRequest.objects
+            .select_for_update(skip_locked=True)
+            .filter(fulfilled=False)
+            .annotate(priority_rank=Case(
+                *[When(priority=priority, then=Value(rank)) for priority, rank in PRIORITY_RANK.items()],
+                default=Value(len(PRIORITY_RANK)),
+                output_field=IntegerField()
+            ))
+            .order_by('priority_rank', 'date_requested', 'id')
+        )
+        if not open_requests:
+            return summary
+
+        # Units already held by partially allocated requests
+        held = dict(
+            BloodUnit.objects
+            .filter(blood_request__in=open_requests, status=BloodUnit.STATUS_RESERVED)
+            .order_by()
+            .values('blood_request')
+            .annotate(count=Count('id'))
+            .values_list('blood_request', 'count')
+        )
+        missing = {
+            req.pk: max(req.units_needed - held.get(req.pk, 0), 0)
+            for req in open_requests
+        }
+        total_missing = sum(missing.values())
+
+        # FIFO stock per blood type, never more than could possibly be used
+        stock = {}
+        for blood_type in COMPATIBLE:
+            stock[blood_type] = deque(
+                BloodUnit.objects
+                .select_for_update(skip_locked=True)
+                .filter(blood_type=blood_type, status=BloodUnit.STATUS_AVAILABLE)
+                .order_by('collected_at', 'id')
+                .values_list('id', 'volume_ml')[:total_missing]
+            ) if total_missing else deque()
+
+        # Match in memory: {(request_id, blood_type): [(unit_id, volume_ml), ...]}
+        plan = defaultdict(list)
+        for req in open_requests:
+            for blood_type in preferred_types(req.blood_type_needed, emergency=req.is_emergency):
+                while missing[req.pk] > 0 and stock[blood_type]:
+                    plan[(req.pk, blood_type)].append(stock[blood_type].popleft())
+                    missing[req.pk] -= 1
+                if missing[req.pk] == 0:
+                    break
+
+        # Write the plan back
+        now = timezone.now()
+        for (request_id, blood_type), units in plan.items():
+            updated = BloodUnit.objects.filter(
+                pk__in=[unit_id for unit_id, _volume in units],
+                status=BloodUnit.STATUS_AVAILABLE
+            ).update(
+                status=BloodUnit.STATUS_RESERVED,
+                blood_request_id=request_id,
+                reserved_at=now
+            )
+            if updated == len(units):
+                InventoryLevel.adjust(blood_type, -updated, -sum(volume for _unit, volume in units))
+            else:
+                # Some units changed under us - recount this type from the units table
+                InventoryLevel.rebuild(blood_types=[blood_type])
+            summary['units_allocated'] += updated
+
+        # Issue every request that is now fully covered
+        reserved = dict(
+            BloodUnit.objects
+            .filter(blood_request__in=open_requests, status=BloodUnit.STATUS_RESERVED)
+            .order_by()
+            .values('blood_request')
+            .annotate(count=Count('id'))
+            .values_list('blood_request', 'count')
+        )
+        fulfilled_ids = [
+            req.pk for req in open_requests
+            if reserved.get(req.pk, 0) >= req.units_needed
+        ]
+        if fulfilled_ids:
+            BloodUnit.objects.filter(
+                blood_request_id__in=fulfilled_ids,
+                status=BloodUnit.STATUS_RESERVED
+            ).update(status=BloodUnit.STATUS_ISSUED, issued_at=now)
+            BloodRequest.objects.filter(pk__in=fulfilled_ids).update(fulfilled=True, fulfilled_date=now)
+            # update() sends no signals
+            transaction.on_commit(bump_report_version)
+
+        summary['requests'] = len(open_requests)
+        summary['fulfilled'] = len(fulfilled_ids)
+        summary['units_missing'] = sum(
+            max(req.units_needed - reserved.get(req.pk, 0), 0) for req in open_requests
+        )
+
+    return summary
+
+
+def allocate_emergency(emergency_request, candidates):
+    """
+    Book O- donors for an unsaved EmergencyRequest and record their donations atomically.
+
+    `candidates` is a list of (donor, distance_km or None when unknown), best first. Inside one transaction the
+    candidate donors are locked and re-checked for eligibility, the first units_needed of
+    them are booked with a guarded UPDATE of their eligibility columns, and the request,
+    donations, issued blood units and matched_donors rows are inserted with bulk_create.
+    A donor taken by a concurrent request (seen as a short guarded UPDATE) rolls the
+    attempt back and the booking is retried with the remaining candidates.
+    Returns the booked [(donor, distance_km), ...]; fewer than units_needed means the
+    request is saved as not fulfilled.
+    """
+    today = timezone.now().date()
+    last_donation_date, next_eligible_date = Donor.eligibility_from(today)
+    distances = {donor.pk: distance for donor, distance in candidates}
+
+    for attempt in range(EMERGENCY_BOOKING_ATTEMPTS):
+        try:
+            with transaction.atomic():
+                # Lock in primary key order so concurrent bookings cannot deadlock
+                still_eligible = set(
+                    Donor.objects
+                    .select_for_update()
+                    .filter(pk__in=distances)
+                    .eligible(on=today)
+                    .order_by('pk')
+                    .values_list('pk', flat=True)
+                )
+                chosen = [
+                    donor for donor, _distance in candidates if donor.pk in still_eligible
+                ][:emergency_request.units_needed]
+
+                booked = Donor.objects.filter(
+                    pk__in=[donor.pk for donor in chosen]
+                ).eligible(on=today).update(
+                    last_donation_date=last_donation_date,
+                    next_eligible_date=next_eligible_date
+                )
+                if booked != len(chosen):
+                    raise DonorBookingConflict()
+
+                now = timezone.now()
+                emergency_request.fulfilled = len(chosen) == emergency_request.units_needed
+                emergency_request.fulfilled_date = now if emergency_request.fulfilled else None
+                emergency_request.save(match_donors=False)
+
+                donations = Donation.objects.bulk_create([
+                    Donation(
+                        donor=donor,
+                        donation_date=today,
+                        volume_ml=EMERGENCY_UNIT_ML,
+                        notes="תרומת חירום אוטומטית - 1 יחידות" + (
+                            f" - מרחק: {distances[donor.pk]} ק\"מ" if distances[donor.pk] is not None else ""
+                        ),
+                        is_approved=True
+                    )
+                    for donor in chosen
+                ])
+                # The bags go straight to the emergency, never into available stock
+                BloodUnit.objects.bulk_create([
+                    BloodUnit(
+                        donation=donation,
+                        blood_type=donation.donor.blood_type,
+                        volume_ml=donation.volume_ml,
+                        collected_at=today,
+                        status=BloodUnit.STATUS_ISSUED,
+                        issued_at=now
+                    )
+                    for donation in donations
+                ])
+                EmergencyRequest.matched_donors.through.objects.bulk_create([
+                    EmergencyRequest.matched_donors.through(
+                        emergencyrequest_id=emergency_request.pk,
+                        donor_id=donor.pk
+                    )
+                    for donor in chosen
+                ])
+
+                # bulk_create and update() send no signals
+                transaction.on_commit(bump_stats_version)
+
+            return [(donor, distances[donor.pk]) for donor in chosen]
+        except DonorBookingConflict:
+            if attempt == EMERGENCY_BOOKING_ATTEMPTS - 1:
+                raise
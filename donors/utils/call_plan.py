@@ -0,0 +1,212 @@
+# utils/call_plan.py
+import numpy as np
+from django.conf import settings
+from django.db.models import Count
+
+from ..models import BloodRequest, BloodUnit, COMPATIBLE, EARTH_RADIUS_KM
+from .allocation import PRIORITY_RANK, preferred_types
+from .matching import load_candidates, score_candidates
+
+# Cost of a (unit, donor) pair = km * DISTANCE_WEIGHT - donor score - exact type bonus.
+# Override any of them with settings.CALL_PLAN_WEIGHTS.
+DEFAULT_CALL_PLAN_WEIGHTS = {
+    'distance_per_km': 1.0,
+    'unknown_distance_km': 50,     # donor or request without a location
+    'exact_blood_type': 30,        # keeps universal donors for the requests that need them
+    # Cost of leaving one unit without a donor, by request priority
+    'unfilled_critical': 10000,
+    'unfilled_urgent': 5000,
+    'unfilled_normal': 2000,
+}
+
+# Cost of an incompatible pair; always worse than leaving the unit unfilled
+INCOMPATIBLE = 1e9
+
+
+def call_plan_weights(overrides=None):
+    return {**DEFAULT_CALL_PLAN_WEIGHTS, **getattr(settings, 'CALL_PLAN_WEIGHTS', {}), **(overrides or {})}
+
+
+def min_cost_assignment(cost, row_index=None):
+    """
+    Rectangular min-cost assignment (shortest augmenting paths with dual potentials,
+    the Jonker-Volgenant form of the Hungarian method), vectorized over columns.
+
+    `cost` is a (rows x columns) matrix with rows <= columns. Many rows may share the
+    same costs: pass the distinct cost rows and `row_index` mapping each assignment row
+    to one of them. Returns the assigned column of every assignment row.
+    """
+    cost = np.asarray(cost, dtype=np.float64)
+    row_index = np.arange(len(cost)) if row_index is None else np.asarray(row_index)
+    n, m = len(row_index), cost.shape[1]
+    if n > m:
+        raise ValueError('More rows than columns')
+
+    u = np.zeros(n)
+    v = np.zeros(m)
+    col_for_row = np.full(n, -1)
+    row_for_col = np.full(m, -1)
+
+    for current in range(n):
+        shortest = np.full(m, np.inf)
+        path = np.full(m, -1)
+        scanned_cols = np.zeros(m, dtype=bool)
+        scanned_rows = [current]
+
+        row, min_value, sink = current, 0.0, -1
+        while sink < 0:
+            reduced = min_value + cost[row_index[row]] - u[row] - v
+            better = ~scanned_cols & (reduced < shortest)
+            path[better] = row
+            shortest[better] = reduced[better]
+
+            candidates = np.where(scanned_cols, np.inf, shortest)
+            col = int(np.argmin(candidates))
+            min_value = candidates[col]
+            # Among equally short paths prefer one that ends at a free column
+            free = np.flatnonzero((candidates == min_value) & (row_for_col < 0))
+            if len(free):
+                col = int(free[0])
+
+            scanned_cols[col] = True
+            if row_for_col[col] < 0:
+                sink = col
+            else:
+                row = row_for_col[col]
+                scanned_rows.append(row)
+
+        # Update the dual potentials
+        u[current] += min_value
+        others = np.array(scanned_rows[1:], dtype=int)
+        if len(others):
+            u[others] += min_value - shortest[col_for_row[others]]
+        v[scanned_cols] -= min_value - shortest[scanned_cols]
+
+        # Augment along the path
+        col = sink
+        while True:
+            row = path[col]
+            row_for_col[col] = row
+            col_for_row[row], col = col, col_for_row[row]
+            if row == current:
+                break
+
+    return col_for_row
+
+
+def distances_km(origin, latitudes, longitudes):
+    """Great-circle km from `origin` (a Location) to every point of two coordinate arrays, vectorized"""
+    lat1, lon1 = np.radians(float(origin.latitude)), np.radians(float(origin.longitude))
+    lat2, lon2 = np.radians(latitudes), np.radians(longitudes)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def open_request_units(requests=None):
+    """[(request, missing_units)] for unfulfilled requests, most urgent first"""
+    requests = list(
+        requests if requests is not None
+        else BloodRequest.objects.filter(fulfilled=False).select_related('requested_by__user_location__location')
+    )
+    held = dict(
+        BloodUnit.objects
+        .filter(blood_request__in=requests, status=BloodUnit.STATUS_RESERVED)
+        .order_by()
+        .values('blood_request')
+        .annotate(count=Count('id'))
+        .values_list('blood_request', 'count')
+    )
+    requests.sort(key=lambda req: (PRIORITY_RANK.get(req.priority, len(PRIORITY_RANK)), req.date_requested, req.pk))
+    return [
+        (req, req.units_needed - held.get(req.pk, 0))
+        for req in requests
+        if req.units_needed > held.get(req.pk, 0)
+    ]
+
+
+def request_location(blood_request):
+    """The requester's town, which stands for where the blood is needed"""
+    user_location = getattr(blood_request.requested_by, 'user_location', None)
+    return user_location.location if user_location else None
+
+
+def build_call_plan(requests=None, weights=None):
+    """
+    One globally consistent plan for calling donors: every missing unit of every open
+    request gets at most one donor, no donor is called twice, and the total cost
+    (distance, donor score, blood type preference, unfilled units by priority) is minimal.
+
+    Returns {'requests': [{'request', 'missing', 'donors': [(donor, distance_km)], 'unfilled'}],
+             'units': int, 'assigned': int, 'donors_considered': int}
+    """
+    weights = call_plan_weights(weights)
+    open_units = open_request_units(requests)
+    plan = {'requests': [], 'units': sum(missing for _req, missing in open_units), 'assigned': 0}
+
+    # Every eligible donor compatible with at least one open request
+    needed_types = {bt for req, _missing in open_units for bt in COMPATIBLE.get(req.blood_type_needed, [])}
+    donors = load_candidates(sorted(needed_types)) if open_units else []
+    plan['donors_considered'] = len(donors)
+
+    if not open_units:
+        return plan
+
+    # Donor part of the cost, the same for every request
+    donor_score = score_candidates(donors, blood_type=None)
+    donor_types = np.array([donor.blood_type for donor in donors], dtype=object)
+
+    # Donor coordinates, NaN where the donor has no location
+    has_location = np.array([donor.location is not None for donor in donors], dtype=bool)
+    donor_lat = np.array([float(donor.location.latitude) if donor.location else np.nan for donor in donors])
+    donor_lon = np.array([float(donor.location.longitude) if donor.location else np.nan for donor in donors])
+
+    # Request town to donor town distances, one row per request (None: unknown)
+    request_distances = []
+    for req, _missing in open_units:
+        location = request_location(req)
+        request_distances.append(distances_km(location, donor_lat, donor_lon) if location else None)
+
+    # One cost row per request; its missing units are identical assignment rows.
+    # Extra "unfilled" columns (one per unit) cost the request's unfilled penalty.
+    units = plan['units']
+    cost = np.empty((len(open_units), len(donors) + units))
+    row_index = []
+    for r, (req, missing) in enumerate(open_units):
+        if request_distances[r] is not None:
+            distance = np.where(has_location, request_distances[r], float(weights['unknown_distance_km']))
+        else:
+            distance = np.full(len(donors), float(weights['unknown_distance_km']))
+
+        allowed = np.isin(donor_types, preferred_types(req.blood_type_needed, req.is_emergency))
+        row = distance * weights['distance_per_km'] - donor_score
+        row -= (donor_types == req.blood_type_needed) * weights['exact_blood_type']
+        row[~allowed] = INCOMPATIBLE
+
+        cost[r, :len(donors)] = row
+        cost[r, len(donors):] = weights.get(f'unfilled_{req.priority}', weights['unfilled_normal'])
+        row_index.extend([r] * missing)
+
+    # Shift so all costs are non-negative (does not change the optimum)
+    cost -= min(cost.min(), 0)
+
+    assigned_cols = min_cost_assignment(cost, row_index)
+
+    slot = 0
+    for r, (req, missing) in enumerate(open_units):
+        called = []
+        for col in assigned_cols[slot:slot + missing]:
+            if col < len(donors):
+                known = request_distances[r] is not None and has_location[col]
+                distance = round(float(request_distances[r][col]), 2) if known else None
+                called.append((donors[col], distance))
+        slot += missing
+
+        plan['assigned'] += len(called)
+        plan['requests'].append({
+            'request': req,
+            'missing': missing,
+            'donors': called,
+            'unfilled': missing - len(called),
+        })
+
+    return plan
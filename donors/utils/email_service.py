@@ -15,4 +15,141 @@ def send_email_with_attachment(subject, message, recipient_list, attachment_path
     if attachment_path and os.path.exists(attachment_path):
         email.attach_file(attachment_path)
     
-    return email.send()
\ No newline at end of file
+    return email.send()
+
+# =====================
+# TRANSACTIONAL OUTBOX
+# =====================
+import logging
+import smtplib
+from datetime import timedelta
+
+from django.core.mail import get_connection
+from django.db.models import Q
+from django.utils import timezone
+
+from ..models import OutboxEmail
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_BATCH_SIZE = getattr(settings, 'OUTBOX_BATCH_SIZE', 100)
+OUTBOX_MAX_ATTEMPTS = getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 5)
+OUTBOX_RETRY_BASE_SECONDS = getattr(settings, 'OUTBOX_RETRY_BASE_SECONDS', 30)
+# A claimed batch not finished after this long is taken again (the sender died)
+OUTBOX_CLAIM_TIMEOUT = timedelta(minutes=10)
+
+
+def enqueue_email(subject, message, recipient, attachment_path=None):
+    """
+    Queue an email in the outbox. Call inside the transaction of the change it reports,
+    so the email exists only if the change is committed.
+    """
+    return OutboxEmail.objects.create(
+        subject=subject,
+        body=message,
+        to_email=recipient,
+        attachment_path=attachment_path or '',
+    )
+
+
+def claim_outbox_batch(limit=OUTBOX_BATCH_SIZE, ids=None):
+    """
+    Take up to `limit` due emails for sending. The guarded UPDATE makes concurrent
+    senders claim disjoint rows. `ids` restricts the claim to specific emails.
+    """
+    now = timezone.now()
+    due = OutboxEmail.objects.filter(
+        Q(status=OutboxEmail.STATUS_PENDING, next_attempt_at__lte=now) |
+        Q(status=OutboxEmail.STATUS_SENDING, claimed_at__lt=now - OUTBOX_CLAIM_TIMEOUT)
+    )
+    if ids is not None:
+        due = due.filter(pk__in=ids)
+
+    candidate_ids = list(due.order_by('next_attempt_at', 'id').values_list('id', flat=True)[:limit])
+    if not candidate_ids:
+        return []
+
+    OutboxEmail.objects.filter(
+        Q(status=OutboxEmail.STATUS_PENDING) |
+        Q(status=OutboxEmail.STATUS_SENDING, claimed_at__lt=now - OUTBOX_CLAIM_TIMEOUT),
+        pk__in=candidate_ids
+    ).update(status=OutboxEmail.STATUS_SENDING, claimed_at=now)
+
+    return list(OutboxEmail.objects.filter(
+        pk__in=candidate_ids, status=OutboxEmail.STATUS_SENDING, claimed_at=now
+    ))
+
+
+def _record_failure(outbox_email, error):
+    """Reschedule with exponential backoff, or give up after OUTBOX_MAX_ATTEMPTS"""
+    outbox_email.last_error = str(error)
+    if outbox_email.attempts >= OUTBOX_MAX_ATTEMPTS:
+        outbox_email.status = OutboxEmail.STATUS_FAILED
+    else:
+        outbox_email.status = OutboxEmail.STATUS_PENDING
+        outbox_email.next_attempt_at = timezone.now() + timedelta(
+            seconds=OUTBOX_RETRY_BASE_SECONDS * 2 ** (outbox_email.attempts - 1)
+        )
+
+
+def send_outbox_batch(emails):
+    """
+    Send claimed emails over a single connection and record the outcome of each.
+    Failures are rescheduled with exponential backoff until OUTBOX_MAX_ATTEMPTS.
+    Returns (sent, failed) counts.
+    """
+    sent = failed = 0
+    connection = get_connection()
+    try:
+        connection.open()
+        for outbox_email in emails:
+            message = EmailMessage(
+                outbox_email.subject,
+                outbox_email.body,
+                settings.DEFAULT_FROM_EMAIL,
+                [outbox_email.to_email],
+                connection=connection,
+            )
+            outbox_email.attempts += 1
+            try:
+                if outbox_email.attachment_path:
+                    message.attach_file(outbox_email.attachment_path)
+                connection.send_messages([message])
+            except Exception as e:
+                failed += 1
+                _record_failure(outbox_email, e)
+                if isinstance(e, smtplib.SMTPServerDisconnected):
+                    # Start a fresh session for the rest of the batch
+                    connection.close()
+                    connection.open()
+            else:
+                sent += 1
+                outbox_email.status = OutboxEmail.STATUS_SENT
+                outbox_email.sent_at = timezone.now()
+    except Exception as e:
+        # No SMTP session: the unsent rest of the batch counts as a failed attempt
+        logger.warning('Outbox: connection failed: %s', e)
+        for outbox_email in emails:
+            if outbox_email.status == OutboxEmail.STATUS_SENDING:
+                outbox_email.attempts += 1
+                _record_failure(outbox_email, e)
+                failed += 1
+    finally:
+        connection.close()
+
+    OutboxEmail.objects.bulk_update(
+        emails, ['status', 'attempts', 'last_error', 'next_attempt_at', 'sent_at']
+    )
+    return sent, failed
+
+
+def drain_outbox(batch_size=OUTBOX_BATCH_SIZE, ids=None):
+    """Send due emails batch by batch until none is left. Returns (sent, failed) totals."""
+    total_sent = total_failed = 0
+    while True:
+        batch = claim_outbox_batch(limit=batch_size, ids=ids)
+        if not batch:
+            return total_sent, total_failed
+        sent, failed = send_outbox_batch(batch)
+        total_sent += sent
+        total_failed += failed
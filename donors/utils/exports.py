@@ -0,0 +1,123 @@
+# utils/exports.py
+import csv
+import json
+
+from asgiref.sync import sync_to_async
+
+from ..models import BloodRequest, Donation, Donor
+
+# Rows fetched per query; memory stays flat however large the export is
+EXPORT_CHUNK_SIZE = 2000
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+}
+
+# dataset -> model, exported columns (first must be the primary key) and filter lookups
+EXPORTS = {
+    'donors': {
+        'model': Donor,
+        'fields': [
+            'id', 'first_name', 'last_name', 'national_id', 'date_of_birth', 'blood_type',
+            'phone_number', 'email', 'location__name_he', 'last_donation_date',
+            'next_eligible_date', 'created_at',
+        ],
+        'date_lookup': 'created_at__date',
+        'blood_type_lookup': 'blood_type',
+    },
+    'donations': {
+        'model': Donation,
+        'fields': [
+            'id', 'donor_id', 'donor__national_id', 'donor__blood_type', 'donation_date',
+            'volume_ml', 'is_approved', 'notes',
+        ],
+        'date_lookup': 'donation_date',
+        'blood_type_lookup': 'donor__blood_type',
+    },
+    'requests': {
+        'model': BloodRequest,
+        'fields': [
+            'id', 'patient_name', 'blood_type_needed', 'units_needed', 'priority', 'emergency',
+            'date_requested', 'fulfilled', 'fulfilled_date', 'requested_by__username',
+        ],
+        'date_lookup': 'date_requested__date',
+        'blood_type_lookup': 'blood_type_needed',
+    },
+}
+
+
+def export_queryset(dataset, date_from=None, date_to=None, blood_type=None):
+    """values_list queryset of an export with its filters, without ordering"""
+    spec = EXPORTS[dataset]
+    queryset = spec['model'].objects.order_by()
+    if date_from:
+        queryset = queryset.filter(**{f"{spec['date_lookup']}__gte": date_from})
+    if date_to:
+        queryset = queryset.filter(**{f"{spec['date_lookup']}__lte": date_to})
+    if blood_type:
+        queryset = queryset.filter(**{spec['blood_type_lookup']: blood_type})
+    return queryset.values_list(*spec['fields'])
+
+
+def fetch_chunk(queryset, after_id, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    The next rows after primary key `after_id`. Each chunk is its own short query on the
+    primary key index, so no cursor or read transaction stays open between chunks.
+    """
+    queryset = queryset.filter(id__gt=after_id) if after_id is not None else queryset
+    return list(queryset.order_by('id')[:chunk_size])
+
+
+class _Echo:
+    """File-like object for csv.writer that hands back each written line"""
+
+    def write(self, value):
+        return value
+
+
+def render_header(dataset, fmt):
+    if fmt == 'csv':
+        # BOM so spreadsheet programs detect UTF-8 (Hebrew names)
+        return '\ufeff' + csv.writer(_Echo()).writerow(EXPORTS[dataset]['fields'])
+    return ''
+
+
+def render_rows(dataset, fmt, rows):
+    if fmt == 'csv':
+        writer = csv.writer(_Echo())
+        return ''.join(writer.writerow(row) for row in rows)
+
+    fields = EXPORTS[dataset]['fields']
+    return ''.join(
+        json.dumps(dict(zip(fields, row)), ensure_ascii=False, default=str) + '\n'
+        for row in rows
+    )
+
+
+def stream_export(dataset, fmt, **filters):
+    """Export as a generator of text chunks (WSGI)"""
+    queryset = export_queryset(dataset, **filters)
+    yield render_header(dataset, fmt)
+
+    after_id = None
+    while True:
+        rows = fetch_chunk(queryset, after_id)
+        if not rows:
+            break
+        yield render_rows(dataset, fmt, rows)
+        after_id = rows[-1][0]
+
+
+async def astream_export(dataset, fmt, **filters):
+    """Export as an async generator of text chunks (ASGI), one database query per chunk"""
+    queryset = export_queryset(dataset, **filters)
+    yield render_header(dataset, fmt)
+
+    after_id = None
+    while True:
+        rows = await sync_to_async(fetch_chunk)(queryset, after_id)
+        if not rows:
+            break
+        yield render_rows(dataset, fmt, rows)
+        after_id = rows[-1][0]
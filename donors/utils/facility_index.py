@@ -0,0 +1,236 @@
+# utils/facility_index.py
+import heapq
+import threading
+from math import cos, radians, sin
+
+import numpy as np
+from django.core.cache import cache
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from ..models import EARTH_RADIUS_KM, Location
+
+# Lives in the shared cache (settings.CACHES), so a bump made by any process,
+# including management commands, reaches the index of every other process
+VERSION_KEY = 'facility_index:version'
+
+# Points per leaf; leaves are scanned with one NumPy distance computation
+LEAF_SIZE = 16
+
+# Built once per process and per version of the Location table
+_lock = threading.Lock()
+_current = None
+
+
+def unit_vector(latitude, longitude):
+    """Point on the unit sphere; straight-line (chord) distance grows with great-circle distance"""
+    lat, lon = radians(float(latitude)), radians(float(longitude))
+    return np.array([cos(lat) * cos(lon), cos(lat) * sin(lon), sin(lat)])
+
+
+def chord_to_km(chord):
+    """Great-circle kilometers for a chord length (same result as the haversine formula)"""
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.minimum(np.asarray(chord) / 2, 1.0))
+
+
+def km_to_chord(km):
+    return 2 * sin(min(km / EARTH_RADIUS_KM, np.pi) / 2)
+
+
+class KDTree:
+    """
+    Static KD-tree over 3D points. Nodes are (start, end, axis, split, left, right)
+    over a permutation of the points; leaves have axis -1.
+    """
+
+    def __init__(self, points):
+        self.points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+        self.order = np.arange(len(self.points))
+        self.nodes = []
+        if len(self.points):
+            self._build(0, len(self.points))
+
+    def _build(self, start, end):
+        node_id = len(self.nodes)
+        self.nodes.append(None)
+
+        if end - start <= LEAF_SIZE:
+            self.nodes[node_id] = (start, end, -1, 0.0, -1, -1)
+            return node_id
+
+        members = self.order[start:end]
+        coords = self.points[members]
+        axis = int(np.argmax(coords.max(axis=0) - coords.min(axis=0)))
+
+        middle = (end - start) // 2
+        partition = np.argpartition(coords[:, axis], middle)
+        self.order[start:end] = members[partition]
+        split = float(self.points[self.order[start + middle], axis])
+
+        left = self._build(start, start + middle)
+        right = self._build(start + middle, end)
+        self.nodes[node_id] = (start, end, axis, split, left, right)
+        return node_id
+
+    def _leaf_distances(self, start, end, query):
+        members = self.order[start:end]
+        return members, np.sqrt(((self.points[members] - query) ** 2).sum(axis=1))
+
+    def query_radius(self, query, radius):
+        """(indices, chord distances) of all points within `radius` of `query`"""
+        found, distances = [], []
+        stack = [0] if self.nodes else []
+        while stack:
+            start, end, axis, split, left, right = self.nodes[stack.pop()]
+            if axis < 0:
+                members, chord = self._leaf_distances(start, end, query)
+                hit = chord <= radius
+                found.append(members[hit])
+                distances.append(chord[hit])
+                continue
+
+            offset = query[axis] - split
+            if offset <= radius:
+                stack.append(left)
+            if offset >= -radius:
+                stack.append(right)
+
+        if not found:
+            return np.empty(0, dtype=int), np.empty(0)
+        return np.concatenate(found), np.concatenate(distances)
+
+    def query_knn(self, query, k, max_radius=np.inf, skip=None):
+        """(indices, chord distances) of the k points nearest to `query`, nearest first"""
+        best = []  # max-heap of (-distance, index)
+        stack = [(0, 0.0)] if self.nodes else []
+        while stack:
+            node_id, bound = stack.pop()
+            limit = -best[0][0] if len(best) == k else max_radius
+            if bound > limit:
+                continue
+
+            start, end, axis, split, left, right = self.nodes[node_id]
+            if axis < 0:
+                members, chord = self._leaf_distances(start, end, query)
+                for index, distance in zip(members.tolist(), chord.tolist()):
+                    if index == skip or distance > max_radius:
+                        continue
+                    if len(best) < k:
+                        heapq.heappush(best, (-distance, index))
+                    elif distance < -best[0][0]:
+                        heapq.heapreplace(best, (-distance, index))
+                continue
+
+            offset = query[axis] - split
+            near, far = (left, right) if offset < 0 else (right, left)
+            # Far side first so the near side is popped (and tightens the bound) first
+            stack.append((far, max(bound, abs(offset))))
+            stack.append((near, bound))
+
+        best.sort(reverse=True)
+        return [index for _d, index in best], [-d for d, _index in best]
+
+
+class FacilityIndex:
+    """
+    Nearest-facility lookups over locations with a hospital or a blood bank.
+    `facility` takes a flag name ('has_hospital' / 'has_blood_bank'), a list of flags
+    that must all be set, or None for any facility. One tree is built per filter.
+    """
+
+    FLAGS = ('has_hospital', 'has_blood_bank')
+
+    def __init__(self, facilities):
+        self.facilities = list(facilities)
+        self.ids = {location.id for location in self.facilities}
+        self._trees = {}
+        self._tree_lock = threading.Lock()
+
+    def _tree(self, facility):
+        flags = frozenset([facility] if isinstance(facility, str) else facility or ())
+        tree = self._trees.get(flags)
+        if tree is None:
+            with self._tree_lock:
+                tree = self._trees.get(flags)
+                if tree is None:
+                    members = [
+                        location for location in self.facilities
+                        if all(getattr(location, flag) for flag in flags)
+                    ]
+                    positions = {location.id: i for i, location in enumerate(members)}
+                    tree = (members, positions, KDTree([unit_vector(l.latitude, l.longitude) for l in members]))
+                    self._trees[flags] = tree
+        return tree
+
+    def nearest(self, origin, k=3, facility=None, max_km=None):
+        """The k facilities nearest to `origin` as [(location, distance_km)], nearest first"""
+        members, positions, tree = self._tree(facility)
+        skip = positions.get(getattr(origin, 'id', None))
+
+        indices, chords = tree.query_knn(
+            unit_vector(origin.latitude, origin.longitude), k,
+            max_radius=km_to_chord(max_km) if max_km is not None else np.inf,
+            skip=skip
+        )
+        return [
+            (members[i], round(float(km), 2))
+            for i, km in zip(indices, chord_to_km(chords).tolist())
+        ]
+
+    def within(self, origin, km, facility=None):
+        """[(location, distance_km)] for facilities within `km` of `origin`, nearest first"""
+        members, _positions, tree = self._tree(facility)
+        origin_id = getattr(origin, 'id', None)
+
+        indices, chords = tree.query_radius(unit_vector(origin.latitude, origin.longitude), km_to_chord(km))
+        distances = chord_to_km(chords)
+        order = np.argsort(distances, kind='stable')
+        return [
+            (members[indices[j]], round(float(distances[j]), 2))
+            for j in order
+            if members[indices[j]].id != origin_id
+        ]
+
+
+def bump_facility_version():
+    """Mark the facility index of every process as stale, through the shared cache"""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 1, timeout=None)
+
+
+def facility_index(location=None):
+    """
+    The facility index of the current Location table, built on first use.
+    Passing the location about to be looked up also rebuilds it when that row is a
+    facility added without signals (bulk_create, loaddata).
+    """
+    global _current
+
+    version = cache.get_or_set(VERSION_KEY, 1, timeout=None)
+    current = _current
+    if (
+        location is not None and current is not None
+        and any(getattr(location, flag, False) for flag in FacilityIndex.FLAGS)
+        and location.id not in current[1].ids
+    ):
+        bump_facility_version()
+        version = cache.get_or_set(VERSION_KEY, 1, timeout=None)
+    if current is None or current[0] != version:
+        with _lock:
+            current = _current
+            if current is None or current[0] != version:
+                facilities = Location.objects.filter(
+                    Q(has_hospital=True) | Q(has_blood_bank=True)
+                ).order_by('id')
+                current = (version, FacilityIndex(facilities))
+                _current = current
+
+    return current[1]
+
+
+@receiver([post_save, post_delete], sender=Location)
+def invalidate_facility_index(sender, **kwargs):
+    bump_facility_version()
@@ -0,0 +1,190 @@
+# utils/forecasting.py
+from datetime import timedelta
+
+import numpy as np
+from django.utils import timezone
+
+from ..models import DailyBloodStats, Donor, InventoryLevel
+from .rollups import live_day_stats, rollup_daily_stats
+
+BLOOD_TYPE_CODES = [code for code, _name in Donor.BLOOD_TYPES]
+BLOOD_TYPE_INDEX = {code: i for i, code in enumerate(BLOOD_TYPE_CODES)}
+
+# Sentinel shown when no shortage is projected inside the horizon
+NO_SHORTAGE = 999
+
+# Risk thresholds in days
+HIGH_RISK_DAYS = 7
+MEDIUM_RISK_DAYS = 14
+
+
+def load_history(days=365, until=None):
+    """
+    Load the daily rollup into NumPy matrices of shape (days, 8).
+
+    Rows are consecutive calendar days ending at `until` (default: today), columns
+    follow Donor.BLOOD_TYPES. Complete days missing from the rollup (never rolled up,
+    or changed since) are rolled up first; today, still in progress, is read live.
+    Returns (dates, requests, demand, supply) where dates is a datetime64[D] vector.
+    """
+    today = timezone.localdate()
+    until = until or today
+    start = until - timedelta(days=days - 1)
+    rollup_daily_stats(until=min(until, today - timedelta(days=1)))
+
+    rows = np.array(
+        list(
+            DailyBloodStats.objects
+            .filter(date__range=(start, until))
+            .values_list('date', 'blood_type', 'requests_count', 'units_requested', 'units_donated')
+        ),
+        dtype=object
+    ).reshape(-1, 5)
+
+    requests = np.zeros((days, len(BLOOD_TYPE_CODES)))
+    demand = np.zeros_like(requests)
+    supply = np.zeros_like(requests)
+
+    if len(rows):
+        day_idx = np.array([(d - start).days for d in rows[:, 0]])
+        type_idx = np.array([BLOOD_TYPE_INDEX[bt] for bt in rows[:, 1]])
+        requests[day_idx, type_idx] = rows[:, 2].astype(float)
+        demand[day_idx, type_idx] = rows[:, 3].astype(float)
+        supply[day_idx, type_idx] = rows[:, 4].astype(float)
+
+    if start <= today <= until:
+        row = (today - start).days
+        for blood_type, (count, units, donated) in live_day_stats(today).items():
+            column = BLOOD_TYPE_INDEX[blood_type]
+            requests[row, column], demand[row, column], supply[row, column] = count, units, donated
+
+    dates = np.arange(np.datetime64(start), np.datetime64(until) + 1)
+    return dates, requests, demand, supply
+
+
+def ewma(matrix, span=30):
+    """Exponentially weighted mean of each column, most recent row weighted highest"""
+    alpha = 2.0 / (span + 1)
+    weights = (1 - alpha) ** np.arange(len(matrix) - 1, -1, -1)
+    return weights @ matrix / weights.sum()
+
+
+def weekday_seasonality(dates, matrix):
+    """
+    Weekday factors of shape (7, columns): mean on that weekday divided by the overall mean.
+    Columns with no activity get a flat factor of 1.
+    """
+    weekdays = (dates.astype('datetime64[D]').view('int64') - 4) % 7  # 1970-01-01 was a Thursday; Monday = 0
+    totals = np.zeros((7, matrix.shape[1]))
+    np.add.at(totals, weekdays, matrix)
+    counts = np.bincount(weekdays, minlength=7)[:, None]
+
+    weekday_mean = np.divide(totals, counts, out=np.zeros_like(totals), where=counts > 0)
+    overall_mean = matrix.mean(axis=0)
+    return np.divide(
+        weekday_mean, overall_mean,
+        out=np.ones_like(weekday_mean), where=overall_mean > 0
+    )
+
+
+def linear_trend(matrix, window=90):
+    """Least-squares slope (units/day per day) of each column over the last `window` rows"""
+    recent = matrix[-window:]
+    if len(recent) < 2:
+        return np.zeros(matrix.shape[1])
+    x = np.arange(len(recent), dtype=float)
+    x -= x.mean()
+    return x @ (recent - recent.mean(axis=0)) / (x @ x)
+
+
+def forecast(dates, demand, supply, stock, horizon=180, span=30, trend_window=90):
+    """
+    Project stock forward for every blood type at once.
+
+    Demand is the EWMA level scaled by weekday seasonality; supply is the EWMA level
+    plus its recent linear trend (never below zero). Days until shortage is the first
+    projected day the stock reaches zero, interpolated within that day, or NO_SHORTAGE
+    if it lasts the whole horizon.
+    Returns a dict of arrays of length 8.
+    """
+    stock = np.asarray(stock, dtype=float)
+
+    demand_level = ewma(demand, span)
+    supply_level = ewma(supply, span)
+    supply_trend = linear_trend(supply, trend_window)
+    season = weekday_seasonality(dates, demand)
+
+    # Future days 1..horizon
+    steps = np.arange(1, horizon + 1)
+    future_weekdays = ((dates[-1].astype('int64') + steps) - 4) % 7
+    projected_demand = demand_level * season[future_weekdays]
+    projected_supply = np.maximum(supply_level + supply_trend * steps[:, None], 0)
+    net = projected_supply - projected_demand
+
+    path = stock + np.cumsum(net, axis=0)
+    crossed = path <= 0
+    has_shortage = crossed.any(axis=0)
+    first = crossed.argmax(axis=0)
+
+    columns = np.arange(path.shape[1])
+    before = np.where(first > 0, path[first - 1, columns], stock)
+    deficit = -net[first, columns]
+    fraction = np.divide(before, deficit, out=np.zeros_like(before), where=deficit > 0)
+    days_until_shortage = np.where(
+        stock <= 0, 0.0,
+        np.where(has_shortage, first + np.clip(fraction, 0, 1), NO_SHORTAGE)
+    )
+
+    return {
+        'daily_usage': demand_level,
+        'daily_supply': supply_level,
+        'supply_trend': supply_trend,
+        'days_until_shortage': days_until_shortage,
+        'seasonality': season,
+    }
+
+
+def risk_of(days):
+    """(risk_level, risk_text) for a days-until-shortage value"""
+    if days < HIGH_RISK_DAYS:
+        return 'high', 'סיכון גבוה'
+    if days < MEDIUM_RISK_DAYS:
+        return 'medium', 'סיכון בינוני'
+    return 'low', 'סיכון נמוך'
+
+
+def shortage_forecast(history_days=365, period_days=30, horizon=180):
+    """
+    Forecast for every blood type, sorted by days until shortage (most urgent first).
+
+    Each entry has the fields the shortage predictor page shows; total_requests and
+    total_donations cover the last `period_days` days.
+    """
+    dates, requests, demand, supply = load_history(days=history_days)
+    levels = InventoryLevel.snapshot()
+    stock = [levels[bt].units if bt in levels else 0 for bt in BLOOD_TYPE_CODES]
+
+    result = forecast(dates, demand, supply, stock, horizon=horizon)
+    recent_requests = requests[-period_days:].sum(axis=0)
+    recent_donations = supply[-period_days:].sum(axis=0)
+
+    predictions = []
+    for i, (blood_type, blood_name) in enumerate(Donor.BLOOD_TYPES):
+        days = float(result['days_until_shortage'][i])
+        risk_level, risk_text = risk_of(days)
+        predictions.append({
+            'blood_type': blood_type,
+            'blood_name': blood_name,
+            'current_units': stock[i],
+            'daily_usage': round(float(result['daily_usage'][i]), 1),
+            'daily_supply': round(float(result['daily_supply'][i]), 1),
+            'supply_trend': round(float(result['supply_trend'][i]), 3),
+            'days_until_shortage': round(days, 1),
+            'risk_level': risk_level,
+            'risk_text': risk_text,
+            'total_requests': int(recent_requests[i]),
+            'total_donations': int(recent_donations[i]),
+        })
+
+    predictions.sort(key=lambda x: x['days_until_shortage'])
+    return predictions
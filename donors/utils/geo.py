@@ -0,0 +1,46 @@
+# utils/geo.py
+from math import asin, cos, radians, sin, sqrt
+
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from ..models import EARTH_RADIUS_KM
+
+# Length of one degree of latitude
+KM_PER_DEGREE = 111.32
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance in kilometers (same formula as Location.distance_to)"""
+    lat1, lon1, lat2, lon2 = map(radians, (float(lat1), float(lon1), float(lat2), float(lon2)))
+    a = sin((lat2 - lat1) / 2) ** 2 + cos(lat1) * cos(lat2) * sin((lon2 - lon1) / 2) ** 2
+    return round(2 * EARTH_RADIUS_KM * asin(sqrt(min(a, 1.0))), 2)
+
+
+def _sqlite_haversine_km(lat1, lon1, lat2, lon2):
+    if None in (lat1, lon1, lat2, lon2):
+        return None
+    return haversine_km(lat1, lon1, lat2, lon2)
+
+
+def _sqlite_radians(value):
+    return None if value is None else radians(float(value))
+
+
+@receiver(connection_created)
+def register_sqlite_functions(sender, connection, **kwargs):
+    """Make haversine_km() (used by HaversineKm / within_km) and radians() available to SQLite"""
+    if connection.vendor != 'sqlite':
+        return
+    connection.connection.create_function('haversine_km', 4, _sqlite_haversine_km, deterministic=True)
+    connection.connection.create_function('radians', 1, _sqlite_radians, deterministic=True)
+
+
+def bounding_box(lat, lon, radius_km):
+    """(min_lat, max_lat, min_lon, max_lon) of a circle of radius_km around a point"""
+    lat, lon = float(lat), float(lon)
+    dlat = radius_km / KM_PER_DEGREE
+    # Widest longitude span is on the edge nearest the pole
+    dlon = radius_km / (KM_PER_DEGREE * max(cos(radians(min(abs(lat) + dlat, 89.9))), 0.01))
+    return lat - dlat, lat + dlat, lon - dlon, lon + dlon
+
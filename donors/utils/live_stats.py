@@ -0,0 +1,147 @@
+# utils/live_stats.py
+import asyncio
+import threading
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from ..models import Donation, Donor, EmergencyRequest
+
+VERSION_KEY = 'emergency_stats:version'
+PAYLOAD_KEY = 'emergency_stats:payload:{version}'
+PAYLOAD_TIMEOUT = 60 * 60
+
+# One computation per process when many clients see a new version at once
+_compute_lock = threading.Lock()
+
+
+def bump_stats_version():
+    """Mark the emergency statistics as stale"""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 1, timeout=None)
+
+
+def stats_version():
+    """
+    Current version of the emergency statistics.
+    Includes today's date because eligibility also changes when a waiting period ends.
+    """
+    counter = cache.get_or_set(VERSION_KEY, 1, timeout=None)
+    return f'{counter}-{timezone.now().date().isoformat()}'
+
+
+def compute_emergency_stats():
+    """Run the statistics queries"""
+    o_negative = Donor.objects.filter(blood_type='O-')
+    recent_donations = Donation.objects.filter(
+        donor__blood_type='O-',
+        donation_date__gte=timezone.now().date() - timedelta(days=30)
+    ).count()
+
+    available_donors = o_negative.count()
+
+    return {
+        'available_donors': available_donors,
+        'recent_donations': recent_donations,
+        'estimated_available_units': available_donors - recent_donations,
+        'eligible_donors': o_negative.eligible().count(),
+    }
+
+
+def emergency_stats_payload():
+    """
+    (version, stats) shared by every client: the statistics are computed once per
+    version and served from the cache until donations, donors or emergency requests change.
+    """
+    version = stats_version()
+    key = PAYLOAD_KEY.format(version=version)
+
+    payload = cache.get(key)
+    if payload is None:
+        with _compute_lock:
+            payload = cache.get(key)
+            if payload is None:
+                payload = compute_emergency_stats()
+                cache.set(key, payload, timeout=PAYLOAD_TIMEOUT)
+
+    return version, payload
+
+
+# =====================
+# SHARED VERSION POLL (SSE)
+# =====================
+# Seconds between version checks; one check per process, whatever the number of clients
+STATS_CHECK_SECONDS = 5
+
+
+class StatsWatcher:
+    """
+    Watches the statistics version for every open SSE stream of the process.
+    One task checks the version every STATS_CHECK_SECONDS while at least one client
+    listens, loads the new payload once and wakes all the clients.
+    """
+
+    def __init__(self):
+        self.version = None
+        self.payload = None
+        self.listeners = 0
+        self._changed = None
+        self._task = None
+
+    async def _poll(self):
+        try:
+            while self.listeners:
+                version = await sync_to_async(stats_version)()
+                if version != self.version:
+                    version, payload = await sync_to_async(emergency_stats_payload)()
+                    async with self._changed:
+                        self.version, self.payload = version, payload
+                        self._changed.notify_all()
+                await asyncio.sleep(STATS_CHECK_SECONDS)
+        finally:
+            # The next client starts from a fresh check (and event loop), not from before the pause
+            self.version = self.payload = None
+            self._task = None
+            if not self.listeners:
+                self._changed = None
+
+    async def updates(self, last_version=None, heartbeat=15):
+        """
+        Yields (version, stats) whenever the version differs from the last one seen,
+        and None after `heartbeat` seconds without a change.
+        """
+        self.listeners += 1
+        try:
+            while True:
+                if self._changed is None:
+                    self._changed = asyncio.Condition()
+                if self._task is None:
+                    self._task = asyncio.ensure_future(self._poll())
+                async with self._changed:
+                    if self.version is None or self.version == last_version:
+                        try:
+                            await asyncio.wait_for(self._changed.wait(), heartbeat)
+                        except asyncio.TimeoutError:
+                            pass
+                    update = (self.version, self.payload) if self.version not in (None, last_version) else None
+                if update:
+                    last_version = update[0]
+                yield update
+        finally:
+            self.listeners -= 1
+
+
+stats_watcher = StatsWatcher()
+
+
+@receiver([post_save, post_delete], sender=Donation)
+@receiver([post_save, post_delete], sender=Donor)
+@receiver([post_save, post_delete], sender=EmergencyRequest)
+def invalidate_emergency_stats(sender, **kwargs):
+    bump_stats_version()
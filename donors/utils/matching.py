@@ -0,0 +1,104 @@
+# utils/matching.py
+from datetime import date
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Count, F, Value
+
+from ..models import COMPATIBLE, Donor, HaversineKm
+
+# Points added to the base score; override any of them with settings.SMART_MATCH_WEIGHTS
+DEFAULT_MATCH_WEIGHTS = {
+    'base': 100,
+    'exact_blood_type': 30,
+    'available_now': 40,
+    'health_excellent': 25,
+    'health_good': 15,
+    'distance_near': 20,     # up to NEAR_KM
+    'distance_mid': 10,      # up to MID_KM
+    'donations_many': 15,    # more than MANY_DONATIONS
+    'donations_some': 5,     # at least one
+}
+NEAR_KM = 10
+MID_KM = 25
+MANY_DONATIONS = 5
+
+SMART_MATCH_LIMIT = getattr(settings, 'SMART_MATCH_LIMIT', 50)
+
+
+def match_weights(overrides=None):
+    return {**DEFAULT_MATCH_WEIGHTS, **getattr(settings, 'SMART_MATCH_WEIGHTS', {}), **(overrides or {})}
+
+
+def load_candidates(blood_types, origin=None, on=None):
+    """
+    Eligible donors of the given blood types, with every scoring feature in one query:
+    donation_count is annotated, and distance_km too when `origin` (a Location) is given.
+    """
+    candidates = (
+        Donor.objects.eligible(on)
+        .filter(blood_type__in=blood_types)
+        .select_related('location')
+        .annotate(donation_count=Count('donations'))
+    )
+    if origin is not None:
+        candidates = candidates.annotate(distance_km=HaversineKm(
+            Value(float(origin.latitude)), Value(float(origin.longitude)),
+            F('location__latitude'), F('location__longitude')
+        ))
+    return list(candidates)
+
+
+def score_candidates(donors, blood_type, weights=None, on=None):
+    """Match scores for all donors at once (float NumPy vector aligned with `donors`)"""
+    weights = match_weights(weights)
+    on = on or date.today()
+
+    exact = np.array([donor.blood_type == blood_type for donor in donors], dtype=bool)
+    available = np.array(
+        [donor.next_eligible_date is None or donor.next_eligible_date <= on for donor in donors], dtype=bool
+    )
+    health = np.array([donor.health_status for donor in donors], dtype=object)
+    donations = np.array([donor.donation_count for donor in donors], dtype=np.int64)
+    # Unknown distance (no origin or no donor location) earns no distance points
+    distance = np.array(
+        [getattr(donor, 'distance_km', None) for donor in donors], dtype=np.float64
+    ) if donors else np.empty(0)
+
+    # Float so fractional weights (settings.SMART_MATCH_WEIGHTS) work too
+    scores = np.full(len(donors), weights['base'], dtype=np.float64)
+    scores += exact * weights['exact_blood_type']
+    scores += available * weights['available_now']
+    scores += (health == 'excellent') * weights['health_excellent']
+    scores += (health == 'good') * weights['health_good']
+    scores += (distance <= NEAR_KM) * weights['distance_near']
+    scores += ((distance > NEAR_KM) & (distance <= MID_KM)) * weights['distance_mid']
+    scores += (donations > MANY_DONATIONS) * weights['donations_many']
+    scores += ((donations > 0) & (donations <= MANY_DONATIONS)) * weights['donations_some']
+    return scores
+
+
+def score_value(score):
+    """A score for display: an int for whole-number scores, else rounded to two decimals"""
+    score = round(float(score), 2)
+    return int(score) if score.is_integer() else score
+
+
+def top_matches(blood_type, origin=None, k=SMART_MATCH_LIMIT, weights=None):
+    """
+    The k best-scoring candidates as [(donor, score)], best first, plus the number of
+    candidates. Ties keep the default donor order (last name, first name).
+    """
+    donors = load_candidates(COMPATIBLE.get(blood_type, []), origin)
+    scores = score_candidates(donors, blood_type, weights)
+
+    best = np.arange(len(donors))
+    if k is not None and k < len(donors):
+        # k-th best score without a full sort; ties at the cut keep the earliest donors
+        cutoff = -np.partition(-scores, k - 1)[k - 1]
+        above = np.flatnonzero(scores > cutoff)
+        at_cutoff = np.flatnonzero(scores == cutoff)[:k - len(above)]
+        best = np.concatenate([above, at_cutoff])
+    best = best[np.lexsort((best, -scores[best]))]
+
+    return [(donors[i], score_value(scores[i])) for i in best], len(donors)
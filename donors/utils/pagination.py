@@ -0,0 +1,135 @@
+# utils/pagination.py
+import json
+
+from django.core import signing
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+CURSOR_SALT = 'donors.keyset-cursor'
+
+
+class CursorSerializer:
+    """JSON that also takes dates, datetimes and decimals (read back as strings, which lookups accept)"""
+
+    def dumps(self, obj):
+        return json.dumps(obj, separators=(',', ':'), cls=DjangoJSONEncoder).encode('latin-1')
+
+    def loads(self, data):
+        return json.loads(data.decode('latin-1'))
+
+
+def encode_cursor(values):
+    """Opaque, tamper-proof cursor for a row's ordering values"""
+    return signing.dumps(list(values), salt=CURSOR_SALT, serializer=CursorSerializer, compress=True)
+
+
+def decode_cursor(token):
+    """Ordering values of a cursor, or None if it is missing or invalid"""
+    if not token:
+        return None
+    try:
+        values = signing.loads(token, salt=CURSOR_SALT, serializer=CursorSerializer)
+    except signing.BadSignature:
+        return None
+    return values if isinstance(values, list) else None
+
+
+def reverse_field(field):
+    """'-field' for 'field' and the other way round"""
+    return field[1:] if field.startswith('-') else f'-{field}'
+
+
+def seek_filter(fields, values, forward=True):
+    """
+    Rows strictly after (or before) `values` in (field1, field2, ...) order.
+    A '-field' sorts descending, as in order_by().
+    """
+    names = [field.lstrip('-') for field in fields]
+    lookups = ['gt' if forward != field.startswith('-') else 'lt' for field in fields]
+    condition = Q()
+    for i, name in enumerate(names):
+        step = Q(**dict(zip(names[:i], values[:i])))
+        step &= Q(**{f'{name}__{lookups[i]}': values[i]})
+        condition |= step
+    # Redundant bound on the leading field lets the database seek into the index
+    return Q(**{f'{names[0]}__{lookups[0]}e': values[0]}) & condition
+
+
+def row_values(obj, fields):
+    """Ordering values of a model instance, in the shape seek_filter() takes"""
+    return [getattr(obj, field.lstrip('-')) for field in fields]
+
+
+class KeysetPage:
+    """
+    One page of a keyset (seek) pagination.
+    Every page costs one indexed range scan with LIMIT, however deep it is.
+    """
+
+    def __init__(self, object_list, fields, has_next, has_previous):
+        self.object_list = object_list
+        self.fields = fields
+        self.has_next = has_next
+        self.has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def _cursor(self, obj):
+        return encode_cursor(row_values(obj, self.fields))
+
+    @property
+    def next_cursor(self):
+        return self._cursor(self.object_list[-1]) if self.has_next else None
+
+    @property
+    def previous_cursor(self):
+        return self._cursor(self.object_list[0]) if self.has_previous else None
+
+
+def keyset_page(queryset, fields, per_page, after=None, before=None):
+    """
+    The page of `queryset` (in `fields` order, which must end with a unique
+    field) following the `after` cursor or preceding the `before` cursor.
+    """
+    after, before = decode_cursor(after), decode_cursor(before)
+    if after is not None and len(after) != len(fields):
+        after = None
+    if before is not None and len(before) != len(fields):
+        before = None
+
+    if before is not None:
+        rows = list(
+            queryset.filter(seek_filter(fields, before, forward=False))
+            .order_by(*[reverse_field(field) for field in fields])[:per_page + 1]
+        )
+        has_previous = len(rows) > per_page
+        rows = rows[:per_page][::-1]
+        return KeysetPage(rows, fields, has_next=True, has_previous=has_previous)
+
+    if after is not None:
+        queryset = queryset.filter(seek_filter(fields, after))
+    rows = list(queryset.order_by(*fields)[:per_page + 1])
+    return KeysetPage(rows[:per_page], fields, has_next=len(rows) > per_page, has_previous=after is not None)
+
+
+def keyset_slices(queryset, fields, size):
+    """
+    Every row of `queryset` in `fields` order (ending with a unique field), as lists of
+    up to `size` instances. Each slice is its own short indexed query, so no cursor or
+    read transaction stays open while the caller works on a slice.
+    """
+    queryset = queryset.order_by(*fields)
+    after = None
+    while True:
+        page = queryset.filter(seek_filter(fields, after)) if after is not None else queryset
+        rows = list(page[:size])
+        if not rows:
+            return
+        yield rows
+        if len(rows) < size:
+            return
+        after = row_values(rows[-1], fields)
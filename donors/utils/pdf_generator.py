@@ -1,9 +1,7 @@
 # utils/pdf_generator.py
 from io import BytesIO
-from django.http import HttpResponse
 from django.template.loader import get_template
 from xhtml2pdf import pisa
-from datetime import datetime
 from django.conf import settings
 import os
 
@@ -14,7 +12,7 @@ def generate_pdf(template_src, context_dict={}):
     result = BytesIO()
     
     # Create PDF
-    pdf = pisa.pisaDocument(BytesIO(html.encode("UTF-8")), result)
+    pdf = pisa.pisaDocument(BytesIO(html.encode("UTF-8")), result, link_callback=link_callback)
     
     if not pdf.err:
         return result.getvalue()
@@ -32,4 +30,307 @@ def save_pdf_to_file(pdf_content, filename):
 
 def get_pdf_url(filename):
     """Get URL for PDF file"""
-    return f"{settings.MEDIA_URL}pdf_reports/{filename}"
\ No newline at end of file
+    return f"{settings.MEDIA_URL}pdf_reports/{filename}"
+
+
+# =====================
+# CHUNKED RENDERING (large reports)
+# =====================
+import tempfile
+
+from pypdf import PdfReader
+from pypdf.generic import ArrayObject, DictionaryObject, IndirectObject, NameObject
+
+from .pagination import keyset_slices
+
+# Table rows per rendered slice; xhtml2pdf holds only one slice in memory at a time
+PDF_CHUNK_ROWS = getattr(settings, 'PDF_CHUNK_ROWS', 500)
+
+# Page attributes a page may take from its parent /Pages node
+INHERITED_PAGE_KEYS = ('/Resources', '/MediaBox', '/CropBox', '/Rotate')
+
+
+def _report_chunks(sections, chunk_rows):
+    """(name, rows, continued) for every slice of every section, in order"""
+    for name, queryset, ordering in sections:
+        continued = False
+        for rows in keyset_slices(queryset, ordering, chunk_rows):
+            yield name, rows, continued
+            continued = True
+        if not continued:
+            # Empty table: still render its heading
+            yield name, [], False
+
+
+class StreamingPdfWriter:
+    """
+    Concatenates PDFs into `output` one at a time. The objects of each appended PDF
+    are renumbered and written out immediately, so only the byte offsets of written
+    objects and the ids of the pages stay in memory until close() writes the page
+    tree, the catalog and the cross-reference table.
+    """
+
+    CATALOG_ID = 1
+    PAGES_ID = 2
+
+    def __init__(self, output):
+        self.output = output
+        self.position = 0
+        # Byte offset of every object, by object number - 1
+        self.offsets = [None, None]
+        self.page_ids = []
+        self._write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+
+    def _write(self, data):
+        self.output.write(data)
+        self.position += len(data)
+
+    def _write_object(self, number, obj):
+        self.offsets[number - 1] = self.position
+        self._write(f'{number} 0 obj\n'.encode())
+        obj.write_to_stream(self)
+        self._write(b'\nendobj\n')
+
+    # pypdf objects serialize themselves through write()
+    write = _write
+
+    def append(self, reader):
+        """Copy every page of a PdfReader, with the objects it uses"""
+        pages_root = reader.trailer['/Root'].get_object().raw_get('/Pages').idnum
+        numbers = {pages_root: self.PAGES_ID}
+        pending = []
+        # Containers are renumbered in place; one reached twice (an inherited
+        # /Resources dictionary) must not be renumbered again
+        renumbered = set()
+
+        def number(reference, copy=True):
+            if reference.idnum not in numbers:
+                self.offsets.append(None)
+                numbers[reference.idnum] = len(self.offsets)
+                if copy:
+                    pending.append(reference)
+            return numbers[reference.idnum]
+
+        def renumber(value):
+            if isinstance(value, IndirectObject):
+                return IndirectObject(number(value), 0, None)
+            if id(value) in renumbered:
+                return value
+            if isinstance(value, DictionaryObject):
+                renumbered.add(id(value))
+                for key in list(value):
+                    value[key] = renumber(value.raw_get(key))
+            elif isinstance(value, ArrayObject):
+                renumbered.add(id(value))
+                for i, item in enumerate(value):
+                    value[i] = renumber(item)
+            return value
+
+        # reader.pages are copies of the page objects, with inherited attributes
+        # copied in and /Parent pointing to this writer's page tree
+        pages = []
+        for page in reader.pages:
+            for key in INHERITED_PAGE_KEYS:
+                node = page.get('/Parent')
+                while key not in page and node is not None:
+                    if key in node:
+                        page[NameObject(key)] = node.raw_get(key)
+                    node = node.get('/Parent')
+            page[NameObject('/Parent')] = IndirectObject(pages_root, 0, reader)
+            pages.append((number(page.indirect_reference, copy=False), page))
+
+        for page_number, page in pages:
+            self.page_ids.append(page_number)
+            self._write_object(page_number, renumber(page))
+        while pending:
+            reference = pending.pop()
+            self._write_object(numbers[reference.idnum], renumber(reference.get_object()))
+
+    def close(self):
+        """Write the page tree, the catalog and the cross-reference table"""
+        kids = ' '.join(f'{number} 0 R' for number in self.page_ids)
+        self.offsets[self.PAGES_ID - 1] = self.position
+        self._write(f'{self.PAGES_ID} 0 obj\n<< /Type /Pages /Kids [ {kids} ] /Count {len(self.page_ids)} >>\nendobj\n'.encode())
+        self.offsets[self.CATALOG_ID - 1] = self.position
+        self._write(f'{self.CATALOG_ID} 0 obj\n<< /Type /Catalog /Pages {self.PAGES_ID} 0 R >>\nendobj\n'.encode())
+
+        xref = self.position
+        self._write(f'xref\n0 {len(self.offsets) + 1}\n0000000000 65535 f \n'.encode())
+        self._write(''.join(f'{offset:010d} 00000 n \n' for offset in self.offsets).encode())
+        self._write(
+            f'trailer\n<< /Size {len(self.offsets) + 1} /Root {self.CATALOG_ID} 0 R >>\n'
+            f'startxref\n{xref}\n%%EOF\n'.encode()
+        )
+
+
+def generate_pdf_chunked(template_src, context_dict, sections, output, chunk_rows=PDF_CHUNK_ROWS, on_progress=None):
+    """
+    Render a report with large tables into `output` (a path or binary file) slice by slice.
+
+    `sections` lists (context name, queryset, ordering) for the template's tables. Each
+    table is read in keyset slices of `chunk_rows` rows, and each slice is rendered alone
+    with `chunked`, `section`, `continued`, `first_chunk` and `last_chunk` in the context,
+    so the template prints its header in the first slice and its footer in the last.
+    Each slice PDF goes to a temporary file and is copied into `output` right away by
+    StreamingPdfWriter, so memory stays bounded by one slice however long the report is.
+    `on_progress(rows_done, rows_total)` is called after every slice.
+    Returns True on success.
+    """
+    if isinstance(output, (str, os.PathLike)):
+        with open(output, 'wb') as f:
+            return generate_pdf_chunked(template_src, context_dict, sections, f, chunk_rows, on_progress)
+
+    template = get_template(template_src)
+    writer = StreamingPdfWriter(output)
+    rows_total = sum(queryset.count() for _name, queryset, _ordering in sections)
+    rows_done = 0
+
+    chunks = _report_chunks(sections, chunk_rows)
+    current = next(chunks, None)
+    first_chunk = True
+    while current is not None:
+        following = next(chunks, None)
+        name, rows, continued = current
+
+        html = template.render({
+            **context_dict,
+            name: rows,
+            'chunked': True,
+            'section': name,
+            'continued': continued,
+            'first_chunk': first_chunk,
+            'last_chunk': following is None,
+        })
+        with tempfile.TemporaryFile() as slice_file:
+            pdf = pisa.pisaDocument(BytesIO(html.encode("UTF-8")), slice_file, link_callback=link_callback)
+            if pdf.err:
+                return False
+            slice_file.seek(0)
+            writer.append(PdfReader(slice_file))
+
+        rows_done += len(rows)
+        if on_progress:
+            on_progress(rows_done, rows_total)
+        current, first_chunk = following, False
+
+    writer.close()
+    return True
+
+
+# =====================
+# OFFLINE FONTS AND STYLESHEETS
+# =====================
+# Reports never touch the network: fonts are bundled, URLs resolve to local files
+# and each distinct stylesheet is parsed once per process.
+import logging
+import re
+
+import xhtml2pdf.document
+from django.contrib.staticfiles import finders
+from django.core.exceptions import SuspiciousFileOperation
+from django.utils._os import safe_join
+from reportlab.lib.fonts import addMapping
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from xhtml2pdf.context import pisaContext, pisaCSSBuilder, pisaCSSParser
+from xhtml2pdf.default import DEFAULT_FONT
+from xhtml2pdf.w3c import css
+
+logger = logging.getLogger(__name__)
+
+# Font family -> (regular, bold) TTF files under static/; DejaVu Sans covers Hebrew
+REPORT_FONTS = {
+    'DejaVuSans': ('donors/fonts/DejaVuSans.ttf', 'donors/fonts/DejaVuSans-Bold.ttf'),
+}
+
+_fonts_registered = False
+
+
+def register_report_fonts():
+    """Register the bundled fonts with reportlab and xhtml2pdf (once per process)"""
+    global _fonts_registered
+    if _fonts_registered:
+        return
+    for family, (regular, bold) in REPORT_FONTS.items():
+        pdfmetrics.registerFont(TTFont(family, finders.find(regular)))
+        pdfmetrics.registerFont(TTFont(f'{family}-Bold', finders.find(bold)))
+        # No italic faces are bundled; italic text uses the upright ones
+        for italic in (0, 1):
+            addMapping(family, 0, italic, family)
+            addMapping(family, 1, italic, f'{family}-Bold')
+        # font-family names xhtml2pdf resolves, in every context it creates
+        DEFAULT_FONT[family.lower()] = family
+        DEFAULT_FONT[f'{family.lower()}-bold'] = f'{family}-Bold'
+    _fonts_registered = True
+
+
+def _path_below(uri, url_prefix):
+    """Part of `uri` below the `url_prefix` URL, or None"""
+    prefix = '/' + url_prefix.strip('/') + '/'
+    path = '/' + uri.lstrip('/')
+    return path[len(prefix):] if path.startswith(prefix) else None
+
+
+def link_callback(uri, rel):
+    """
+    xhtml2pdf link_callback: static and media URLs are read from disk, and any
+    other remote URL is dropped instead of fetched.
+    """
+    if uri.startswith('data:'):
+        return uri
+
+    path = None
+    static_path = _path_below(uri, settings.STATIC_URL)
+    media_path = _path_below(uri, settings.MEDIA_URL)
+    try:
+        if static_path is not None:
+            path = finders.find(static_path)
+        elif media_path is not None:
+            path = safe_join(settings.MEDIA_ROOT, media_path)
+    except SuspiciousFileOperation:
+        path = None
+
+    if path and os.path.isfile(path):
+        return path
+
+    logger.warning('PDF report: skipped resource %s', uri)
+    return ''
+
+
+# At-rules whose parsing changes the context (page templates, fonts, fetches)
+_CONTEXT_AT_RULES = re.compile(r'@(page|font-face|frame|import)\b', re.IGNORECASE)
+_CSS_CACHE_SIZE = 16
+_parsed_css = {}
+
+
+class CachedCSSContext(pisaContext):
+    """pisaContext that reuses the parsed rules of a stylesheet it has seen before"""
+
+    def parseCSS(self):
+        if _CONTEXT_AT_RULES.search(self.cssText) or _CONTEXT_AT_RULES.search(self.cssDefaultText):
+            return super().parseCSS()
+
+        key = (self.cssText, self.cssDefaultText, self.pathDirectory)
+        cached = _parsed_css.get(key)
+        if cached is None:
+            super().parseCSS()
+            if len(_parsed_css) >= _CSS_CACHE_SIZE:
+                _parsed_css.clear()
+            _parsed_css[key] = (self.css, self.cssDefault)
+            return
+
+        # Inline style="" attributes still need a parser bound to this context
+        import weakref
+        self.cssBuilder = pisaCSSBuilder(mediumSet=["all", "print", "pdf"])
+        self.cssBuilder._c = weakref.ref(self)
+        self.cssParser = pisaCSSParser(self.cssBuilder)
+        self.cssParser.rootPath = self.pathDirectory
+        self.cssParser._c = weakref.ref(self)
+
+        self.css, self.cssDefault = cached
+        self.cssCascade = css.CSSCascadeStrategy(userAgent=self.cssDefault, user=self.css)
+        self.cssCascade.parser = self.cssParser
+
+
+# pisaDocument builds its context from this module attribute
+xhtml2pdf.document.pisaContext = CachedCSSContext
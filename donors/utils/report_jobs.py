@@ -0,0 +1,286 @@
+# utils/report_jobs.py
+import hashlib
+import logging
+import multiprocessing
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+
+import django
+from django.conf import settings
+from django.core.files.base import ContentFile, File
+from django.db import connections, transaction
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from ..models import BloodRequest, Donation, Donor, UserReport
+from .email_service import enqueue_email
+from .pdf_generator import generate_pdf, generate_pdf_chunked
+from .report_version import report_data_version
+from .text_shaping import shape_context
+
+logger = logging.getLogger(__name__)
+
+# xhtml2pdf is CPU-bound and holds the GIL, so reports render in worker processes.
+# Spawned (not forked) workers set Django up themselves and share no connections.
+REPORT_WORKERS = getattr(settings, 'REPORT_WORKERS', 2)
+# A job not finished after this long is considered lost (e.g. the server restarted)
+REPORT_JOB_TIMEOUT = timedelta(minutes=30)
+
+REPORT_TEMPLATES = {
+    'doctor': 'donors/reports/doctor_report.html',
+    'patient': 'donors/reports/patient_report.html',
+}
+
+# Plain strings of the report contexts shaped for right-to-left text before rendering;
+# values read in the template's loops go through its |bidi filter instead
+REPORT_TEXT_KEYS = ('doctor_name', 'patient_name')
+
+UNFINISHED = [UserReport.STATUS_QUEUED, UserReport.STATUS_RENDERING]
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor(reset=False):
+    global _executor
+    with _executor_lock:
+        if _executor is None or reset:
+            _executor = ProcessPoolExecutor(
+                max_workers=REPORT_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=django.setup,
+            )
+        return _executor
+
+
+# =====================
+# REPORT DATA
+# =====================
+def doctor_report_data(user):
+    """Template context, email and cache fingerprint of the full system report"""
+    donors = Donor.objects.all()
+    donations = Donation.objects.all().select_related('donor')
+    blood_requests = BloodRequest.objects.all().select_related('requested_by')
+    doctor_name = user.get_full_name() or user.username
+
+    return {
+        'context': {
+            'doctor_name': doctor_name,
+            'report_date': timezone.now(),
+            'donors': donors,
+            'donations': donations,
+            'blood_requests': blood_requests,
+            'total_donors': donors.count(),
+            'total_donations': donations.count(),
+            'total_requests': blood_requests.count(),
+        },
+        # Tables rendered in slices (context name, queryset, ordering ending with a unique field)
+        'sections': [
+            ('donors', donors, ('last_name', 'first_name', 'id')),
+            ('donations', donations, ('-donation_date', '-id')),
+            ('blood_requests', blood_requests, ('-date_requested', '-id')),
+        ],
+        # Cheap fingerprint instead of every printed row: the report data version (bumped by
+        # signals and by the update() calls that touch printed columns), plus the count and
+        # highest id of each table for inserts and deletes that send no signals
+        'rows': [[
+            (doctor_name, report_data_version()),
+            *(
+                tuple(queryset.order_by().aggregate(rows=Count('id'), last_id=Max('id')).values())
+                for queryset in (Donor.objects.all(), Donation.objects.all(), BloodRequest.objects.all())
+            ),
+        ]],
+        'recipient': user.email,
+        'subject': f"Blood Bank System - Comprehensive Report - {datetime.now().strftime('%Y-%m-%d')}",
+        'message': (
+            f"Dear Dr. {doctor_name},\n\n"
+            "Please find attached the comprehensive report of all records in the blood bank system.\n\n"
+            "Best regards,\nBlood Bank System"
+        ),
+    }
+
+
+def patient_report_data(user):
+    """Template context, email and fingerprinted rows of a patient's personal report"""
+    donor = Donor.objects.get(user=user)
+    donations = Donation.objects.filter(donor=donor)
+    blood_requests = BloodRequest.objects.filter(requested_by=user)
+
+    return {
+        'context': {
+            'patient_name': f"{donor.first_name} {donor.last_name}",
+            'report_date': timezone.now(),
+            'donor': donor,
+            'donations': donations,
+            'blood_requests': blood_requests,
+            'total_donations': donations.count(),
+            'total_requests': blood_requests.count(),
+        },
+        'rows': [
+            Donor.objects.filter(pk=donor.pk).values_list(
+                'first_name', 'last_name', 'national_id', 'blood_type', 'phone_number', 'email', 'health_status'
+            ),
+            donations.values_list('donation_date', 'volume_ml', 'is_approved'),
+            blood_requests.values_list(
+                'patient_name', 'blood_type_needed', 'units_needed', 'priority', 'fulfilled', 'emergency'
+            ),
+        ],
+        'recipient': donor.email or user.email,
+        'subject': f"Your Blood Bank Records - {datetime.now().strftime('%Y-%m-%d')}",
+        'message': (
+            f"Dear {donor.first_name} {donor.last_name},\n\n"
+            "Please find attached your personal blood bank records.\n\n"
+            "Best regards,\nBlood Bank System"
+        ),
+    }
+
+
+REPORT_DATA = {
+    'doctor': doctor_report_data,
+    'patient': patient_report_data,
+}
+
+
+def report_cache_key(report, rows):
+    """
+    SHA-256 of the report type, the user and the report's fingerprint rows: every printed
+    row of a patient report, a version and per-table counts for the full system report.
+    """
+    digest = hashlib.sha256(f'{report.report_type}:{report.user_id}'.encode('utf-8'))
+    for rowset in rows:
+        digest.update(b'\x1e')
+        iterator = rowset.iterator(chunk_size=2000) if hasattr(rowset, 'iterator') else rowset
+        for row in iterator:
+            digest.update(repr(row).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def find_cached_report(report, cache_key):
+    """A completed report of the same user and data whose file still exists, or None"""
+    candidates = UserReport.objects.filter(
+        user_id=report.user_id,
+        report_type=report.report_type,
+        cache_key=cache_key,
+        status=UserReport.STATUS_COMPLETED,
+    ).exclude(pk=report.pk).exclude(pdf_file='')
+
+    for cached in candidates[:5]:
+        if cached.pdf_file.storage.exists(cached.pdf_file.name):
+            return cached
+    return None
+
+
+# =====================
+# JOBS
+# =====================
+def request_report(user, report_type):
+    """
+    Queue a report job and start it once committed. A job of the same user and type
+    that is still running is returned instead of queueing a second one.
+    """
+    cutoff = timezone.now() - REPORT_JOB_TIMEOUT
+    UserReport.objects.filter(status__in=UNFINISHED, generated_at__lt=cutoff).update(
+        status=UserReport.STATUS_FAILED,
+        error='Timed out',
+        finished_at=timezone.now()
+    )
+
+    running = UserReport.objects.filter(user=user, report_type=report_type, status__in=UNFINISHED).first()
+    if running is not None:
+        return running
+
+    report = UserReport.objects.create(user=user, report_type=report_type)
+    transaction.on_commit(lambda: dispatch_report(report.pk))
+    return report
+
+
+def dispatch_report(report_id):
+    """Hand a job to the worker pool and return at once"""
+    try:
+        future = _get_executor().submit(run_report_job, report_id)
+    except BrokenProcessPool:
+        # A worker died (e.g. killed for memory); start a fresh pool
+        future = _get_executor(reset=True).submit(run_report_job, report_id)
+    future.add_done_callback(lambda f: _job_finished(f, report_id))
+
+
+def _job_finished(future, report_id):
+    """Pool callback: record jobs whose worker process crashed"""
+    if future.cancelled() or future.exception() is None:
+        return
+    try:
+        UserReport.objects.filter(pk=report_id, status__in=UNFINISHED).update(
+            status=UserReport.STATUS_FAILED,
+            error=str(future.exception()) or 'Worker process failed',
+            finished_at=timezone.now()
+        )
+    finally:
+        connections.close_all()
+
+
+def _set_progress(report_id, progress, **fields):
+    UserReport.objects.filter(pk=report_id).update(progress=progress, **fields)
+
+
+def run_report_job(report_id):
+    """
+    Worker process: render one report, or reuse the file of an identical earlier
+    report, then queue the email with the PDF attached.
+    """
+    try:
+        report = UserReport.objects.select_related('user').get(pk=report_id)
+        _set_progress(report_id, 5, status=UserReport.STATUS_RENDERING)
+
+        data = REPORT_DATA[report.report_type](report.user)
+        cache_key = report_cache_key(report, data['rows'])
+        _set_progress(report_id, 20, cache_key=cache_key)
+
+        template = REPORT_TEMPLATES[report.report_type]
+        context = shape_context(data['context'], REPORT_TEXT_KEYS)
+        filename = f"{report.report_type}_report_{report.user_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
+        cached = find_cached_report(report, cache_key)
+        if cached is not None:
+            report.pdf_file.name = cached.pdf_file.name
+        elif data.get('sections'):
+            # Large tables: rendered slice by slice, the merged PDF written to a temporary file
+            with tempfile.TemporaryFile() as output:
+                rendered = generate_pdf_chunked(
+                    template, context, data['sections'], output,
+                    on_progress=lambda done, total: _set_progress(report_id, 20 + 75 * done // max(total, 1))
+                )
+                if not rendered:
+                    raise RuntimeError('Failed to generate report')
+                output.seek(0)
+                report.pdf_file.save(filename, File(output), save=False)
+        else:
+            pdf_content = generate_pdf(template, context)
+            if pdf_content is None:
+                raise RuntimeError('Failed to generate report')
+            _set_progress(report_id, 90)
+            report.pdf_file.save(filename, ContentFile(pdf_content), save=False)
+
+        with transaction.atomic():
+            # Queued in the outbox; `send_outbox` delivers it and report.email_status follows it
+            email = None
+            if data['recipient']:
+                email = enqueue_email(data['subject'], data['message'], data['recipient'], report.pdf_file.path)
+            _set_progress(
+                report_id, 100,
+                status=UserReport.STATUS_COMPLETED,
+                pdf_file=report.pdf_file.name,
+                email=email,
+                finished_at=timezone.now()
+            )
+    except Exception as e:
+        logger.exception('Report job %s failed', report_id)
+        UserReport.objects.filter(pk=report_id).update(
+            status=UserReport.STATUS_FAILED,
+            error=str(e) or e.__class__.__name__,
+            finished_at=timezone.now()
+        )
+    finally:
+        # Worker processes outlive jobs; do not keep connections between them
+        connections.close_all()
@@ -0,0 +1,37 @@
+# utils/report_version.py
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from ..models import BloodRequest, Donation, Donor
+
+# Bumped whenever a row printed by the reports changes; part of the report cache key
+VERSION_KEY = 'report_data:version'
+
+
+def bump_report_version():
+    """Mark every cached report as stale"""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 1, timeout=None)
+
+
+def report_data_version():
+    return cache.get_or_set(VERSION_KEY, 1, timeout=None)
+
+
+@receiver([post_save, post_delete], sender=Donor)
+@receiver([post_save, post_delete], sender=Donation)
+@receiver([post_save, post_delete], sender=BloodRequest)
+def invalidate_reports(sender, **kwargs):
+    bump_report_version()
+
+
+@receiver(post_save, sender=User)
+def invalidate_reports_on_user_change(sender, update_fields=None, **kwargs):
+    # Names of doctors and requesters are printed; a login only touches last_login
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    bump_report_version()
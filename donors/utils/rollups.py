@@ -0,0 +1,207 @@
+# utils/rollups.py
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, Min, Q, Sum
+from django.db.models.functions import TruncDate
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from ..models import BloodRequest, BloodUnit, DailyBloodStats, Donor
+
+BLOOD_TYPE_CODES = [code for code, _name in Donor.BLOOD_TYPES]
+
+
+def first_activity_date():
+    """Earliest day with a blood request or a collected unit (None if there is no data)"""
+    first_request = BloodRequest.objects.aggregate(first=Min('date_requested'))['first']
+    first_unit = BloodUnit.objects.aggregate(first=Min('collected_at'))['first']
+    candidates = [d for d in (first_request and first_request.date(), first_unit) if d]
+    return min(candidates) if candidates else None
+
+
+def stock_at_end_of(day):
+    """Units in stock at the end of `day` per blood type (collected by then, not yet issued)"""
+    return dict(
+        BloodUnit.objects
+        .filter(collected_at__lte=day)
+        .filter(Q(issued_at__isnull=True) | Q(issued_at__date__gt=day))
+        .order_by()
+        .values('blood_type')
+        .annotate(count=Count('id'))
+        .values_list('blood_type', 'count')
+    )
+
+
+def rollup_daily_stats(until=None):
+    """
+    Write DailyBloodStats rows for every day after the last rolled-up day through
+    `until` (default: yesterday, the last complete day).
+
+    The whole range is aggregated with three grouped queries (requests, collected units,
+    issued units); closing stock is carried forward from the previous day's row.
+    Days changed after their rollup are deleted by the signal receivers below, so they
+    are simply rolled up again. Returns the number of days rolled up.
+    """
+    until = until or timezone.localdate() - timedelta(days=1)
+    last_day = DailyBloodStats.objects.order_by('-date').values_list('date', flat=True).first()
+
+    if last_day:
+        start = last_day + timedelta(days=1)
+        opening = dict(
+            DailyBloodStats.objects.filter(date=last_day).values_list('blood_type', 'closing_stock')
+        )
+    else:
+        start = first_activity_date()
+        if start is None:
+            return 0
+        opening = stock_at_end_of(start - timedelta(days=1))
+
+    if start > until:
+        return 0
+
+    requested, donated, issued = aggregate_days(start, until)
+
+    stock = {blood_type: opening.get(blood_type, 0) for blood_type in BLOOD_TYPE_CODES}
+    rows = []
+    day = start
+    while day <= until:
+        for blood_type in BLOOD_TYPE_CODES:
+            request_row = requested.get((day, blood_type), {})
+            units_donated = donated.get((day, blood_type), 0)
+            units_issued = issued.get((day, blood_type), 0)
+            stock[blood_type] += units_donated - units_issued
+
+            rows.append(DailyBloodStats(
+                date=day,
+                blood_type=blood_type,
+                requests_count=request_row.get('count', 0),
+                units_requested=request_row.get('units') or 0,
+                units_donated=units_donated,
+                units_issued=units_issued,
+                closing_stock=stock[blood_type],
+            ))
+        day += timedelta(days=1)
+
+    with transaction.atomic():
+        # Two readers rolling up the same missing days write identical rows
+        DailyBloodStats.objects.bulk_create(rows, batch_size=1000, ignore_conflicts=True)
+
+    return (until - start).days + 1
+
+
+def aggregate_days(start, until):
+    """
+    ({(day, blood_type): {'count', 'units'}}, {(day, blood_type): donated},
+    {(day, blood_type): issued}) for the days start..until, from three grouped queries
+    """
+    requested = {
+        (row['day'], row['blood_type_needed']): row
+        for row in BloodRequest.objects
+        .filter(date_requested__date__range=(start, until))
+        .annotate(day=TruncDate('date_requested'))
+        .order_by()
+        .values('day', 'blood_type_needed')
+        .annotate(count=Count('id'), units=Sum('units_needed'))
+    }
+    donated = {
+        (row['collected_at'], row['blood_type']): row['count']
+        for row in BloodUnit.objects
+        .filter(collected_at__range=(start, until))
+        .order_by()
+        .values('collected_at', 'blood_type')
+        .annotate(count=Count('id'))
+    }
+    issued = {
+        (row['day'], row['blood_type']): row['count']
+        for row in BloodUnit.objects
+        .filter(issued_at__date__range=(start, until))
+        .annotate(day=TruncDate('issued_at'))
+        .order_by()
+        .values('day', 'blood_type')
+        .annotate(count=Count('id'))
+    }
+    return requested, donated, issued
+
+
+def live_day_stats(day):
+    """
+    {blood_type: (requests_count, units_requested, units_donated)} of a day not rolled up
+    yet (today, still in progress), computed from the live tables
+    """
+    requested, donated, _issued = aggregate_days(day, day)
+    return {
+        blood_type: (
+            requested.get((day, blood_type), {}).get('count', 0),
+            requested.get((day, blood_type), {}).get('units') or 0,
+            donated.get((day, blood_type), 0),
+        )
+        for blood_type in BLOOD_TYPE_CODES
+    }
+
+
+# =====================
+# INVALIDATION
+# =====================
+def invalidate_rollups_from(*days):
+    """
+    Drop the rolled-up days from the earliest of `days` on. Closing stock is carried
+    forward, so every later day changes too; the next rollup recomputes them.
+    """
+    days = [day for day in days if day is not None]
+    if days:
+        DailyBloodStats.objects.filter(date__gte=min(days)).delete()
+
+
+def _unit_days(collected_at, issued_at):
+    return collected_at, issued_at and timezone.localdate(issued_at)
+
+
+@receiver(pre_save, sender=BloodUnit)
+def remember_unit_days(sender, instance, **kwargs):
+    # The days the bag counted on before this save (a donation's date can be edited)
+    previous = BloodUnit.objects.filter(pk=instance.pk).values_list('collected_at', 'issued_at').first() \
+        if instance.pk else None
+    instance._rollup_days = _unit_days(*previous) if previous else ()
+
+
+@receiver(post_save, sender=BloodUnit)
+@receiver(post_delete, sender=BloodUnit)
+def invalidate_unit_days(sender, instance, **kwargs):
+    invalidate_rollups_from(
+        *_unit_days(instance.collected_at, instance.issued_at), *getattr(instance, '_rollup_days', ())
+    )
+
+
+@receiver(post_save, sender=BloodRequest)
+@receiver(post_delete, sender=BloodRequest)
+def invalidate_request_day(sender, instance, **kwargs):
+    if instance.date_requested:
+        invalidate_rollups_from(timezone.localdate(instance.date_requested))
+
+    stock = {blood_type: opening.get(blood_type, 0) for blood_type in BLOOD_TYPE_CODES}
+    rows = []
+    day = start
+    while day <= until:
+        for blood_type in BLOOD_TYPE_CODES:
+            request_row = requested.get((day, blood_type), {})
+            units_donated = donated.get((day, blood_type), 0)
+            units_issued = issued.get((day, blood_type), 0)
+            stock[blood_type] += units_donated - units_issued
+
+            rows.append(DailyBloodStats(
+                date=day,
+                blood_type=blood_type,
+                requests_count=request_row.get('count', 0),
+                units_requested=request_row.get('units') or 0,
+                units_donated=units_donated,
+                units_issued=units_issued,
+                closing_stock=stock[blood_type],
+            ))
+        day += timedelta(days=1)
+
+    with transaction.atomic():
+        DailyBloodStats.objects.bulk_create(rows, batch_size=1000)
+
+    return (until - start).days + 1
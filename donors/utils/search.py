@@ -0,0 +1,128 @@
+# utils/search.py
+import hashlib
+import re
+
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count, Q
+from django.db.models.expressions import RawSQL
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from ..models import Donor
+
+NATIONAL_ID_RE = re.compile(r'^\d{9}$')
+# Same numbers the donor phone validator accepts: 05X-XXXXXXX, 05XXXXXXXX, +972-5X-XXXXXXX ...
+PHONE_RE = re.compile(r'^(?:\+?972|0)5[02-9]\d{7}$')
+
+FTS_MATCH_SQL = 'SELECT rowid FROM donors_donor_fts WHERE donors_donor_fts MATCH %s'
+
+
+def phone_variants(query):
+    """
+    All spellings of a phone number the donor form allows, or [] if `query` is not a
+    phone number. Lets an exact lookup use the unique phone_number index.
+    """
+    digits = re.sub(r'[\s\-()]', '', query)
+    if not PHONE_RE.match(digits):
+        return []
+
+    local = digits[-9:]           # 5XXXXXXXX
+    operator, number = local[:2], local[2:]
+    return [
+        f'{prefix}{dash1}{operator}{dash2}{number}'
+        for prefix in ('0', '+972')
+        for dash1 in ('', '-')
+        for dash2 in ('', '-')
+    ]
+
+
+def fts_query(query):
+    """FTS5 MATCH expression: every word must match as a prefix"""
+    terms = []
+    for word in query.split():
+        # Phone numbers are indexed without separators
+        if re.fullmatch(r'[\d\-+()]+', word):
+            word = re.sub(r'\D', '', word)
+            if word.startswith('972'):
+                word = '0' + word[3:]
+        word = word.replace('"', '""')
+        if word:
+            terms.append(f'"{word}"*')
+    return ' '.join(terms)
+
+
+def search_donors(queryset, query):
+    """
+    Filter donors by a free-text query.
+    9-digit IDs and phone numbers are exact lookups on their indexes; anything else
+    goes through the donors_donor_fts full-text index (names, ID, phone, email) on
+    SQLite, and falls back to icontains on other databases.
+    """
+    query = (query or '').strip()
+    if not query:
+        return queryset
+
+    if NATIONAL_ID_RE.match(query):
+        return queryset.filter(national_id=query)
+
+    variants = phone_variants(query)
+    if variants:
+        return queryset.filter(phone_number__in=variants)
+
+    if connection.vendor == 'sqlite':
+        match = fts_query(query)
+        if not match:
+            return queryset.none()
+        return queryset.filter(pk__in=RawSQL(FTS_MATCH_SQL, [match]))
+
+    condition = Q()
+    for word in query.split():
+        condition &= (
+            Q(first_name__icontains=word) | Q(last_name__icontains=word) |
+            Q(national_id__icontains=word) | Q(phone_number__icontains=word) |
+            Q(email__icontains=word)
+        )
+    return queryset.filter(condition)
+
+
+# =====================
+# CACHED RESULT COUNTS
+# =====================
+COUNTS_VERSION_KEY = 'donor_search_counts:version'
+# Bulk imports skip the signals, so counts also expire on their own
+COUNTS_TIMEOUT = 5 * 60
+
+
+def blood_type_counts(query):
+    """
+    {blood_type: count} of the donors matching `query`, from one grouped query.
+    Cached per query until a donor is added, changed or deleted.
+    """
+    version = cache.get_or_set(COUNTS_VERSION_KEY, 1, timeout=None)
+    digest = hashlib.sha1((query or '').strip().encode('utf-8')).hexdigest()
+    key = f'donor_search_counts:{version}:{digest}'
+
+    counts = cache.get(key)
+    if counts is None:
+        counts = dict(
+            search_donors(Donor.objects.order_by(), query)
+            .values('blood_type')
+            .annotate(count=Count('id'))
+            .values_list('blood_type', 'count')
+        )
+        cache.set(key, counts, timeout=COUNTS_TIMEOUT)
+    return counts
+
+
+def bump_counts_version():
+    """Mark the cached counts as stale"""
+    try:
+        cache.incr(COUNTS_VERSION_KEY)
+    except ValueError:
+        cache.set(COUNTS_VERSION_KEY, 1, timeout=None)
+
+
+@receiver([post_save, post_delete], sender=Donor)
+def invalidate_blood_type_counts(sender, **kwargs):
+    bump_counts_version()
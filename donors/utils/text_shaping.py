@@ -0,0 +1,68 @@
+# utils/text_shaping.py
+import re
+from functools import lru_cache
+
+import arabic_reshaper
+from bidi.algorithm import get_display
+from django.conf import settings
+
+# xhtml2pdf lays text out left to right, so Hebrew (and Arabic) strings are handed to it
+# already in visual order: Arabic letters joined into their contextual forms, then the
+# Unicode bidi algorithm applied. Numbers, Latin words and brackets keep their direction.
+RTL_CHARS = re.compile('[\u0590-\u08FF\uFB1D-\uFDFF\uFE70-\uFEFC]')
+ARABIC_CHARS = re.compile('[\u0600-\u08FF\uFB50-\uFDFF\uFE70-\uFEFC]')
+
+# Distinct strings kept per process. Report tables repeat the same few values (blood types,
+# statuses, towns, common names) thousands of times; this holds all of them with room to spare.
+TEXT_SHAPING_CACHE_SIZE = getattr(settings, 'TEXT_SHAPING_CACHE_SIZE', 8192)
+
+
+def _shape_line(line):
+    if ARABIC_CHARS.search(line):
+        line = arabic_reshaper.reshape(line)
+    return get_display(line)
+
+
+def _shape(text):
+    """Visual-order form of a string with right-to-left characters, line by line"""
+    return '\n'.join(_shape_line(line) for line in text.split('\n'))
+
+
+_shape_cached = lru_cache(maxsize=TEXT_SHAPING_CACHE_SIZE)(_shape)
+
+
+def shape_text(value, cache=True):
+    """
+    Text of `value` ready for the PDF renderer. Strings without right-to-left
+    characters (most IDs, phones, emails, dates) come back unchanged without a
+    lookup. Shaping is not idempotent: never shape the same string twice.
+    """
+    if value is None:
+        return ''
+    text = str(value)
+    if not RTL_CHARS.search(text):
+        return text
+    return _shape_cached(text) if cache else _shape(text)
+
+
+def shape_values(values, cache=True):
+    """A values_list() row (or any sequence) with its strings shaped; other values are kept"""
+    return tuple(shape_text(value, cache) if isinstance(value, str) else value for value in values)
+
+
+def shape_context(context, keys, cache=True):
+    """Copy of a template context with the plain strings under `keys` shaped"""
+    shaped = dict(context)
+    for key in keys:
+        if isinstance(shaped.get(key), str):
+            shaped[key] = shape_text(shaped[key], cache)
+    return shaped
+
+
+def shaping_cache_info():
+    """lru_cache statistics (hits, misses, maxsize, currsize) of this process"""
+    return _shape_cached.cache_info()
+
+
+def clear_shaping_cache():
+    _shape_cached.cache_clear()
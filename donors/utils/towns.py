@@ -0,0 +1,48 @@
+# utils/towns.py
+import re
+
+# Quote marks inside names (ג'סר, קריית מוצקין / "בית ג'ן") are dropped on both sides
+_QUOTES = re.compile('[\'"`׳״]')
+_TOKEN = re.compile(r'\w+')
+
+
+def tokenize(text):
+    """Lower-case words of a name or address; hyphens, commas and quotes separate nothing else"""
+    return tuple(_TOKEN.findall(_QUOTES.sub('', text.lower())))
+
+
+def town_index(rows):
+    """
+    {first word: [(words, location_id), ...]} for (location_id, name_he, name_en) rows,
+    the lookup structure of match_town()
+    """
+    index = {}
+    for location_id, *names in rows:
+        for name in names:
+            words = tokenize(name or '')
+            if words:
+                index.setdefault(words[0], []).append((words, location_id))
+    return index
+
+
+def match_town(address, index):
+    """
+    Location id of the town named in a free-text address, or None.
+
+    Only whole words match, so a town is never found inside a longer word or name
+    (עכו in עכואן). An address names its street before its town ("רחוב יפו 10, ירושלים"),
+    so the match ending last wins, and the longest one ending there ("תל אביב - יפו"
+    over "יפו"). Two different towns tied for it (same name) give None rather than a guess.
+    """
+    words = tokenize(address or '')
+    best_end, best_length, found = -1, 0, set()
+    for start, word in enumerate(words):
+        for town_words, location_id in index.get(word, ()):
+            if words[start:start + len(town_words)] != town_words:
+                continue
+            key = (start + len(town_words), len(town_words))
+            if key > (best_end, best_length):
+                (best_end, best_length), found = key, {location_id}
+            elif key == (best_end, best_length):
+                found.add(location_id)
+    return found.pop() if len(found) == 1 else None
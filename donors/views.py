@@ -2,61 +2,48 @@ import random
 from django.shortcuts import render, redirect
 
 from django.db.models import Sum,Max
-from .models import Donor, Donation, BloodRequest, EmergencyRequest, Location, UserLocation
+from .models import Donor, Donation, BloodRequest, EmergencyRequest, Location, UserLocation, COMPATIBLE
 from .forms import DonorForm, DonationForm, BloodRequestForm
 from .decorators import doctor_required, patient_required  
+from .utils.allocation import allocate_emergency, allocate_request, preferred_types, DonorBookingConflict
+from .utils.search import blood_type_counts, search_donors
+from .utils.pagination import keyset_page
 from django.contrib.auth.decorators import login_required
-
-# Blood type compatibility map (Hebrew labels)
-COMPATIBLE = {
-    'O-': ['O-'],
-    'O+': ['O-', 'O+'],
-    'A-': ['O-', 'A-'],
-    'A+': ['O-', 'O+', 'A-', 'A+'],
-    'B-': ['O-', 'B-'],
-    'B+': ['O-', 'O+', 'B-', 'B+'],
-    'AB-': ['O-', 'A-', 'B-', 'AB-'],
-    'AB+': ['O-', 'O+', 'A-', 'A+', 'B-', 'B+', 'AB-', 'AB+'],
-}
-
-from django.db.models import Count, Sum, Max, Q
+from django.db.models import Count, Sum, Max, Q, OuterRef, Subquery
 from django.core.paginator import Paginator
 from django.shortcuts import render
 from .models import Donor
+# Result sets up to this size keep numbered pages; larger ones switch to keyset cursors
+DONOR_LIST_PAGE_SIZE = 25
+DONOR_LIST_KEYSET_THRESHOLD = 500
+DONOR_LIST_ORDERING = ('last_name', 'first_name', 'id')
+
 @doctor_required
 def donor_list(request):
     # Get search parameters
     search_query = request.GET.get('q', '')
     blood_type_filter = request.GET.get('blood_type', '')
     
-    # Base queryset with annotations
+    # Base queryset; per-donor totals are correlated subqueries so they run only for the shown page
+    donations = Donation.objects.filter(donor=OuterRef('pk')).order_by().values('donor')
     donors = Donor.objects.annotate(
-        total_donated=Sum('donations__volume_ml'),
-        last_donation=Max('donations__donation_date')
-    ).order_by('last_name', 'first_name')
+        total_donated=Subquery(donations.annotate(total=Sum('volume_ml')).values('total')),
+        last_donation=Subquery(donations.annotate(last=Max('donation_date')).values('last'))
+    )
     
-    # Apply filters
+    # Apply filters (exact ID / phone lookups, otherwise full-text search)
     if search_query:
-        donors = donors.filter(national_id__icontains=search_query)
+        donors = search_donors(donors, search_query)
     
     # Get blood type distribution BEFORE applying blood type filter
     # This ensures we calculate percentages against all donors, not filtered ones
     all_blood_types = [choice[0] for choice in Donor.BLOOD_TYPES]
     
-    # Get counts for ALL donors (before blood type filter)
-    base_queryset = Donor.objects.all()
-    if search_query:
-        base_queryset = base_queryset.filter(national_id__icontains=search_query)
-    
-    blood_type_counts = base_queryset.values('blood_type').annotate(
-        count=Count('id')
-    )
-    
-    # Create a dictionary for blood type counts
-    count_dict = {item['blood_type']: item['count'] for item in blood_type_counts}
+    # Counts for ALL matching donors (before blood type filter) - one cached grouped query
+    count_dict = blood_type_counts(search_query)
     
     # Calculate total donors (before blood type filter)
-    total_for_percentage = base_queryset.count()
+    total_for_percentage = sum(count_dict.values())
     
     # Calculate percentages
     blood_type_stats = []
@@ -75,24 +62,32 @@ def donor_list(request):
     # NOW apply blood type filter to the main queryset
     if blood_type_filter:
         donors = donors.filter(blood_type=blood_type_filter)
-    
-    # Get final count for pagination and stats
-    total_donors = donors.count()
+        total_donors = count_dict.get(blood_type_filter, 0)
+    else:
+        total_donors = total_for_percentage
     
     # Prepare donor stats
     donor_stats = {
         'total': total_donors,
-        'o_negative': donors.filter(blood_type='O-').count(),
+        'o_negative': count_dict.get('O-', 0) if blood_type_filter in ('', 'O-') else 0,
         'blood_type_distribution': blood_type_stats  # This shows distribution of ALL blood types
     }
     
-    # Pagination
-    paginator = Paginator(donors, 25)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Pagination: numbered pages for small result sets, keyset cursors for large ones
+    after = request.GET.get('after')
+    before = request.GET.get('before')
+    keyset = bool(after or before) or total_donors > DONOR_LIST_KEYSET_THRESHOLD
+    
+    if keyset:
+        page_obj = keyset_page(donors, DONOR_LIST_ORDERING, DONOR_LIST_PAGE_SIZE, after=after, before=before)
+    else:
+        paginator = Paginator(donors.order_by(*DONOR_LIST_ORDERING), DONOR_LIST_PAGE_SIZE)
+        paginator.count = total_donors  # already known from the grouped counts
+        page_obj = paginator.get_page(request.GET.get('page'))
     
     context = {
         'donors': page_obj,
+        'keyset': keyset,
         'donor_stats': donor_stats,
         'blood_types': Donor.BLOOD_TYPES,
         'search_query': search_query,
@@ -271,15 +266,8 @@ def request_blood(request):
             
             blood_request.save()
             
-            # Fulfillment logic
-            if blood_request.priority == 'critical':
-                result = fulfill_request(blood_request, emergency=True)
-            else:
-                result = fulfill_request(blood_request)
-            
-            if "fully fulfilled" in result[-1]:
-                blood_request.fulfilled = True
-                blood_request.save()
+            # Fulfillment logic (marks the request fulfilled when fully covered)
+            result = fulfill_request(blood_request, emergency=blood_request.is_emergency)
             
             # Show success message and stay on the same page
             messages.success(request, "בקשת הדם נשלחה בהצלחה!")
@@ -302,62 +290,36 @@ def request_blood(request):
     })
 
 def fulfill_request(request, emergency=False):
-    needed = request.units_needed
-    matches = []
-    blood_type = request.blood_type_needed
+    # Emergency: only use O- blood. Otherwise exact type first, universal O- last
+    compatible_types = preferred_types(request.blood_type_needed, emergency=emergency)
     
-    # Emergency: only use O- blood
-    if emergency:
-        compatible_types = ['O-']
-    else:
-        compatible_types = COMPATIBLE.get(blood_type, [])
+    # Reserve bags FIFO inside a transaction (see utils/allocation.py)
+    units, missing = allocate_request(request, compatible_types)
     
-    # Get available donations (FIFO)
-    donations = Donation.objects.filter(
-        donor__blood_type__in=compatible_types,
-        is_approved=True
-    ).order_by('donation_date')
+    matches = [
+        f"נלקחה מנה #{unit.id} ({unit.blood_type}, {unit.volume_ml} מ\"ל) מתרומה #{unit.donation_id}"
+        for unit in units
+    ]
     
-    for donation in donations:
-        if needed <= 0:
-            break
-            
-        if donation.volume_ml >= needed:
-            matches.append(f"נלקחו {needed} מ\"ל מתרומה #{donation.id}")
-            donation.volume_ml -= needed
-            if donation.volume_ml == 0:
-                donation.delete()
-            else:
-                donation.save()
-            needed = 0
-        else:
-            matches.append(f"נלקחו {donation.volume_ml} מ\"ל מתרומה #{donation.id}")
-            needed -= donation.volume_ml
-            donation.delete()
-    
-    if needed == 0:
+    if missing == 0:
         matches.append("הבקשה מולאה בהצלחה! ✅")
     else:
-        matches.append(f"אין מספיק מלאי! חסרים {needed} מ\"ל ❌")
+        matches.append(f"אין מספיק מלאי! חסרות {missing} מנות - המנות שנמצאו שמורות לבקשה ❌")
     
     return matches
 
 from django.db.models import Sum
 from django.shortcuts import render
 from datetime import date
-from .models import Donation, BloodRequest, Donor
+from .models import Donation, BloodRequest, Donor, InventoryLevel
+from .utils.forecasting import shortage_forecast
 @doctor_required
 def inventory_report(request):
-    # Get inventory data grouped by blood type
-    inventory_data = (
-        Donation.objects
-        .values('donor__blood_type')
-        .annotate(total_volume=Sum('volume_ml'))
-        .order_by('donor__blood_type')
-    )
+    # Materialized counters: one row per blood type
+    levels = InventoryLevel.snapshot()
     
     # Calculate total volume and percentages
-    total_ml = sum(item['total_volume'] for item in inventory_data if item['total_volume'])
+    total_ml = sum(level.volume_ml for level in levels.values())
     blood_types = dict(Donor.BLOOD_TYPES)
     
     # Build inventory dictionary with all blood types
@@ -365,17 +327,14 @@ def inventory_report(request):
     critical_stock = []
     
     for code, name in Donor.BLOOD_TYPES:
-        # Find this blood type in the queryset
-        blood_type_data = next(
-            (item for item in inventory_data if item['donor__blood_type'] == code), 
-            {'total_volume': 0}
-        )
-        
-        units = blood_type_data['total_volume'] or 0
-        percentage = (units / total_ml * 100) if total_ml > 0 else 0
+        level = levels.get(code)
+        units = level.units if level else 0
+        volume_ml = level.volume_ml if level else 0
+        percentage = (volume_ml / total_ml * 100) if total_ml > 0 else 0
         
         inventory[code] = {
             'units': units,
+            'volume_ml': volume_ml,
             'percentage': round(percentage, 2),
             'name': name
         }
@@ -408,156 +367,50 @@ from .models import Donor, Donation, BloodRequest
 from django.utils import timezone
 from django.http import JsonResponse
 
-def emergency_request(request):
-    # Calculate available donors FIRST
-    all_o_negative = Donor.objects.filter(blood_type='O-')
-    available_donors = []
-    
-    for donor in all_o_negative:
-        if donor.can_donate:
-            available_donors.append(donor)
-    
-    available_units = len(available_donors)
-    
-    if request.method == 'POST':
-        # Get form data
-        units_needed = int(request.POST.get('units_needed', 0))
-        contact_name = request.POST.get('contact_name', '')
-        contact_phone = request.POST.get('contact_phone', '')
-        contact_relationship = request.POST.get('contact_relationship', 'family')
-        patient_name = request.POST.get('patient_name', '')
-        hospital = request.POST.get('hospital', '')
-        emergency_level = request.POST.get('emergency_level', 'critical')
-        notes = request.POST.get('notes', '')
-        
-        # VALIDATION: Check if there are actually available units
-        if available_units == 0:
-            messages.error(request, '❌ אין תורמי O- זמינים כרגע. כל התורמים תרמו לאחרונה ולא יכולים לתרום שוב עד שיעברו 56 יום.')
-            return redirect('emergency_request')
-        
-        if units_needed <= 0:
-            messages.error(request, 'מספר היחידות חייב להיות גדול מ-0')
-            return redirect('emergency_request')
-        
-        if units_needed > available_units:
-            messages.error(request, f'❌ אין מספיק תורמים זמינים. רק {available_units} יחידות זמינות מתוך {units_needed} שביקשת.')
-            return redirect('emergency_request')
-        
-        if not contact_name or not contact_phone:
-            messages.error(request, 'שם איש קשר וטלפון הם שדות חובה')
-            return redirect('emergency_request')
-        
-        # Process the emergency request
-        remaining_units = units_needed
-        donation_messages = []
-        matched_donors = []
-        
-        # Create emergency request record
-        emergency_request = EmergencyRequest.objects.create(
-            units_needed=units_needed,
-            contact_name=contact_name,
-            contact_phone=contact_phone,
-            contact_relationship=contact_relationship,
-            patient_name=patient_name or "מטופל אנונימי",
-            hospital=hospital or "מיקום לא specified",
-            emergency_level=emergency_level,
-            notes=notes,
-            automatic_match=True
-        )
-        
-        # Process donations with available donors
-        for donor in available_donors:
-            if remaining_units <= 0:
-                break
-                
-            # Each donor can give 1 unit in emergency
-            can_give = min(remaining_units, 1)
-            
-            if can_give > 0:
-                # Create donation record
-                donation = Donation.objects.create(
-                    donor=donor,
-                    donation_date=timezone.now().date(),
-                    volume_ml=can_give * 450,
-                    notes=f"תרומת חירום אוטומטית - {can_give} יחידות",
-                    is_approved=True
-                )
-                
-                donation_messages.append(
-                    f"✅ נלקח דם מתורם {donor.get_full_name()} "
-                    f"(ת\"ז: {donor.national_id}) - {can_give} יחידות"
-                )
-                
-                matched_donors.append(donor)
-                remaining_units -= can_give
-        
-        # Update the emergency request
-        if matched_donors:
-            emergency_request.matched_donors.set(matched_donors)
-        
-        emergency_request.fulfilled = (remaining_units == 0)
-        if emergency_request.fulfilled:
-            emergency_request.fulfilled_date = timezone.now()
-        emergency_request.save()
-        
-        # Success message
-        success_msg = (
-            f"✅ בקשת החירום סופקה במלואה! {units_needed} יחידות O- נלקחו בהצלחה.\n\n"
-            f"📞 איש קשר: {contact_name} - {contact_phone}\n"
-            f"🏥 מיקום: {hospital}\n\n"
-            f"📋 פירוט התרומות:\n" + "\n".join(donation_messages)
-        )
-        messages.success(request, success_msg)
-        
-        return redirect('emergency_request')
-    
-    # GET request - show the form
-    # Calculate total O- units ever donated (for display)
-    total_o_negative_ml = Donation.objects.filter(
-        donor__blood_type='O-'
-    ).aggregate(total=Sum('volume_ml'))['total'] or 0
-    total_o_negative_units = total_o_negative_ml // 450
-    
-    # Get recent emergency requests
-    recent_requests = EmergencyRequest.objects.all().order_by('-date_requested')[:10]
-    
-    context = {
-        'o_negative_count': len(all_o_negative),  # Total O- donors
-        'total_o_negative_units': total_o_negative_units,
-        'available_units': available_units,  # Actually available donors
-        'recent_requests': recent_requests
-    }
-    
-    return render(request, 'donors/emergency_request.html', context)
+def get_emergency_stats(request):
+    """AJAX endpoint for real-time statistics (polling fallback for the SSE stream)"""
+    _version, stats = emergency_stats_payload()
+    return JsonResponse(stats)
 
-def emergency_stats(request):
-    """JSON endpoint for real-time stats (used in your JavaScript)"""
-    all_o_negative = Donor.objects.filter(blood_type='O-')
-    o_negative_count = 0
-    for donor in all_o_negative:
-        if donor.can_donate:  # Use your can_donate property
-            o_negative_count += 1
-    
-    return JsonResponse({
-        'available_donors': o_negative_count,
-        'estimated_available_units': min(o_negative_count, 20)
-    })
 
+# =====================
+# LIVE EMERGENCY STATS (SERVER-SENT EVENTS)
+# =====================
 
-def get_emergency_stats(request):
-    """AJAX endpoint for real-time statistics"""
-    o_negative_count = Donor.objects.filter(blood_type='O-').count()
-    recent_donations = Donation.objects.filter(
-        donor__blood_type='O-',
-        donation_date__gte=timezone.now().date() - timezone.timedelta(days=30)
-    ).count()
-    
-    return JsonResponse({
-        'available_donors': o_negative_count,
-        'recent_donations': recent_donations,
-        'estimated_available_units': o_negative_count - recent_donations
-    })
+import json
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, StreamingHttpResponse
+from .utils.live_stats import emergency_stats_payload, stats_watcher
+
+STATS_HEARTBEAT_SECONDS = 15
 
+async def emergency_stats_stream(request):
+    """
+    SSE stream of the emergency statistics. A `stats` event is sent on connect and then
+    only when the data changes; all clients share one version check per process
+    (utils/live_stats.py) and receive the same cached payload.
+    Needs an ASGI server (bloodbank/asgi.py): under WSGI the stream would hold a worker
+    forever, so it answers 204 and the page keeps polling /emergency/stats/.
+    """
+    if not isinstance(request, ASGIRequest):
+        # 204 tells EventSource not to reconnect
+        return HttpResponse(status=204)
+    
+    last_version = request.headers.get('Last-Event-ID')
+    
+    async def event_stream():
+        yield 'retry: 5000\n\n'
+        async for update in stats_watcher.updates(last_version, STATS_HEARTBEAT_SECONDS):
+            if update is None:
+                yield ': keepalive\n\n'
+            else:
+                version, stats = update
+                yield f'id: {version}\nevent: stats\ndata: {json.dumps(stats)}\n\n'
+    
+    response = StreamingHttpResponse(event_stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
 
 
 
@@ -814,144 +667,117 @@ def custom_logout(request):
 
 # views/reports.py
 from django.contrib.auth.decorators import login_required, user_passes_test
-from django.http import HttpResponse
+from django.http import HttpResponse, FileResponse, Http404, JsonResponse
 from django.utils import timezone
+from django.shortcuts import get_object_or_404, redirect, render
 from datetime import datetime
 import os
 
-from .models import Donor, Donation, BloodRequest, Profile
-from .utils.pdf_generator import generate_pdf, save_pdf_to_file
-from .utils.email_service import send_email_with_attachment
+from .models import Donor, Donation, BloodRequest, Profile, UserReport
+from .utils.report_jobs import request_report
 
 @login_required
 def generate_doctor_report(request):
-    """Generate and email comprehensive report for doctors"""
+    """Queue the comprehensive report for doctors; it is rendered and emailed in the background"""
     if not hasattr(request.user, 'profile') or not request.user.profile.is_doctor:
         return HttpResponse("Access denied. Doctor role required.", status=403)
     
-    # Get all data
-    donors = Donor.objects.all()
-    donations = Donation.objects.all().select_related('donor')
-    blood_requests = BloodRequest.objects.all().select_related('requested_by')
-    
-    context = {
-        'doctor_name': request.user.get_full_name() or request.user.username,
-        'report_date': timezone.now(),
-        'donors': donors,
-        'donations': donations,
-        'blood_requests': blood_requests,
-        'total_donors': donors.count(),
-        'total_donations': donations.count(),
-        'total_requests': blood_requests.count(),
-    }
-    
-    # Generate PDF
-    pdf_content = generate_pdf('donors/reports/doctor_report.html', context)
-    
-    if pdf_content:
-        # Save PDF to file
-        filename = f"doctor_report_{request.user.id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
-        filepath = save_pdf_to_file(pdf_content, filename)
-        
-        # Email the report
-        subject = f"Blood Bank System - Comprehensive Report - {datetime.now().strftime('%Y-%m-%d')}"
-        message = f"Dear Dr. {request.user.get_full_name() or request.user.username},\n\n"
-        message += "Please find attached the comprehensive report of all records in the blood bank system.\n\n"
-        message += "Best regards,\nBlood Bank System"
-        
-        try:
-            send_email_with_attachment(
-                subject, 
-                message, 
-                [request.user.email],
-                filepath
-            )
-            email_sent = True
-        except Exception as e:
-            email_sent = False
-        
-        # Provide download link
-        response = HttpResponse(pdf_content, content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        
-        # Add success message
-        from django.contrib import messages
-        if email_sent:
-            messages.success(request, "Report generated successfully and sent to your email!")
-        else:
-            messages.warning(request, "Report generated successfully but email could not be sent.")
-        
-        return response
-    
-    return HttpResponse("Failed to generate report.", status=500)
+    report = request_report(request.user, 'doctor')
+    return redirect('report_detail', report_id=report.pk)
 
 @login_required
 def generate_patient_report(request):
-    """Generate and email personal report for patients"""
+    """Queue the personal report for patients; it is rendered and emailed in the background"""
     if not hasattr(request.user, 'profile') or not request.user.profile.is_patient:
         return HttpResponse("Access denied. Patient role required.", status=403)
     
-    try:
-        # Get patient's data
-        donor = Donor.objects.get(user=request.user)
-        donations = Donation.objects.filter(donor=donor)
-        blood_requests = BloodRequest.objects.filter(requested_by=request.user)
-        
-        context = {
-            'patient_name': f"{donor.first_name} {donor.last_name}",
-            'report_date': timezone.now(),
-            'donor': donor,
-            'donations': donations,
-            'blood_requests': blood_requests,
-            'total_donations': donations.count(),
-            'total_requests': blood_requests.count(),
-        }
-        
-        # Generate PDF
-        pdf_content = generate_pdf('donors/reports/patient_report.html', context)
-        
-        if pdf_content:
-            # Save PDF to file
-            filename = f"patient_report_{request.user.id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
-            filepath = save_pdf_to_file(pdf_content, filename)
-            
-            # Email the report
-            recipient_email = donor.email or request.user.email
-            subject = f"Your Blood Bank Records - {datetime.now().strftime('%Y-%m-%d')}"
-            message = f"Dear {donor.first_name} {donor.last_name},\n\n"
-            message += "Please find attached your personal blood bank records.\n\n"
-            message += "Best regards,\nBlood Bank System"
-            
-            try:
-                send_email_with_attachment(
-                    subject, 
-                    message, 
-                    [recipient_email],
-                    filepath
-                )
-                email_sent = True
-            except Exception as e:
-                email_sent = False
-            
-            # Provide download link
-            response = HttpResponse(pdf_content, content_type='application/pdf')
-            response['Content-Disposition'] = f'attachment; filename="{filename}"'
-            
-            # Add success message
-            from django.contrib import messages
-            if email_sent:
-                messages.success(request, "Report generated successfully and sent to your email!")
-            else:
-                messages.warning(request, "Report generated successfully but email could not be sent.")
-            
-            return response
-        
-        return HttpResponse("Failed to generate report.", status=500)
-    
-    except Donor.DoesNotExist:
+    if not Donor.objects.filter(user=request.user).exists():
         return HttpResponse("No donor record found for your account.", status=404)
     
+    report = request_report(request.user, 'patient')
+    return redirect('report_detail', report_id=report.pk)
+
+@login_required
+def report_detail(request, report_id):
+    """Progress of a report job, with the download link once it is ready"""
+    report = get_object_or_404(UserReport, pk=report_id, user=request.user)
+    return render(request, 'donors/report_detail.html', {'report': report})
+
+@login_required
+def report_status(request, report_id):
+    """JSON endpoint for polling a report job"""
+    report = get_object_or_404(UserReport.objects.select_related('email'), pk=report_id, user=request.user)
+    
+    return JsonResponse({
+        'status': report.status,
+        'status_display': report.get_status_display(),
+        'progress': report.progress,
+        'error': report.error,
+        'email_sent': report.email_sent,
+        'email_status': report.email_status,
+        'download_url': report.get_download_url(),
+    })
+
+@login_required
+def report_download(request, report_id):
+    """The finished PDF, only for the user who requested it"""
+    report = get_object_or_404(
+        UserReport, pk=report_id, user=request.user, status=UserReport.STATUS_COMPLETED
+    )
+    if not report.pdf_file or not report.pdf_file.storage.exists(report.pdf_file.name):
+        raise Http404("Report file not found.")
+    
+    filename = f"{report.report_type}_report_{report.generated_at.strftime('%Y%m%d_%H%M%S')}.pdf"
+    return FileResponse(report.pdf_file.open('rb'), as_attachment=True, filename=filename)
+
+
+# =====================
+# STREAMING DATA EXPORTS (CSV / NDJSON)
+# =====================
+
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponseBadRequest
+from django.utils.dateparse import parse_date
+from .utils.exports import EXPORTS, EXPORT_FORMATS, astream_export, stream_export
 
+@doctor_required
+def export_data(request, dataset):
+    """
+    Stream donors / donations / requests as CSV or NDJSON, a chunk of rows at a time.
+    Filters: ?format=csv|ndjson&from=YYYY-MM-DD&to=YYYY-MM-DD&blood_type=O-
+    """
+    if dataset not in EXPORTS:
+        raise Http404("Unknown export")
+    
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        return HttpResponseBadRequest("format must be csv or ndjson")
+    
+    filters = {}
+    for param, key in (('from', 'date_from'), ('to', 'date_to')):
+        value = request.GET.get(param)
+        if value:
+            filters[key] = parse_date(value)
+            if filters[key] is None:
+                return HttpResponseBadRequest(f"{param} must be a date (YYYY-MM-DD)")
+    
+    blood_type = request.GET.get('blood_type')
+    if blood_type:
+        if blood_type not in dict(Donor.BLOOD_TYPES):
+            return HttpResponseBadRequest("Unknown blood type")
+        filters['blood_type'] = blood_type
+    
+    # Under ASGI a synchronous iterator would be read into memory first, so stream asynchronously there
+    if isinstance(request, ASGIRequest):
+        content = astream_export(dataset, fmt, **filters)
+    else:
+        content = stream_export(dataset, fmt, **filters)
+    
+    response = StreamingHttpResponse(content, content_type=EXPORT_FORMATS[fmt])
+    filename = f"{dataset}_{timezone.now().strftime('%Y%m%d_%H%M')}.{fmt}"
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response['X-Accel-Buffering'] = 'no'
+    return response
 
 
 # =====================
@@ -973,22 +799,27 @@ def emergency_donor_locator(request):
         compatible_types = COMPATIBLE.get(blood_type_needed, [])
         
         available_donors = []
-        for donor in Donor.objects.filter(blood_type__in=compatible_types):
-            if donor.can_donate:
-                # חישוב מרחק וזמינות
-                distance = calculate_simple_distance(donor)
-                if distance <= max_distance:
-                    availability_score = calculate_availability_score(donor)
-                    
-                    available_donors.append({
-                        'donor': donor,
-                        'score': availability_score,
-                        'distance_km': distance,
-                        'last_donation': donor.last_donation_date,
-                        'days_until_available': donor.days_until_next_donation,
-                        'contact_info': f"{donor.phone_number}",
-                        'can_donate_now': donor.days_until_next_donation == 0
-                    })
+        donors = Donor.objects.eligible().filter(blood_type__in=compatible_types)
+        
+        # סינון לפי מרחק במסד הנתונים כאשר מיקום הרופא ידוע
+        origin = get_user_location(request.user)
+        if origin:
+            donors = donors.within_km(origin, max_distance)
+        else:
+            messages.warning(request, "⚠️ לא הוגדר מיקום - מוצגים כל התורמים ללא סינון מרחק")
+        
+        for donor in donors:
+            availability_score = calculate_availability_score(donor)
+            
+            available_donors.append({
+                'donor': donor,
+                'score': availability_score,
+                'distance_km': round(donor.distance_km, 2) if origin else None,
+                'last_donation': donor.last_donation_date,
+                'days_until_available': donor.days_until_next_donation,
+                'contact_info': f"{donor.phone_number}",
+                'can_donate_now': donor.days_until_next_donation == 0
+            })
         
         # מיון לפי זמינות (גבוה ביותר ראשון)
         available_donors.sort(key=lambda x: x['score'], reverse=True)
@@ -1035,11 +866,6 @@ def calculate_availability_score(donor):
     
     return max(score, 0)
 
-def calculate_simple_distance(donor):
-    """חישוב מרחק פשוט - ניתן להחליף ב-GPS אמיתי later"""
-    # מימוש לדוגמה - מחזיר מרחק אקראי בין 1-50 ק"מ
-    return (hash(donor.national_id) % 50) + 1
-
 # 2. מערכת התראות חירום המונית עם אימייל
 @doctor_required
 def mass_emergency_alert(request):
@@ -1122,79 +948,39 @@ def mass_emergency_alert(request):
         # בחירת הודעה לפי סוג החירום
         message_template = emergency_messages.get(emergency_type, emergency_messages['critical'])
         
-        # מציאת תורמים מתאימים
-        compatible_donors = Donor.objects.filter(
-            blood_type__in=COMPATIBLE.get(blood_type, [])
-        )[:max_donors]
-        
-        alerted_donors = []
-        failed_alerts = []
+        # מציאת תורמים מתאימים (זכאים לתרום ובעלי אימייל)
+        compatible_donors = Donor.objects.eligible().filter(
+            blood_type__in=COMPATIBLE.get(blood_type, []),
+            email__isnull=False
+        ).exclude(email='')[:max_donors]
         
+        # יצירת קמפיין ואימייל בתור לכל תורם - השליחה עצמה ברקע
+        recipients = []
         for donor in compatible_donors:
-            if donor.can_donate and donor.email:
-                try:
-                    # התאמת ההודעה לתורם
-                    subject = message_template['subject']
-                    message = message_template['message'].format(
-                        donor_name=f"{donor.first_name} {donor.last_name}",
-                        blood_type=blood_type
-                    )
-                    
-                    # הוספת הודעה מותאמת אישית אם קיימת
-                    if custom_message:
-                        message += f"\n\nהערה נוספת: {custom_message}"
-                    
-                    # הוספת פרטים אישיים
-                    message += f"\n\n---\nפרטים אישיים:"
-                    message += f"\nתעודת זהות: {donor.national_id}"
-                    message += f"\nסוג הדם שלך: {donor.blood_type}"
-                    message += f"\nטלפון: {donor.phone_number}"
-                    
-                    # שליחת האימייל
-                    from .utils.email_service import send_email_with_attachment
-                    send_email_with_attachment(
-                        subject=subject,
-                        message=message,
-                        recipient_list=[donor.email]
-                    )
-                    
-                    alerted_donors.append({
-                        'donor': donor,
-                        'email': donor.email,
-                        'blood_type': donor.blood_type,
-                        'distance': calculate_simple_distance(donor),
-                        'status': 'נשלח בהצלחה'
-                    })
-                    
-                except Exception as e:
-                    failed_alerts.append({
-                        'donor': donor,
-                        'email': donor.email,
-                        'error': str(e),
-                        'status': 'נכשל'
-                    })
-        
-        # סטטיסטיקות שליחה
-        total_sent = len(alerted_donors)
-        total_failed = len(failed_alerts)
-        
-        context = {
-            'alerted_count': total_sent,
-            'failed_count': total_failed,
-            'blood_type': blood_type,
-            'emergency_type': emergency_type,
-            'alerted_donors': alerted_donors,
-            'failed_alerts': failed_alerts,
-            'message_template': message_template,
-            'custom_message': custom_message,
-        }
+            # התאמת ההודעה לתורם
+            message = message_template['message'].format(
+                donor_name=f"{donor.first_name} {donor.last_name}",
+                blood_type=blood_type
+            )
+            
+            # הוספת הודעה מותאמת אישית אם קיימת
+            if custom_message:
+                message += f"\n\nהערה נוספת: {custom_message}"
+            
+            # הוספת פרטים אישיים
+            message += f"\n\n---\nפרטים אישיים:"
+            message += f"\nתעודת זהות: {donor.national_id}"
+            message += f"\nסוג הדם שלך: {donor.blood_type}"
+            message += f"\nטלפון: {donor.phone_number}"
+            
+            recipients.append((donor, message))
         
-        if total_sent > 0:
-            messages.success(request, f"✅ התראות חירום נשלחו בהצלחה ל-{total_sent} תורמים")
-        if total_failed > 0:
-            messages.warning(request, f"⚠️ {total_failed} התראות נכשלו בשליחה")
+        campaign = create_alert_campaign(
+            request.user, blood_type, emergency_type, message_template['subject'], recipients, custom_message
+        )
         
-        return render(request, 'donors/emergency_alert_results.html', context)
+        messages.success(request, f"📨 שליחת התראות חירום ל-{len(recipients)} תורמים החלה ברקע")
+        return redirect('alert_campaign_detail', campaign_id=campaign.pk)
     
     # GET request - show the alert form
     return render(request, 'donors/mass_emergency_alert.html', {
@@ -1212,69 +998,8 @@ def blood_shortage_predictor(request):
     """
     חוזה מחסורים עתידיים בדם לפי נתוני שימוש
     """
-    # ניתוח נתונים אחרונים (30 יום)
-    thirty_days_ago = timezone.now() - timedelta(days=30)
-    
-    # בקשות אחרונות
-    recent_requests = BloodRequest.objects.filter(
-        date_requested__gte=thirty_days_ago
-    )
-    
-    # תרומות אחרונות
-    recent_donations = Donation.objects.filter(
-        donation_date__gte=thirty_days_ago
-    )
-    
-    # חישוב מגמות לפי סוג דם
-    shortage_predictions = []
-    for blood_type, blood_name in Donor.BLOOD_TYPES:
-        # בקשות עבור סוג דם זה
-        type_requests = recent_requests.filter(blood_type_needed=blood_type)
-        total_requests = type_requests.count()
-        units_requested = type_requests.aggregate(total=Sum('units_needed'))['total'] or 0
-        
-        # תרומות של סוג דם זה
-        type_donations = recent_donations.filter(donor__blood_type=blood_type)
-        total_donations = type_donations.count()
-        units_donated = type_donations.aggregate(total=Sum('volume_ml'))['total'] or 0
-        units_donated = units_donated // 450  # המרה ליחידות
-        
-        # מלאי נוכחי
-        current_inventory = Donation.objects.filter(
-            donor__blood_type=blood_type,
-            is_approved=True
-        ).aggregate(total=Sum('volume_ml'))['total'] or 0
-        current_units = current_inventory // 450
-        
-        # חיזוי מחסור
-        daily_usage = units_requested / 30 if units_requested > 0 else 0.1
-        days_until_shortage = current_units / daily_usage if daily_usage > 0 else 999
-        
-        # דירוג סיכון
-        if days_until_shortage < 7:
-            risk_level = 'high'
-            risk_text = 'סיכון גבוה'
-        elif days_until_shortage < 14:
-            risk_level = 'medium'
-            risk_text = 'סיכון בינוני'
-        else:
-            risk_level = 'low'
-            risk_text = 'סיכון נמוך'
-        
-        shortage_predictions.append({
-            'blood_type': blood_type,
-            'blood_name': blood_name,
-            'current_units': current_units,
-            'daily_usage': round(daily_usage, 1),
-            'days_until_shortage': round(days_until_shortage, 1),
-            'risk_level': risk_level,
-            'risk_text': risk_text,
-            'total_requests': total_requests,
-            'total_donations': total_donations,
-        })
-    
-    # מיון לפי סיכון (גבוה ראשון)
-    shortage_predictions.sort(key=lambda x: x['days_until_shortage'])
+    # חיזוי וקטורי לכל סוגי הדם יחד (ממוין לפי סיכון, גבוה ראשון)
+    shortage_predictions = shortage_forecast(period_days=30)
     
     context = {
         'predictions': shortage_predictions,
@@ -1284,6 +1009,16 @@ def blood_shortage_predictor(request):
     
     return render(request, 'donors/shortage_predictor.html', context)
 
+
+@doctor_required
+def shortage_forecast_api(request):
+    """JSON endpoint לחיזוי מחסור בדם"""
+    return JsonResponse({
+        'analysis_date': timezone.now().isoformat(),
+        'period_days': 30,
+        'predictions': shortage_forecast(period_days=30),
+    })
+
 # 4. לוח זמינות תורמים
 @doctor_required
 def donor_availability_calendar(request):
@@ -1292,15 +1027,14 @@ def donor_availability_calendar(request):
     """
     # תורמים שתרמו לאחרונה
     recent_donors = Donor.objects.filter(
-        donations__isnull=False
+        last_donation_date__isnull=False
     ).annotate(
-        last_donation_date=Max('donations__donation_date'),
-        total_donations=Count('donations')
-    ).exclude(last_donation_date__isnull=True).order_by('-last_donation_date')
+        donation_count=Count('donations')
+    ).order_by('-last_donation_date')
     
     availability_data = []
     for donor in recent_donors:
-        next_donation_date = donor.last_donation_date + timedelta(days=56)
+        next_donation_date = donor.next_eligible_date
         days_until_available = (next_donation_date - timezone.now().date()).days
         can_donate_now = days_until_available <= 0
         
@@ -1310,11 +1044,11 @@ def donor_availability_calendar(request):
             'next_donation_date': next_donation_date,
             'days_until_available': days_until_available,
             'can_donate_now': can_donate_now,
-            'total_donations': donor.total_donations,
+            'total_donations': donor.donation_count,
         })
     
     # גם תורמים שמעולם לא תרמו
-    new_donors = Donor.objects.filter(donations__isnull=True)
+    new_donors = Donor.objects.filter(last_donation_date__isnull=True)
     
     context = {
         'available_donors': [d for d in availability_data if d['can_donate_now']],
@@ -1327,6 +1061,8 @@ def donor_availability_calendar(request):
     return render(request, 'donors/availability_calendar.html', context)
 
 # 5. התאמת תורמים חכמה לבקשות
+from .utils.matching import SMART_MATCH_LIMIT, top_matches
+
 @doctor_required
 def smart_donor_matching(request, request_id=None):
     """
@@ -1345,24 +1081,27 @@ def smart_donor_matching(request, request_id=None):
     
     compatible_types = COMPATIBLE.get(blood_type, [])
     
-    # מציאת התורמים המתאימים ביותר
-    matched_donors = []
-    for donor in Donor.objects.filter(blood_type__in=compatible_types):
-        if donor.can_donate:
-            match_score = calculate_match_score(donor, blood_type, units_needed)
-            
-            matched_donors.append({
-                'donor': donor,
-                'match_score': match_score,
-                'distance': calculate_simple_distance(donor),
-                'last_donation': donor.last_donation_date,
-                'can_donate_now': donor.days_until_next_donation == 0,
-                'health_status': donor.health_status,
-                'contact_info': donor.phone_number,
-            })
+    try:
+        limit = max(1, int(request.GET.get('limit', SMART_MATCH_LIMIT)))
+    except ValueError:
+        limit = SMART_MATCH_LIMIT
+    
+    # מציאת התורמים המתאימים ביותר - שאילתה אחת וניקוד וקטורי לכל המועמדים
+    top, total_matches = top_matches(blood_type, origin=get_user_location(request.user), k=limit)
     
-    # מיון לפי דירוג ההתאמה (גבוה ביותר ראשון)
-    matched_donors.sort(key=lambda x: x['match_score'], reverse=True)
+    matched_donors = []
+    for donor, match_score in top:
+        distance = getattr(donor, 'distance_km', None)
+        matched_donors.append({
+            'donor': donor,
+            'match_score': match_score,
+            'distance': round(distance, 2) if distance is not None else None,
+            'last_donation': donor.last_donation_date,
+            'can_donate_now': donor.days_until_next_donation == 0,
+            'health_status': donor.health_status,
+            'donation_count': donor.donation_count,
+            'contact_info': donor.phone_number,
+        })
     
     context = {
         'blood_request': blood_request,
@@ -1370,48 +1109,48 @@ def smart_donor_matching(request, request_id=None):
         'units_needed': units_needed,
         'matched_donors': matched_donors,
         'compatible_types': compatible_types,
-        'total_matches': len(matched_donors),
+        'total_matches': total_matches,
     }
     
     return render(request, 'donors/smart_matching.html', context)
 
-def calculate_match_score(donor, needed_blood_type, units_needed):
+# 6. תוכנית קריאה לתורמים לכל הבקשות הפתוחות יחד
+from .utils.call_plan import build_call_plan
+
+@doctor_required
+def donor_call_plan(request):
     """
-    מחשב דירוג התאמה בין תורם לבקשה
+    JSON: שיבוץ אופטימלי של תורמים לכל הבקשות הפתוחות - כל תורם נקרא לבקשה אחת לכל היותר
     """
-    score = 100
-    
-    # התאמת סוג דם (מדויק יותר = ניקוד גבוה יותר)
-    if donor.blood_type == needed_blood_type:
-        score += 30
-    elif needed_blood_type in ['O-', 'O+'] and donor.blood_type == needed_blood_type:
-        score += 50
-    
-    # זמינות מיידית
-    if donor.days_until_next_donation == 0:
-        score += 40
-    
-    # מצב בריאותי
-    if donor.health_status == 'excellent':
-        score += 25
-    elif donor.health_status == 'good':
-        score += 15
+    plan = build_call_plan()
     
-    # מרחק (קרוב יותר = טוב יותר)
-    distance = calculate_simple_distance(donor)
-    if distance <= 10:
-        score += 20
-    elif distance <= 25:
-        score += 10
-    
-    # ניסיון תרומה (יותר ניסיון = טוב יותר)
-    total_donations = donor.donations.count()
-    if total_donations > 5:
-        score += 15
-    elif total_donations > 0:
-        score += 5
-    
-    return score
+    return JsonResponse({
+        'generated_at': timezone.now().isoformat(),
+        'units_missing': plan['units'],
+        'units_assigned': plan['assigned'],
+        'donors_considered': plan['donors_considered'],
+        'requests': [
+            {
+                'request_id': item['request'].pk,
+                'patient_name': item['request'].patient_name,
+                'blood_type_needed': item['request'].blood_type_needed,
+                'priority': item['request'].priority,
+                'units_missing': item['missing'],
+                'units_unfilled': item['unfilled'],
+                'donors': [
+                    {
+                        'donor_id': donor.pk,
+                        'name': f"{donor.first_name} {donor.last_name}",
+                        'blood_type': donor.blood_type,
+                        'phone': donor.phone_number,
+                        'distance_km': distance,
+                    }
+                    for donor, distance in item['donors']
+                ],
+            }
+            for item in plan['requests']
+        ],
+    })
 
 # AJAX endpoint for real-time availability check
 def check_donor_availability(request):
@@ -1452,16 +1191,13 @@ def quick_emergency_alert(request, blood_type, emergency_type='critical'):
         return redirect('mass_emergency_alert')
     
     # מציאת תורמים מתאימים
-    compatible_donors = Donor.objects.filter(
-        blood_type__in=COMPATIBLE.get(blood_type, [])
-    )[:20]  # הגבלה ל-20 תורמים לשליחה מהירה
+    compatible_donors = Donor.objects.eligible().filter(
+        blood_type__in=COMPATIBLE.get(blood_type, []),
+        email__isnull=False
+    ).exclude(email='')[:20]  # הגבלה ל-20 תורמים לשליחה מהירה
     
-    alerted_donors = []
-    for donor in compatible_donors:
-        if donor.can_donate and donor.email:
-            try:
-                subject = f"🔴 חירום - נדרש דם מסוג {blood_type}"
-                message = f"""
+    recipients = [
+        (donor, f"""
 שלום {donor.first_name} {donor.last_name},
 
 בקשת חירום דחופה! נדרש דם מסוג {blood_type} באופן מיידי.
@@ -1477,22 +1213,16 @@ def quick_emergency_alert(request, blood_type, emergency_type='critical'):
 
 בברכה,
 מערכת ניהול בנק הדם
-                """
-                
-                from .utils.email_service import send_email_with_attachment
-                send_email_with_attachment(
-                    subject=subject,
-                    message=message,
-                    recipient_list=[donor.email]
-                )
-                
-                alerted_donors.append(donor)
-                
-            except Exception as e:
-                print(f"שגיאה בשליחה ל-{donor.email}: {e}")
+                """)
+        for donor in compatible_donors
+    ]
+    
+    campaign = create_alert_campaign(
+        request.user, blood_type, emergency_type, f"🔴 חירום - נדרש דם מסוג {blood_type}", recipients
+    )
     
-    messages.success(request, f"התראות חירום נשלחו ל-{len(alerted_donors)} תורמים מסוג {blood_type}")
-    return redirect('mass_emergency_alert')
+    messages.success(request, f"התראות חירום נשלחות ברקע ל-{len(recipients)} תורמים מסוג {blood_type}")
+    return redirect('alert_campaign_detail', campaign_id=campaign.pk)
 
 # בדיקת תפוסת אימיילים לפני שליחה
 @doctor_required
@@ -1528,23 +1258,93 @@ def check_email_capacity(request):
         'compatible_types': COMPATIBLE.get(blood_type, [])
     })
 
+# =====================
+# ALERT CAMPAIGNS (background dispatch)
+# =====================
+
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import require_POST
+from .models import AlertCampaign
+from .utils.alert_dispatch import create_alert_campaign, retry_failed
+
+@doctor_required
+def alert_campaign_detail(request, campaign_id):
+    """תוצאות שליחת התראות חירום - מתעדכן בזמן אמת"""
+    campaign = get_object_or_404(AlertCampaign, pk=campaign_id)
+    deliveries = campaign.deliveries.select_related('donor', 'outbox_email')
+    
+    context = {
+        'campaign': campaign,
+        'progress': campaign.progress(),
+        'deliveries': deliveries,
+        'blood_type': campaign.blood_type,
+        'emergency_type': campaign.emergency_type,
+    }
+    return render(request, 'donors/emergency_alert_results.html', context)
+
+
+@doctor_required
+def alert_campaign_status(request, campaign_id):
+    """JSON endpoint להתקדמות הקמפיין וסטטוס כל משלוח"""
+    campaign = get_object_or_404(AlertCampaign, pk=campaign_id)
+    
+    return JsonResponse({
+        'status': campaign.status,
+        'status_display': campaign.get_status_display(),
+        'progress': campaign.progress(),
+        'deliveries': [
+            {
+                'id': delivery_id,
+                'status': status,
+                'attempts': attempts,
+                'error': last_error,
+            }
+            for delivery_id, status, attempts, last_error in campaign.deliveries.values_list(
+                'id', 'outbox_email__status', 'outbox_email__attempts', 'outbox_email__last_error'
+            )
+        ],
+    })
+
+
+@doctor_required
+@require_POST
+def alert_campaign_retry(request, campaign_id):
+    """שליחה חוזרת של התראות שנכשלו"""
+    campaign = get_object_or_404(AlertCampaign, pk=campaign_id)
+    retried = retry_failed(campaign)
+    
+    if retried:
+        messages.info(request, f"🔁 {retried} התראות שנכשלו נשלחות שוב")
+    else:
+        messages.info(request, "אין התראות שנכשלו לשליחה חוזרת")
+    return redirect('alert_campaign_detail', campaign_id=campaign.pk)
+
 # =====================
 # DISTANCE CALCULATION FUNCTIONS (Add to your views.py)
 # =====================
 
-def calculate_simple_distance(user, donor):
-    """Calculate distance between user and donor based on their locations"""
+def calculate_simple_distance(origin, donor):
+    """
+    Distance in km from `origin` (a Location) to the donor's town,
+    or None when either location is unknown
+    """
+    if origin is None or donor.location_id is None:
+        return None
+    return origin.distance_to(donor.location)
+
+
+def get_user_location(user):
+    """The Location chosen by the user, or None"""
     try:
-        user_location = user.user_location.location
-        donor_location = donor.user_location.location
-        return user_location.distance_to(donor_location)
+        return user.user_location.location
     except (UserLocation.DoesNotExist, AttributeError):
-        # Fallback if locations not set
-        return (hash(donor.national_id) % 50) + 1
+        return None
+
 
+from .utils.facility_index import facility_index
 
-def find_nearby_donors(user, max_distance_km=50, blood_type=None):
-    """Find nearby donors within specified distance"""
+def find_nearby_donors(user, max_distance_km=50, blood_type=None, limit=None):
+    """Find nearby donors within specified distance (the `limit` nearest if given)"""
     nearby_donors = []
     
     try:
@@ -1552,49 +1352,39 @@ def find_nearby_donors(user, max_distance_km=50, blood_type=None):
     except (UserLocation.DoesNotExist, AttributeError):
         return nearby_donors
     
-    donors_query = Donor.objects.filter(can_donate=True)
+    donors_query = Donor.objects.eligible()
     if blood_type:
         donors_query = donors_query.filter(blood_type=blood_type)
     
-    for donor in donors_query:
-        try:
-            donor_location = donor.user.user_location.location
-            distance = user_location.distance_to(donor_location)
-            
-            if distance <= max_distance_km:
-                nearby_donors.append({
-                    'donor': donor,
-                    'distance_km': distance,
-                    'location': donor_location.name_he
-                })
-        except (User.DoesNotExist, UserLocation.DoesNotExist, AttributeError):
-            continue
+    # Distance filter, ORDER BY and LIMIT run in the database
+    donors_query = donors_query.within_km(user_location, max_distance_km).select_related('location')
+    for donor in donors_query[:limit]:
+        nearby_donors.append({
+            'donor': donor,
+            'distance_km': round(donor.distance_km, 2),
+            'location': donor.location.name_he
+        })
     
-    return sorted(nearby_donors, key=lambda x: x['distance_km'])
+    return nearby_donors
 
 
-def get_emergency_donors(emergency_location, max_distance_km=100):
-    """Find O- donors near emergency location"""
+def get_emergency_donors(emergency_location, max_distance_km=100, limit=None):
+    """Find O- donors near emergency location (the `limit` nearest if given)"""
     emergency_donors = []
     
-    o_negative_donors = Donor.objects.filter(blood_type='O-', can_donate=True)
+    o_negative_donors = Donor.objects.eligible().filter(blood_type='O-').within_km(
+        emergency_location, max_distance_km
+    ).select_related('location')
     
-    for donor in o_negative_donors:
-        try:
-            donor_location = donor.user.user_location.location
-            distance = emergency_location.distance_to(donor_location)
-            
-            if distance <= max_distance_km:
-                emergency_donors.append({
-                    'donor': donor,
-                    'distance_km': distance,
-                    'location': donor_location.name_he,
-                    'phone': donor.phone_number
-                })
-        except (User.DoesNotExist, UserLocation.DoesNotExist, AttributeError):
-            continue
+    for donor in o_negative_donors[:limit]:
+        emergency_donors.append({
+            'donor': donor,
+            'distance_km': round(donor.distance_km, 2),
+            'location': donor.location.name_he,
+            'phone': donor.phone_number
+        })
     
-    return sorted(emergency_donors, key=lambda x: x['distance_km'])
+    return emergency_donors
 
 
 # =====================
@@ -1613,25 +1403,17 @@ def emergency_request(request):
     all_o_negative = Donor.objects.filter(blood_type='O-')
     available_donors = []
     
-    for donor in all_o_negative:
-        if donor.can_donate:
-            # If user has location, calculate distance
-            if user_location:
-                try:
-                    donor_location = donor.user.user_location.location
-                    distance = user_location.distance_to(donor_location)
-                    available_donors.append({
-                        'donor': donor,
-                        'distance': distance
-                    })
-                except:
-                    available_donors.append({'donor': donor, 'distance': 999})
-            else:
-                available_donors.append({'donor': donor, 'distance': 999})
+    for donor in all_o_negative.eligible().select_related('location'):
+        # If user has location, calculate distance
+        distance = calculate_simple_distance(user_location, donor)
+        available_donors.append({
+            'donor': donor,
+            'distance': distance  # None when the distance is unknown
+        })
     
-    # Sort by distance if location data is available
+    # Sort by distance if location data is available; unknown distances go last
     if user_location:
-        available_donors.sort(key=lambda x: x['distance'])
+        available_donors.sort(key=lambda x: (x['distance'] is None, x['distance'] or 0))
     
     available_units = len(available_donors)
     
@@ -1674,13 +1456,8 @@ def emergency_request(request):
             except:
                 pass
         
-        # Process the emergency request
-        remaining_units = units_needed
-        donation_messages = []
-        matched_donors = []
-        
-        # Create emergency request record
-        emergency_request = EmergencyRequest.objects.create(
+        # Book donors and record everything in one transaction
+        emergency_request = EmergencyRequest(
             units_needed=units_needed,
             contact_name=contact_name,
             contact_phone=contact_phone,
@@ -1691,44 +1468,29 @@ def emergency_request(request):
             notes=notes,
             automatic_match=True
         )
+        try:
+            booked = allocate_emergency(
+                emergency_request,
+                [(donor_data['donor'], donor_data['distance']) for donor_data in available_donors]
+            )
+        except DonorBookingConflict:
+            messages.error(request, '❌ התורמים שנבחרו הוזמנו במקביל לבקשה אחרת. אנא נסה שוב.')
+            return redirect('emergency_request')
         
-        # Process donations with available donors (sorted by distance)
-        for donor_data in available_donors:
-            if remaining_units <= 0:
-                break
-                
-            donor = donor_data['donor']
-            distance = donor_data.get('distance', 999)
-            
-            # Each donor can give 1 unit in emergency
-            can_give = min(remaining_units, 1)
-            
-            if can_give > 0:
-                # Create donation record
-                donation = Donation.objects.create(
-                    donor=donor,
-                    donation_date=timezone.now().date(),
-                    volume_ml=can_give * 450,
-                    notes=f"תרומת חירום אוטומטית - {can_give} יחידות - מרחק: {distance} ק\"מ",
-                    is_approved=True
-                )
-                
-                donation_messages.append(
-                    f"✅ נלקח דם מתורם {donor.get_full_name()} "
-                    f"(ת\"ז: {donor.national_id}) - {can_give} יחידות - {distance} ק\"מ"
-                )
-                
-                matched_donors.append(donor)
-                remaining_units -= can_give
-        
-        # Update the emergency request
-        if matched_donors:
-            emergency_request.matched_donors.set(matched_donors)
+        donation_messages = [
+            f"✅ נלקח דם מתורם {donor.first_name} {donor.last_name} "
+            f"(ת\"ז: {donor.national_id}) - 1 יחידות"
+            + (f" - {distance} ק\"מ" if distance is not None else "")
+            for donor, distance in booked
+        ]
         
-        emergency_request.fulfilled = (remaining_units == 0)
-        if emergency_request.fulfilled:
-            emergency_request.fulfilled_date = timezone.now()
-        emergency_request.save()
+        if not emergency_request.fulfilled:
+            messages.warning(
+                request,
+                f"⚠️ בקשת החירום סופקה חלקית: {len(booked)} מתוך {units_needed} יחידות. "
+                f"חלק מהתורמים הוזמנו במקביל לבקשה אחרת.\n\n" + "\n".join(donation_messages)
+            )
+            return redirect('emergency_request')
         
         # Success message with location info
         location_info = ""
@@ -1764,7 +1526,7 @@ def emergency_request(request):
         pass
     
     context = {
-        'o_negative_count': len(all_o_negative),  # Total O- donors
+        'o_negative_count': all_o_negative.count(),  # Total O- donors
         'total_o_negative_units': total_o_negative_units,
         'available_units': available_units,  # Actually available donors
         'recent_requests': recent_requests,
@@ -1798,26 +1560,21 @@ def location_based_donor_finder(request):
         compatible_types = COMPATIBLE.get(blood_type, [])
         nearby_donors = []
         
-        for donor in Donor.objects.filter(blood_type__in=compatible_types, can_donate=True):
-            try:
-                donor_location = donor.user.user_location.location
-                distance = user_location.distance_to(donor_location)
-                
-                if distance <= max_distance:
-                    availability_score = calculate_availability_score(donor)
-                    
-                    nearby_donors.append({
-                        'donor': donor,
-                        'distance_km': distance,
-                        'location': donor_location.name_he,
-                        'availability_score': availability_score,
-                        'last_donation': donor.last_donation_date,
-                        'can_donate_now': donor.days_until_next_donation == 0,
-                        'phone': donor.phone_number,
-                        'email': donor.email
-                    })
-            except (User.DoesNotExist, UserLocation.DoesNotExist, AttributeError):
-                continue
+        candidates = Donor.objects.eligible().filter(
+            blood_type__in=compatible_types
+        ).select_related('location').within_km(user_location, max_distance)
+        
+        for donor in candidates:
+            nearby_donors.append({
+                'donor': donor,
+                'distance_km': round(donor.distance_km, 2),
+                'location': donor.location.name_he,
+                'availability_score': calculate_availability_score(donor),
+                'last_donation': donor.last_donation_date,
+                'can_donate_now': donor.days_until_next_donation == 0,
+                'phone': donor.phone_number,
+                'email': donor.email
+            })
         
         # Sort by distance and availability
         nearby_donors.sort(key=lambda x: (x['distance_km'], -x['availability_score']))
@@ -1890,13 +1647,8 @@ def assign_random_locations_to_users():
 
 def emergency_stats(request):
     """JSON endpoint for real-time stats with location info"""
-    all_o_negative = Donor.objects.filter(blood_type='O-')
-    
     # Count available donors
-    available_count = 0
-    for donor in all_o_negative:
-        if donor.can_donate:
-            available_count += 1
+    available_count = Donor.objects.eligible().filter(blood_type='O-').count()
     
     # Get user location if available
     user_city = None
@@ -2015,20 +1767,16 @@ def get_location_details(request, location_id):
     try:
         location = Location.objects.get(id=location_id)
         
-        # Find nearby hospitals
+        # Find the 3 closest hospitals within 50km
         nearby_hospitals = []
         if not location.has_hospital:
-            hospitals = Location.objects.filter(has_hospital=True)
-            for hospital in hospitals:
-                distance = location.distance_to(hospital)
-                if distance <= 50:  # Within 50km
-                    nearby_hospitals.append({
-                        'name': hospital.name_he,
-                        'distance': distance,
-                        'has_blood_bank': hospital.has_blood_bank
-                    })
-            # Sort by distance
-            nearby_hospitals.sort(key=lambda x: x['distance'])
+            closest = facility_index(location).nearest(location, k=3, facility='has_hospital', max_km=50)
+            for hospital, distance in closest:
+                nearby_hospitals.append({
+                    'name': hospital.name_he,
+                    'distance': distance,
+                    'has_blood_bank': hospital.has_blood_bank
+                })
         
         data = {
             'id': location.id,
@@ -2040,8 +1788,7 @@ def get_location_details(request, location_id):
             'longitude': float(location.longitude),
             'has_hospital': location.has_hospital,
             'has_blood_bank': location.has_blood_bank,
-            'nearby_hospitals': nearby_hospitals[:3],  # Top 3 closest
-            'emergency_services': location.emergency_services,
+            'nearby_hospitals': nearby_hospitals,  # Top 3 closest
         }
         
         return JsonResponse(data)
@@ -2058,31 +1805,22 @@ def user_location_map(request):
     try:
         user_location = request.user.user_location.location
         
-        # Get nearby hospitals and blood banks
+        # Get nearby hospitals and blood banks (within 30km, nearest first)
         nearby_services = []
-        services = Location.objects.filter(
-            Q(has_hospital=True) | Q(has_blood_bank=True)
-        ).exclude(id=user_location.id)
-        
-        for service in services:
-            distance = user_location.distance_to(service)
-            if distance <= 30:  # Within 30km
-                service_type = []
-                if service.has_hospital:
-                    service_type.append("בית חולים")
-                if service.has_blood_bank:
-                    service_type.append("בנק דם")
-                
-                nearby_services.append({
-                    'name': service.name_he,
-                    'types': service_type,
-                    'distance': distance,
-                    'latitude': float(service.latitude),
-                    'longitude': float(service.longitude),
-                })
-        
-        # Sort by distance
-        nearby_services.sort(key=lambda x: x['distance'])
+        for service, distance in facility_index(user_location).within(user_location, 30):
+            service_type = []
+            if service.has_hospital:
+                service_type.append("בית חולים")
+            if service.has_blood_bank:
+                service_type.append("בנק דם")
+            
+            nearby_services.append({
+                'name': service.name_he,
+                'types': service_type,
+                'distance': distance,
+                'latitude': float(service.latitude),
+                'longitude': float(service.longitude),
+            })
         
         context = {
             'user_location': user_location,
@@ -2145,22 +1883,9 @@ def get_user_location_info(request):
     try:
         user_location = request.user.user_location.location
         
-        # Get nearby available donors for emergency planning
-        nearby_o_negative = []
-        o_negative_donors = Donor.objects.filter(blood_type='O-', can_donate=True)
-        
-        for donor in o_negative_donors:
-            try:
-                donor_location = donor.user.user_location.location
-                distance = user_location.distance_to(donor_location)
-                
-                if distance <= 50:  # Within 50km
-                    nearby_o_negative.append({
-                        'distance': distance,
-                        'can_donate_now': donor.days_until_next_donation == 0
-                    })
-            except:
-                continue
+        # Count nearby available donors for emergency planning (within 50km) in SQL;
+        # eligible donors are exactly the ones who can donate now
+        nearby_o_negative = Donor.objects.eligible().filter(blood_type='O-').within_km(user_location, 50).count()
         
         data = {
             'location_name': user_location.name_he,
@@ -2169,8 +1894,8 @@ def get_user_location_info(request):
             'longitude': float(user_location.longitude),
             'has_hospital': user_location.has_hospital,
             'has_blood_bank': user_location.has_blood_bank,
-            'nearby_o_negative_count': len(nearby_o_negative),
-            'immediate_o_negative': len([d for d in nearby_o_negative if d['can_donate_now']]),
+            'nearby_o_negative_count': nearby_o_negative,
+            'immediate_o_negative': nearby_o_negative,
         }
         
         return JsonResponse(data)
@@ -2187,35 +1912,16 @@ def location_based_emergency_prepare(request):
     try:
         user_location = request.user.user_location.location
         
-        # Find closest hospitals with blood banks
-        hospitals_with_blood = Location.objects.filter(
-            has_hospital=True, 
-            has_blood_bank=True
-        ).exclude(id=user_location.id)
-        
-        closest_hospitals = []
-        for hospital in hospitals_with_blood:
-            distance = user_location.distance_to(hospital)
-            closest_hospitals.append({
-                'hospital': hospital,
-                'distance': distance
-            })
-        
-        # Sort and get top 3
-        closest_hospitals.sort(key=lambda x: x['distance'])
-        closest_hospitals = closest_hospitals[:3]
+        # Find the 3 closest hospitals with blood banks
+        closest_hospitals = [
+            {'hospital': hospital, 'distance': distance}
+            for hospital, distance in facility_index(user_location).nearest(
+                user_location, k=3, facility=['has_hospital', 'has_blood_bank']
+            )
+        ]
         
-        # Get nearby O- donors count
-        nearby_o_negative = 0
-        o_negative_donors = Donor.objects.filter(blood_type='O-', can_donate=True)
-        for donor in o_negative_donors:
-            try:
-                donor_location = donor.user.user_location.location
-                distance = user_location.distance_to(donor_location)
-                if distance <= 30:
-                    nearby_o_negative += 1
-            except:
-                continue
+        # Get nearby O- donors count (within 30km)
+        nearby_o_negative = Donor.objects.eligible().filter(blood_type='O-').within_km(user_location, 30).count()
         
         context = {
             'user_location': user_location,